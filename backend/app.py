@@ -5,33 +5,60 @@ Modular architecture with separated concerns
 from flask import Flask
 from flask_cors import CORS
 from config import Config
-from models.model_loader import load_all_models
+from models.model_loader import load_all_models, warm_models_async, preload_models_for_fork
+from utils.upload_utils import InMemoryUploadRequest
 
 # Import route blueprints
 from routes.health import health_bp
 from routes.prediction import prediction_bp
 from routes.chat import chat_bp
 from routes.recommendations import recommendations_bp
+from routes.metrics import metrics_bp, register_request_metrics
+from routes.jobs import jobs_bp
+from routes.history import history_bp
+from services.job_queue import start_job_workers
 
-def create_app():
-    """Application factory pattern"""
+def create_app(prefork=False):
+    """Application factory pattern
+
+    With prefork=True (gunicorn preload_app, see gunicorn.conf.py) the
+    PREFORK_MODELS are loaded synchronously in the master so every worker
+    shares them; the remaining models are warmed per worker after fork.
+    """
     app = Flask(__name__)
     
-    # Load configuration
+    # Keep image uploads in memory instead of spooling them to temp files
+    app.request_class = InMemoryUploadRequest
+    
+    # Load configuration (includes MAX_CONTENT_LENGTH)
     app.config.from_object(Config)
     
     # Enable CORS
-    CORS(app, origins=Config.CORS_ORIGINS)
+    CORS(app, origins=Config.CORS_ORIGINS, expose_headers=['X-Session-Id', 'Retry-After', 'X-History-Id'])
     
     # Register blueprints
     app.register_blueprint(health_bp)
     app.register_blueprint(prediction_bp)
     app.register_blueprint(chat_bp)
     app.register_blueprint(recommendations_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(jobs_bp)
+    app.register_blueprint(history_bp)
     
-    # Load AI models on startup
-    with app.app_context():
+    # Per-route latency histograms for GET /metrics
+    register_request_metrics(app)
+    
+    # Load AI models on startup (lazy mode loads each model on first use)
+    if prefork:
+        preload_models_for_fork(Config.PREFORK_MODELS)
+    elif Config.MODEL_WARMUP == 'eager':
         load_all_models()
+    elif Config.MODEL_WARMUP == 'background':
+        warm_models_async()
+    
+    # Job worker threads (started per worker after fork in pre-fork mode)
+    if not prefork:
+        start_job_workers()
     
     return app
 
@@ -0,0 +1,59 @@
+"""
+ASGI entry point - async serving mode
+
+LLM-bound routes (/api/chat, /api/recommendations) run as native async
+handlers, so a few processes can hold hundreds of concurrent chat
+sessions. Every other route is served by the regular Flask app through a
+WSGI adapter, so model inference behaves exactly as in the sync server.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5001 --workers 2
+"""
+import time
+from asgiref.wsgi import WsgiToAsgi
+from quart import Quart, g, request
+from quart_cors import cors
+from config import Config
+from app import create_app
+from routes.async_llm import async_llm_bp
+from routes.metrics import observe_request
+
+ASYNC_PATHS = frozenset({'/api/chat', '/api/recommendations'})
+
+class PathDispatcher:
+    """Send async LLM paths to the Quart app and everything else to Flask"""
+
+    def __init__(self, async_app, sync_app, async_paths):
+        self.async_app = async_app
+        self.sync_app = sync_app
+        self.async_paths = async_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan' or scope.get('path') in self.async_paths:
+            await self.async_app(scope, receive, send)
+        else:
+            await self.sync_app(scope, receive, send)
+
+def create_asgi_app():
+    """ASGI application factory"""
+    async_app = Quart(__name__)
+    async_app.config.from_object(Config)
+    async_app = cors(async_app, allow_origin=Config.CORS_ORIGINS, expose_headers=['X-Session-Id', 'Retry-After', 'X-History-Id'])
+    async_app.register_blueprint(async_llm_bp)
+
+    # Same per-route histogram as the Flask app (both share one registry per process)
+    @async_app.before_request
+    async def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @async_app.after_request
+    async def observe_request_time(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            observe_request(request.method, request.url_rule, response.status_code, time.perf_counter() - started)
+        return response
+
+    sync_app = WsgiToAsgi(create_app())
+
+    return PathDispatcher(async_app, sync_app, ASYNC_PATHS)
+
+app = create_asgi_app()
@@ -0,0 +1,58 @@
+"""
+Concurrent chat load test against a running server
+
+Opens `--sessions` concurrent /api/chat requests and reports completed
+sessions, throughput and latency percentiles. Run it against the stub LLM
+server (benchmarks/stub_llm_server.py) to compare the sync and ASGI modes.
+
+Usage (from the backend directory):
+    python -m benchmarks.chat_load --url http://127.0.0.1:5001 --sessions 200
+"""
+import argparse
+import asyncio
+import time
+import httpx
+import numpy as np
+
+async def one_session(client, url, index):
+    payload = {'message': f"Câu hỏi kiểm thử số {index}", 'conversation_history': []}
+    start = time.perf_counter()
+    first_byte = None
+    async with client.stream('POST', f"{url}/api/chat", json=payload) as response:
+        response.raise_for_status()
+        async for _ in response.aiter_bytes():
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+    return first_byte, time.perf_counter() - start
+
+async def run(url, sessions, timeout):
+    limits = httpx.Limits(max_connections=sessions, max_keepalive_connections=sessions)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(one_session(client, url, i) for i in range(sessions)),
+            return_exceptions=True
+        )
+        wall = time.perf_counter() - start
+
+    ok = [r for r in results if not isinstance(r, Exception)]
+    errors = len(results) - len(ok)
+    ttfb = [r[0] * 1000 for r in ok if r[0] is not None]
+    total = [r[1] * 1000 for r in ok]
+
+    print(f"sessions: {sessions}  completed: {len(ok)}  errors: {errors}  wall: {wall:.2f}s")
+    if total:
+        print(f"throughput: {len(ok) / wall:.1f} sessions/s")
+        print(f"ttfb   p50 {np.percentile(ttfb, 50):8.0f} ms  p99 {np.percentile(ttfb, 99):8.0f} ms")
+        print(f"total  p50 {np.percentile(total, 50):8.0f} ms  p99 {np.percentile(total, 99):8.0f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5001')
+    parser.add_argument('--sessions', type=int, default=200)
+    parser.add_argument('--timeout', type=float, default=120.0)
+    args = parser.parse_args()
+    asyncio.run(run(args.url.rstrip('/'), args.sessions, args.timeout))
+
+if __name__ == '__main__':
+    main()
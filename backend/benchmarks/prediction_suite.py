@@ -0,0 +1,400 @@
+"""
+Prediction benchmark suite: in-process and HTTP load for the prediction routes
+
+Drives `predict_lung_cancer_risk`, `predict_tumor_segmentation` and
+`predict_cancer_stage` with synthetic patients and CT-like images, sweeping
+concurrency and micro-batch size. Reports throughput, p50/p95/p99 latency,
+peak RSS and per-model cold start, and writes a JSON baseline; `--compare`
+checks the run against an earlier baseline and exits 1 on a regression.
+
+Tiny stand-in models (benchmarks/stub_models.py) are used unless
+`--real-models` is given, so the suite runs without the trained artifacts.
+In HTTP mode, start the server with the same model paths (printed by
+`python -m benchmarks.stub_models`); batch sizes are then the server's
+UNET_BATCH_MAX_SIZE / YOLO_BATCH_MAX_SIZE.
+
+Usage (from the backend directory):
+    python -m benchmarks.prediction_suite --concurrency 1,4,16 --batch-sizes 1,8
+    python -m benchmarks.prediction_suite --mode http --url http://127.0.0.1:5001 --server-pid <pid>
+    python -m benchmarks.prediction_suite --compare benchmarks/results/<commit>.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+import numpy as np
+from PIL import Image
+
+TARGETS = ('lung_cancer', 'tumor', 'cancer_stage')
+TARGET_MODELS = {'lung_cancer': 'risk_scorer', 'tumor': 'unet', 'cancer_stage': 'yolo'}
+HTTP_PATHS = {
+    'lung_cancer': '/api/predict/lung-cancer',
+    'tumor': '/api/predict/tumor',
+    'cancer_stage': '/api/predict/cancer-stage'
+}
+
+def make_synthetic_patients(count, seed=0):
+    """Random patients: age 14-80, gender 0/1, health factors 1-8"""
+    from models.risk_scorer import FEATURE_ORDER
+
+    rng = np.random.default_rng(seed)
+    patients = []
+    for _ in range(count):
+        patient = {feature: int(rng.integers(1, 9)) for feature in FEATURE_ORDER}
+        patient['age'] = int(rng.integers(14, 81))
+        patient['gender'] = int(rng.integers(0, 2))
+        patients.append(patient)
+    return patients
+
+def make_synthetic_images(count, size=(512, 512), seed=0):
+    """Random grayscale CT-like slices: a bright disc on noise, one per request"""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[:size[1], :size[0]]
+    images = []
+    for _ in range(count):
+        pixels = rng.normal(60, 20, size=(size[1], size[0]))
+        cy, cx = rng.integers(size[1] // 4, 3 * size[1] // 4), rng.integers(size[0] // 4, 3 * size[0] // 4)
+        radius = rng.integers(10, 60)
+        pixels[(yy - cy) ** 2 + (xx - cx) ** 2 < radius ** 2] += 120
+        images.append(Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), mode='L'))
+    return images
+
+def png_bytes(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+def peak_rss_mb():
+    """Peak resident set size of this process"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def server_peak_rss_mb(pid):
+    """Sum of VmHWM (peak RSS) over a server process and its workers"""
+    from benchmarks.worker_memory import child_pids
+
+    total_kib = 0
+    for process in [pid] + child_pids(pid):
+        try:
+            with open(f"/proc/{process}/status") as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        total_kib += int(line.split()[1])
+        except OSError:
+            continue
+    return total_kib / 1024
+
+def run_load(call, inputs, requests, concurrency):
+    """Send `requests` calls from `concurrency` threads; returns (latencies ms, errors, wall seconds)"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    next_index = [0]
+
+    def worker():
+        while True:
+            with lock:
+                index = next_index[0]
+                next_index[0] += 1
+            if index >= requests:
+                return
+            start = time.perf_counter()
+            try:
+                call(inputs[index % len(inputs)])
+            except Exception as e:
+                with lock:
+                    errors[0] += 1
+                    if errors[0] == 1:
+                        print(f"  first error: {str(e)}")
+                continue
+            elapsed = (time.perf_counter() - start) * 1000.0
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    wall_start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0], time.perf_counter() - wall_start
+
+def summarize(latencies, errors, wall):
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': len(latencies) / wall if wall else 0.0,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99)
+    }
+
+def in_process_calls(threshold=0.5):
+    """Model functions exactly as the routes call them (imported after the env is set up)"""
+    from models.xgboost_model import predict_lung_cancer_risk
+    from models.unet_model import predict_tumor_segmentation
+    from models.yolo_model import predict_cancer_stage
+
+    return {
+        'lung_cancer': predict_lung_cancer_risk,
+        'tumor': lambda image: predict_tumor_segmentation(image, threshold),
+        'cancer_stage': predict_cancer_stage
+    }
+
+def configure_batching(batch_size):
+    """Set both micro-batchers' max batch size; they and their pools are rebuilt on the next request"""
+    from config import Config
+    from models import inference_executor, unet_model, yolo_model
+
+    Config.UNET_BATCH_MAX_SIZE = batch_size
+    Config.YOLO_BATCH_MAX_SIZE = batch_size
+    unet_model._UNET_BATCHER = None
+    yolo_model._YOLO_BATCHER = None
+    # Pool sizes follow the batch size
+    with inference_executor._EXECUTORS_LOCK:
+        for name in inference_executor.BATCHED_POOLS:
+            executor = inference_executor._EXECUTORS.pop(name, None)
+            if executor is not None:
+                executor.shutdown(wait=True)
+
+def http_calls(url, client):
+    def post_json(path):
+        def call(payload):
+            response = client.post(f"{url}{path}", json=payload)
+            response.raise_for_status()
+        return call
+
+    def post_image(path):
+        def call(data):
+            response = client.post(
+                f"{url}{path}",
+                files={'image': ('slice.png', data, 'image/png')},
+                data={'threshold': '0.5'}
+            )
+            response.raise_for_status()
+        return call
+
+    return {
+        'lung_cancer': post_json(HTTP_PATHS['lung_cancer']),
+        'tumor': post_image(HTTP_PATHS['tumor']),
+        'cancer_stage': post_image(HTTP_PATHS['cancer_stage'])
+    }
+
+def benchmark_in_process(targets, inputs, args):
+    from models.model_loader import load_model
+
+    calls = in_process_calls()
+    results = []
+    for target in targets:
+        load_model(TARGET_MODELS[target])
+        batch_sizes = args.batch_sizes if target != 'lung_cancer' else [1]
+        for batch_size in batch_sizes:
+            configure_batching(batch_size)
+            # Warm up graphs and the batcher thread before timing
+            run_load(calls[target], inputs[target], min(8, args.requests), 1)
+            for concurrency in args.concurrency:
+                latencies, errors, wall = run_load(calls[target], inputs[target], args.requests, concurrency)
+                result = {
+                    'mode': 'inprocess', 'target': target,
+                    'concurrency': concurrency, 'batch_size': batch_size,
+                    **summarize(latencies, errors, wall),
+                    'peak_rss_mb': peak_rss_mb()
+                }
+                print_result(result)
+                results.append(result)
+    return results
+
+def benchmark_http(targets, inputs, args):
+    import httpx
+
+    payloads = {
+        target: [png_bytes(image) for image in values] if target != 'lung_cancer' else values
+        for target, values in inputs.items()
+    }
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    results = []
+    with httpx.Client(timeout=args.timeout, limits=limits) as client:
+        calls = http_calls(args.url.rstrip('/'), client)
+        for target in targets:
+            run_load(calls[target], payloads[target], min(8, args.requests), 1)
+            for concurrency in args.concurrency:
+                latencies, errors, wall = run_load(calls[target], payloads[target], args.requests, concurrency)
+                result = {
+                    'mode': 'http', 'target': target,
+                    'concurrency': concurrency, 'batch_size': None,
+                    **summarize(latencies, errors, wall),
+                    'peak_rss_mb': server_peak_rss_mb(args.server_pid) if args.server_pid else None
+                }
+                print_result(result)
+                results.append(result)
+    return results
+
+def cold_start_probe(target):
+    """Runs in a fresh interpreter: import, load and first prediction for one target"""
+    start = time.perf_counter()
+    from models.model_loader import load_model
+    calls = in_process_calls()
+    imported = time.perf_counter()
+
+    load_model(TARGET_MODELS[target])
+    loaded = time.perf_counter()
+
+    sample = make_synthetic_patients(1)[0] if target == 'lung_cancer' else make_synthetic_images(1)[0]
+    calls[target](sample)
+    done = time.perf_counter()
+
+    print(json.dumps({
+        'import_seconds': imported - start,
+        'load_seconds': loaded - imported,
+        'first_prediction_seconds': done - loaded,
+        'peak_rss_mb': peak_rss_mb()
+    }))
+
+def measure_cold_start(target):
+    """Wall time from interpreter launch to the first prediction, in a subprocess"""
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.prediction_suite', '--cold-start-probe', target],
+        capture_output=True, text=True, env=os.environ.copy()
+    )
+    wall = time.perf_counter() - start
+    if completed.returncode != 0:
+        return {'error': completed.stderr.strip().splitlines()[-1:] or ['probe failed']}
+    probe = json.loads(completed.stdout.strip().splitlines()[-1])
+    return {'cold_start_seconds': wall, **probe}
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return 'unknown'
+
+def print_result(result):
+    batch = result['batch_size'] if result['batch_size'] is not None else '-'
+    rss = f"{result['peak_rss_mb']:.0f}" if result['peak_rss_mb'] is not None else '-'
+    print(f"{result['mode']:>9} {result['target']:>12} {result['concurrency']:>5} {batch:>5} "
+          f"{result['throughput_rps']:>9.1f} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} "
+          f"{result['p99_ms']:>9.1f} {rss:>8} {result['errors']:>6}")
+
+def compare(baseline, results, tolerance):
+    """Print throughput and p95 changes against a baseline; returns the regressions"""
+    def key(result):
+        return (result['mode'], result['target'], result['concurrency'], result['batch_size'])
+
+    previous = {key(result): result for result in baseline.get('results', [])}
+    regressions = []
+    print(f"\nCompared with {baseline.get('meta', {}).get('commit', '?')} (tolerance {tolerance:.0%}):")
+    for result in results:
+        old = previous.get(key(result))
+        if old is None or not old['throughput_rps'] or not old['p95_ms']:
+            continue
+        throughput_change = result['throughput_rps'] / old['throughput_rps'] - 1
+        p95_change = result['p95_ms'] / old['p95_ms'] - 1
+        regressed = throughput_change < -tolerance or p95_change > tolerance
+        if regressed:
+            regressions.append(key(result))
+        print(f"  {'REGRESSION' if regressed else 'ok':>10} {' '.join(str(part) for part in key(result))}: "
+              f"throughput {throughput_change:+.1%}, p95 {p95_change:+.1%}")
+    return regressions
+
+def parse_int_list(value):
+    return [int(part) for part in value.split(',') if part.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=('inprocess', 'http', 'both'), default='inprocess')
+    parser.add_argument('--targets', default=','.join(TARGETS))
+    parser.add_argument('--requests', type=int, default=200, help='requests per case')
+    parser.add_argument('--concurrency', type=parse_int_list, default=[1, 4, 16])
+    parser.add_argument('--batch-sizes', type=parse_int_list, default=[1, 8],
+                        help='micro-batch sizes for U-Net and YOLO (in-process only)')
+    parser.add_argument('--real-models', action='store_true', help='use the configured model artifacts')
+    parser.add_argument('--stub-dir', default='benchmarks/.stub_models')
+    parser.add_argument('--url', default='http://127.0.0.1:5001')
+    parser.add_argument('--server-pid', type=int, help='server pid for peak RSS in HTTP mode')
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--skip-cold-start', action='store_true')
+    parser.add_argument('--output', default='benchmarks/results/{commit}.json')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='allowed relative regression')
+    parser.add_argument('--cold-start-probe', choices=TARGETS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cold_start_probe:
+        cold_start_probe(args.cold_start_probe)
+        return
+
+    targets = [target.strip() for target in args.targets.split(',') if target.strip()]
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"Unknown targets: {', '.join(sorted(unknown))}")
+
+    # Model paths and cache settings must be in the environment before config is imported
+    if not args.real_models:
+        from benchmarks.stub_models import build_stub_models
+        os.environ.update(build_stub_models(args.stub_dir))
+    # Repeated synthetic inputs would otherwise be answered from the result cache
+    os.environ['RESULT_CACHE_ENABLED'] = 'false'
+
+    inputs = {
+        'lung_cancer': make_synthetic_patients(args.requests),
+        'tumor': make_synthetic_images(min(args.requests, 64)),
+        'cancer_stage': make_synthetic_images(min(args.requests, 64), seed=1)
+    }
+
+    cold_start = {}
+    if not args.skip_cold_start and args.mode != 'http':
+        for target in targets:
+            cold_start[target] = measure_cold_start(target)
+            print(f"cold start {target:>12}: {json.dumps(cold_start[target])}")
+
+    print(f"{'mode':>9} {'target':>12} {'conc':>5} {'batch':>5} {'rps':>9} {'p50 ms':>9} "
+          f"{'p95 ms':>9} {'p99 ms':>9} {'rss MB':>8} {'errors':>6}")
+    results = []
+    if args.mode in ('inprocess', 'both'):
+        results += benchmark_in_process(targets, inputs, args)
+    if args.mode in ('http', 'both'):
+        results += benchmark_http(targets, inputs, args)
+
+    commit = git_commit()
+    report = {
+        'meta': {
+            'commit': commit,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'models': 'real' if args.real_models else 'stub',
+            'requests': args.requests
+        },
+        'cold_start': cold_start,
+        'results': results
+    }
+
+    if args.output:
+        output = args.output.format(commit=commit)
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.tolerance)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Local stub of the Gemini REST API for load tests
+
+Implements `models/{model}:generateContent` and
+`models/{model}:streamGenerateContent?alt=sse` with a configurable
+latency, so chat and recommendation load tests never call the real API.
+
+Usage (from the backend directory):
+    python -m benchmarks.stub_llm_server --port 8090 --latency-ms 2000
+    GEMINI_API_KEY=stub GEMINI_API_BASE_URL=http://127.0.0.1:8090 uvicorn asgi:app --port 5001
+"""
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = (
+    "**NHẬN ĐỊNH LÂM SÀNG:**\n"
+    "Đây là phản hồi mô phỏng từ máy chủ LLM giả lập dùng cho kiểm thử tải.\n\n"
+    "**KHUYẾN NGHỊ Y KHOA:**\n"
+    "1. Tham khảo ý kiến bác sĩ chuyên khoa\n"
+    "2. Thực hiện các xét nghiệm bổ sung\n\n"
+    "**LƯU Ý QUAN TRỌNG:**\n"
+    "• Kết quả chỉ mang tính chất tham khảo"
+)
+
+def candidate_payload(text, finished=True):
+    payload = {
+        'candidates': [{
+            'content': {'role': 'model', 'parts': [{'text': text}]},
+            'index': 0
+        }]
+    }
+    if finished:
+        payload['candidates'][0]['finishReason'] = 'STOP'
+        payload['usageMetadata'] = {'candidatesTokenCount': len(REPLY.split())}
+    return payload
+
+class StubGeminiHandler(BaseHTTPRequestHandler):
+    latency = 1.0
+    chunks = 8
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+
+        if ':streamGenerateContent' in self.path:
+            self._stream()
+        elif ':generateContent' in self.path:
+            time.sleep(self.latency)
+            body = json.dumps(candidate_payload(REPLY)).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_error(404)
+
+    def _stream(self):
+        words = REPLY.split(' ')
+        per_chunk = max(1, len(words) // self.chunks)
+        pieces = [' '.join(words[i:i + per_chunk]) + ' ' for i in range(0, len(words), per_chunk)]
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        for i, piece in enumerate(pieces):
+            time.sleep(self.latency / len(pieces))
+            event = json.dumps(candidate_payload(piece, finished=i == len(pieces) - 1))
+            self.wfile.write(f"data: {event}\r\n\r\n".encode('utf-8'))
+            self.wfile.flush()
+        self.close_connection = True
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency-ms', type=float, default=2000.0, help='total generation time per request')
+    parser.add_argument('--chunks', type=int, default=8, help='number of SSE chunks when streaming')
+    args = parser.parse_args()
+
+    StubGeminiHandler.latency = args.latency_ms / 1000.0
+    StubGeminiHandler.chunks = args.chunks
+    server = ThreadingHTTPServer((args.host, args.port), StubGeminiHandler)
+    server.daemon_threads = True
+    print(f"Stub Gemini API listening on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+if __name__ == '__main__':
+    main()
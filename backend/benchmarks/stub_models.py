@@ -0,0 +1,82 @@
+"""
+Tiny stand-in models with the same interfaces as the real artifacts
+
+Lets the benchmarks (and CI) run without the trained U-Net, XGBoost and YOLO
+files: the models are untrained and their predictions are meaningless, but
+they load through the same code paths and take the same inputs and outputs.
+
+Usage (from the backend directory):
+    python -m benchmarks.stub_models --output benchmarks/.stub_models
+"""
+import argparse
+import os
+import numpy as np
+from models.risk_scorer import FEATURE_ORDER
+
+STUB_FILES = {
+    'UNET_MODEL_PATH': 'unet_stub.h5',
+    'XGBOOST_MODEL_PATH': 'xgb_stub.pkl',
+    'SCALER_PATH': 'scaler_stub.pkl',
+    'YOLO_MODEL_PATH': 'yolo_cls_stub.pt'
+}
+
+def build_unet_stub(path, image_size=(256, 256)):
+    """Two-layer fully convolutional net: (N, H, W, 1) -> sigmoid (N, H, W, 1)"""
+    import tensorflow as tf
+
+    inputs = tf.keras.Input(shape=(image_size[1], image_size[0], 1))
+    hidden = tf.keras.layers.Conv2D(4, 3, padding='same', activation='relu')(inputs)
+    outputs = tf.keras.layers.Conv2D(1, 1, activation='sigmoid')(hidden)
+    tf.keras.Model(inputs, outputs).save(path)
+
+def build_xgboost_stub(model_path, scaler_path, seed=0):
+    """Small 3-class XGBClassifier and StandardScaler fitted on random patients"""
+    import joblib
+    from sklearn.preprocessing import StandardScaler
+    from xgboost import XGBClassifier
+
+    rng = np.random.default_rng(seed)
+    features = rng.integers(1, 9, size=(300, len(FEATURE_ORDER))).astype(np.float64)
+    labels = np.arange(len(features)) % 3
+
+    scaler = StandardScaler().fit(features)
+    model = XGBClassifier(n_estimators=20, max_depth=3, objective='multi:softprob')
+    model.fit(scaler.transform(features), labels)
+
+    joblib.dump(model, model_path)
+    joblib.dump(scaler, scaler_path)
+
+def build_yolo_stub(path, num_classes=3, image_size=64):
+    """Untrained YOLOv8n classification model saved as an ultralytics checkpoint"""
+    import torch
+    from ultralytics.nn.tasks import ClassificationModel
+
+    model = ClassificationModel('yolov8n-cls.yaml', nc=num_classes, verbose=False)
+    model.names = {index: f"class_{index}" for index in range(num_classes)}
+    torch.save({'model': model, 'train_args': {'task': 'classify', 'imgsz': image_size}}, path)
+
+def build_stub_models(directory, force=False):
+    """Create any missing stand-in models and return {config name: path}"""
+    os.makedirs(directory, exist_ok=True)
+    paths = {name: os.path.join(directory, filename) for name, filename in STUB_FILES.items()}
+
+    if force or not os.path.exists(paths['UNET_MODEL_PATH']):
+        build_unet_stub(paths['UNET_MODEL_PATH'])
+    if force or not (os.path.exists(paths['XGBOOST_MODEL_PATH']) and os.path.exists(paths['SCALER_PATH'])):
+        build_xgboost_stub(paths['XGBOOST_MODEL_PATH'], paths['SCALER_PATH'])
+    if force or not os.path.exists(paths['YOLO_MODEL_PATH']):
+        build_yolo_stub(paths['YOLO_MODEL_PATH'])
+
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default='benchmarks/.stub_models')
+    parser.add_argument('--force', action='store_true', help='rebuild models that already exist')
+    args = parser.parse_args()
+
+    for name, path in build_stub_models(args.output, args.force).items():
+        print(f"{name}={path}")
+
+if __name__ == '__main__':
+    main()
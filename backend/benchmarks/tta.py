@@ -0,0 +1,99 @@
+"""
+Test-time augmentation cost: default path against tta=True
+
+Runs `predict_tumor_segmentation` and `predict_cancer_stage` on the same
+synthetic slices with and without TTA and reports throughput, p50/p95
+latency and the slowdown factor. The augment/merge NumPy work on its own
+(no model) is timed separately. Stand-in models are used unless
+`--real-models` is given; the result cache is disabled.
+
+Usage (from the backend directory):
+    python -m benchmarks.tta --requests 100 --concurrency 1,4 --transforms hflip,vflip
+    python -m benchmarks.tta --transforms hflip,vflip,rot90,rot180,rot270 --targets tumor
+"""
+import argparse
+import os
+import time
+import numpy as np
+from benchmarks.prediction_suite import (
+    TARGET_MODELS,
+    configure_batching,
+    make_synthetic_images,
+    parse_int_list,
+    run_load,
+    summarize
+)
+
+TTA_TARGETS = ('tumor', 'cancer_stage')
+
+def tta_calls(tta, threshold=0.5):
+    """Prediction functions as the routes call them, with or without TTA"""
+    from models.unet_model import predict_tumor_segmentation
+    from models.yolo_model import predict_cancer_stage
+
+    return {
+        'tumor': lambda image: predict_tumor_segmentation(image, threshold, tta=tta),
+        'cancer_stage': lambda image: predict_cancer_stage(image, tta=tta)
+    }
+
+def time_augment_merge(repeats=200):
+    """Milliseconds per slice for augment_batch + merge_augmented alone"""
+    from config import Config
+    from utils.tta_utils import tta_plan, augment_batch, merge_augmented
+
+    plan = tta_plan(Config.TTA_TRANSFORMS)
+    width, height = Config.IMAGE_SIZE
+    batch = np.random.default_rng(0).random((1, height, width, 1), dtype=np.float32)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        merge_augmented(augment_batch(batch, plan)[..., 0], plan)
+    return (time.perf_counter() - start) / repeats * 1000.0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--targets', default=','.join(TTA_TARGETS))
+    parser.add_argument('--requests', type=int, default=100, help='requests per case')
+    parser.add_argument('--concurrency', type=parse_int_list, default=[1, 4])
+    parser.add_argument('--batch-size', type=int, default=1, help='micro-batch size for the default path')
+    parser.add_argument('--transforms', help='TTA_TRANSFORMS to use (default: configured)')
+    parser.add_argument('--real-models', action='store_true', help='use the configured model artifacts')
+    parser.add_argument('--stub-dir', default='benchmarks/.stub_models')
+    args = parser.parse_args()
+
+    targets = [target.strip() for target in args.targets.split(',') if target.strip()]
+    unknown = set(targets) - set(TTA_TARGETS)
+    if unknown:
+        parser.error(f"Unknown targets: {', '.join(sorted(unknown))}")
+
+    # Environment first: config reads it on import
+    if not args.real_models:
+        from benchmarks.stub_models import build_stub_models
+        os.environ.update(build_stub_models(args.stub_dir))
+    os.environ['RESULT_CACHE_ENABLED'] = 'false'
+    if args.transforms:
+        os.environ['TTA_TRANSFORMS'] = args.transforms
+
+    from config import Config
+    from models.model_loader import load_model
+
+    configure_batching(args.batch_size)
+    images = make_synthetic_images(min(args.requests, 64))
+    calls = {False: tta_calls(False), True: tta_calls(True)}
+
+    print(f"TTA transforms: {', '.join(Config.TTA_TRANSFORMS)}")
+    print(f"augment + merge alone: {time_augment_merge():.2f} ms/slice")
+    print(f"{'target':>12} {'conc':>5} {'tta':>5} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'slowdown':>9}")
+    for target in targets:
+        load_model(TARGET_MODELS[target])
+        for concurrency in args.concurrency:
+            baseline = None
+            for tta in (False, True):
+                run_load(calls[tta][target], images, min(8, args.requests), 1)
+                result = summarize(*run_load(calls[tta][target], images, args.requests, concurrency))
+                baseline = baseline or result
+                slowdown = result['p50_ms'] / baseline['p50_ms'] if baseline['p50_ms'] else 0.0
+                print(f"{target:>12} {concurrency:>5} {'on' if tta else 'off':>5} {result['throughput_rps']:>9.1f} "
+                      f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {slowdown:>8.2f}x")
+
+if __name__ == '__main__':
+    main()
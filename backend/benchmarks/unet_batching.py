@@ -0,0 +1,106 @@
+"""
+U-Net micro-batching benchmark: throughput and latency against batch size
+
+Usage (from the backend directory):
+    python -m benchmarks.unet_batching --requests 256 --concurrency 16 --batch-sizes 1,2,4,8,16
+"""
+import argparse
+import threading
+import time
+import numpy as np
+from PIL import Image
+from models.batching import MicroBatcher
+from models.unet_model import (
+    preprocess_image_for_unet,
+    predict_probability_maps,
+    summarize_probability_map,
+    _predict_probability_batch
+)
+from models.model_loader import get_unet_model
+
+def make_synthetic_images(count, size=(512, 512), seed=0):
+    """Create random grayscale CT-like images"""
+    rng = np.random.default_rng(seed)
+    return [
+        Image.fromarray(rng.integers(0, 256, size=size, dtype=np.uint8), mode='L')
+        for _ in range(count)
+    ]
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+def run_case(images, batch_size, max_wait_ms, concurrency, threshold=0.5):
+    """Fire all images from `concurrency` threads and record per-request latency"""
+    if batch_size <= 1:
+        def infer(processed):
+            return predict_probability_maps(processed)[0]
+        batcher = None
+    else:
+        batcher = MicroBatcher(
+            _predict_probability_batch,
+            max_batch_size=batch_size,
+            max_wait_ms=max_wait_ms,
+            name=f'bench-unet-{batch_size}'
+        )
+        def infer(processed):
+            return batcher(processed[0])
+
+    latencies = []
+    latencies_lock = threading.Lock()
+    next_index = [0]
+
+    def worker():
+        while True:
+            with latencies_lock:
+                index = next_index[0]
+                next_index[0] += 1
+            if index >= len(images):
+                return
+            start = time.perf_counter()
+            processed = preprocess_image_for_unet(images[index])
+            summarize_probability_map(infer(processed), threshold)
+            elapsed = time.perf_counter() - start
+            with latencies_lock:
+                latencies.append(elapsed * 1000.0)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    wall_start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - wall_start
+
+    result = {
+        'batch_size': batch_size,
+        'requests': len(latencies),
+        'throughput_rps': len(latencies) / wall if wall else 0.0,
+        'p50_ms': percentile(latencies, 50),
+        'p99_ms': percentile(latencies, 99)
+    }
+    if batcher is not None:
+        result['average_batch_size'] = batcher.stats()['average_batch_size']
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=256)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--batch-sizes', default='1,2,4,8,16')
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    args = parser.parse_args()
+
+    # Load the model and warm up the graph before timing
+    get_unet_model()
+    images = make_synthetic_images(args.requests)
+    predict_probability_maps(preprocess_image_for_unet(images[0]))
+
+    print(f"{'batch':>6} {'rps':>10} {'p50 ms':>10} {'p99 ms':>10} {'avg batch':>10}")
+    for batch_size in [int(b) for b in args.batch_sizes.split(',') if b.strip()]:
+        result = run_case(images, batch_size, args.max_wait_ms, args.concurrency)
+        print(f"{result['batch_size']:>6} {result['throughput_rps']:>10.1f} "
+              f"{result['p50_ms']:>10.1f} {result['p99_ms']:>10.1f} "
+              f"{result.get('average_batch_size', 1.0):>10.2f}")
+
+if __name__ == '__main__':
+    main()
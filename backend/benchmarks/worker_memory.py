@@ -0,0 +1,83 @@
+"""
+Worker memory harness: real RSS and PSS of each gunicorn worker
+
+RSS counts shared pages in every process that maps them; PSS divides each
+shared page by the number of processes sharing it, so the PSS total is the
+real memory cost of the deployment. Compare a run with PREFORK_MODELS set
+against one with PREFORK_MODELS= (empty) to see the saving.
+
+Usage (Linux, from the backend directory):
+    gunicorn -c gunicorn.conf.py wsgi:app --pid /tmp/serna.pid &
+    python -m benchmarks.worker_memory --pidfile /tmp/serna.pid
+"""
+import argparse
+import json
+import os
+
+SMAPS_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+def read_smaps_rollup(pid):
+    """Read memory counters (in KiB) from /proc/<pid>/smaps_rollup"""
+    values = {field: 0 for field in SMAPS_FIELDS}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            key = parts[0].rstrip(':')
+            if key in values:
+                values[key] = int(parts[1])
+    values['Uss'] = values['Private_Clean'] + values['Private_Dirty']
+    return values
+
+def child_pids(pid):
+    """List direct children of a process"""
+    children = []
+    task_dir = f"/proc/{pid}/task"
+    for tid in os.listdir(task_dir):
+        try:
+            with open(f"{task_dir}/{tid}/children") as f:
+                children.extend(int(child) for child in f.read().split())
+        except OSError:
+            continue
+    return sorted(set(children))
+
+def measure(master_pid):
+    """Collect per-process memory for the master and its workers"""
+    processes = [('master', master_pid)] + [('worker', pid) for pid in child_pids(master_pid)]
+    rows = []
+    for role, pid in processes:
+        try:
+            rows.append({'role': role, 'pid': pid, **read_smaps_rollup(pid)})
+        except OSError:
+            continue
+
+    totals = {field: sum(row[field] for row in rows) for field in ('Rss', 'Pss', 'Uss')}
+    return {'processes': rows, 'totals_kib': totals}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--pid', type=int, help='gunicorn master pid')
+    group.add_argument('--pidfile', help='gunicorn pid file')
+    parser.add_argument('--json', action='store_true', help='print JSON instead of a table')
+    args = parser.parse_args()
+
+    master_pid = args.pid
+    if args.pidfile:
+        with open(args.pidfile) as f:
+            master_pid = int(f.read().strip())
+
+    report = measure(master_pid)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{'role':<8} {'pid':>8} {'RSS MiB':>10} {'PSS MiB':>10} {'USS MiB':>10} {'shared MiB':>11}")
+    for row in report['processes']:
+        shared = row['Shared_Clean'] + row['Shared_Dirty']
+        print(f"{row['role']:<8} {row['pid']:>8} {row['Rss'] / 1024:>10.1f} {row['Pss'] / 1024:>10.1f} "
+              f"{row['Uss'] / 1024:>10.1f} {shared / 1024:>11.1f}")
+    totals = report['totals_kib']
+    print(f"{'total':<8} {'':>8} {totals['Rss'] / 1024:>10.1f} {totals['Pss'] / 1024:>10.1f} {totals['Uss'] / 1024:>10.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Fast XGBoost scorer benchmark: single-row latency and label parity
+
+Compares the compiled scorer used by `predict_lung_cancer_risk` against the
+reference DataFrame path on random patients and fails if any label differs.
+
+Usage (from the backend directory):
+    python -m benchmarks.xgboost_scorer --patients 2000
+"""
+import argparse
+import sys
+import time
+import numpy as np
+from models.risk_scorer import FEATURE_ORDER
+from models.xgboost_model import predict_lung_cancer_risk, predict_lung_cancer_risk_dataframe
+
+def make_synthetic_patients(count, seed=0):
+    """Random patients: age 14-80, gender 0/1, health factors 1-8"""
+    rng = np.random.default_rng(seed)
+    patients = []
+    for _ in range(count):
+        patient = {feature: int(rng.integers(1, 9)) for feature in FEATURE_ORDER}
+        patient['age'] = int(rng.integers(14, 81))
+        patient['gender'] = int(rng.integers(0, 2))
+        patients.append(patient)
+    return patients
+
+def time_per_call_us(fn, patients):
+    start = time.perf_counter()
+    for patient in patients:
+        fn(patient)
+    return (time.perf_counter() - start) / len(patients) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--patients', type=int, default=2000)
+    args = parser.parse_args()
+
+    patients = make_synthetic_patients(args.patients)
+
+    # Label parity
+    mismatches = 0
+    for patient in patients:
+        if predict_lung_cancer_risk(patient) != predict_lung_cancer_risk_dataframe(patient):
+            mismatches += 1
+
+    dataframe_us = time_per_call_us(predict_lung_cancer_risk_dataframe, patients)
+    fast_us = time_per_call_us(predict_lung_cancer_risk, patients)
+
+    print(f"DataFrame path: {dataframe_us:8.1f} us/request")
+    print(f"Fast scorer:    {fast_us:8.1f} us/request ({dataframe_us / fast_us:.1f}x)")
+    print(f"Label mismatches: {mismatches}/{len(patients)}")
+
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
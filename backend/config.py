@@ -13,6 +13,30 @@ def _to_bool(value: str | None, default: bool = False) -> bool:
     return value.strip().lower() in {"1", "true", "yes", "on"}
 
 
+def _to_int(value: str | None, default: int) -> int:
+    if value is None or not value.strip():
+        return default
+    return int(value)
+
+
+def _to_float(value: str | None, default: float) -> float:
+    if value is None or not value.strip():
+        return default
+    return float(value)
+
+
+def _to_square_size(value: str | None, default: int) -> tuple[int, int] | None:
+    size = _to_int(value, default)
+    return (size, size) if size > 0 else None
+
+
+def _parse_model_list(name: str, default: tuple[str, ...]) -> tuple[str, ...]:
+    models = os.environ.get(name)
+    if models is None:
+        return default
+    return tuple(model.strip().lower() for model in models.split(",") if model.strip())
+
+
 def _parse_cors_origins() -> list[str]:
     origins = os.environ.get("CORS_ORIGINS")
     if not origins:
@@ -28,20 +52,138 @@ class Config:
     # CORS settings
     CORS_ORIGINS = _parse_cors_origins()
     
-    # Model paths
-    UNET_MODEL_PATH = 'models/improved_unet_final.h5'
-    XGBOOST_MODEL_PATH = 'models/lung_cancer_xgb_model.pkl'
-    SCALER_PATH = 'models/lung_cancer_scaler.pkl'
-    YOLO_MODEL_PATH = 'models/lungcancer-cls.pt'
+    # Model paths (overridable, e.g. to point benchmarks at stand-in models)
+    UNET_MODEL_PATH = os.environ.get("UNET_MODEL_PATH") or 'models/improved_unet_final.h5'
+    XGBOOST_MODEL_PATH = os.environ.get("XGBOOST_MODEL_PATH") or 'models/lung_cancer_xgb_model.pkl'
+    SCALER_PATH = os.environ.get("SCALER_PATH") or 'models/lung_cancer_scaler.pkl'
+    YOLO_MODEL_PATH = os.environ.get("YOLO_MODEL_PATH") or 'models/lungcancer-cls.pt'
+    # U-Net runtime: keras, tf_function (traced graph), tflite or onnx (see scripts/convert_unet.py)
+    UNET_BACKEND = os.environ.get("UNET_BACKEND", "keras").strip().lower()
+    UNET_TFLITE_PATH = os.environ.get("UNET_TFLITE_PATH") or 'models/improved_unet_final.tflite'
+    UNET_ONNX_PATH = os.environ.get("UNET_ONNX_PATH") or 'models/improved_unet_final.onnx'
+    # YOLO runtime: ultralytics (PyTorch), onnx or openvino (see scripts/export_yolo.py)
+    YOLO_RUNTIME = os.environ.get("YOLO_RUNTIME", "ultralytics").strip().lower()
+    YOLO_ONNX_PATH = os.environ.get("YOLO_ONNX_PATH") or 'models/lungcancer-cls.onnx'
+    YOLO_OPENVINO_PATH = os.environ.get("YOLO_OPENVINO_PATH") or 'models/lungcancer-cls_openvino_model/lungcancer-cls.xml'
+    # Input size of the exported classifier (0 = read it from the export's metadata)
+    YOLO_IMAGE_SIZE = _to_int(os.environ.get("YOLO_IMAGE_SIZE"), default=0)
+
+    # Model loading settings
+    # ENABLED_MODELS: comma-separated subset of unet,xgboost,yolo (empty = none)
+    ENABLED_MODELS = _parse_model_list("ENABLED_MODELS", default=("unet", "xgboost", "yolo"))
+    # MODEL_WARMUP: eager (block startup), background (parallel threads) or lazy (first request)
+    MODEL_WARMUP = os.environ.get("MODEL_WARMUP", "background").strip().lower()
+    # PREFORK_MODELS: groups loaded once in the gunicorn master and shared copy-on-write.
+    # Only XGBoost by default: U-Net (TensorFlow/ONNX/TFLite) and YOLO get a copy per worker.
+    PREFORK_MODELS = _parse_model_list("PREFORK_MODELS", default=("xgboost",))
     
     # API settings
     GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
     GEMINI_MODEL = 'gemini-2.5-flash'
+    # Override to point at a local stub LLM server (e.g. http://127.0.0.1:8090)
+    GEMINI_API_BASE_URL = os.environ.get('GEMINI_API_BASE_URL') or None
+    GEMINI_TIMEOUT = _to_float(os.environ.get("GEMINI_TIMEOUT"), default=120.0)
+    # Seconds without a chunk before the chat stream sends an SSE heartbeat
+    CHAT_HEARTBEAT_SECONDS = _to_float(os.environ.get("CHAT_HEARTBEAT_SECONDS"), default=15.0)
+    # Server-side chat sessions: 'memory' or 'sqlite' (persists across restarts and workers)
+    CHAT_SESSION_BACKEND = os.environ.get("CHAT_SESSION_BACKEND", "memory").strip().lower()
+    CHAT_SESSION_DB_PATH = os.environ.get("CHAT_SESSION_DB_PATH", "data/chat_sessions.db")
+    CHAT_SESSION_MAX_SESSIONS = _to_int(os.environ.get("CHAT_SESSION_MAX_SESSIONS"), default=1000)
+    CHAT_SESSION_TTL_SECONDS = _to_int(os.environ.get("CHAT_SESSION_TTL_SECONDS"), default=3600)
+    CHAT_SESSION_TOKEN_BUDGET = _to_int(os.environ.get("CHAT_SESSION_TOKEN_BUDGET"), default=8000)
+    CHAT_SESSION_MAX_BYTES = _to_int(os.environ.get("CHAT_SESSION_MAX_BYTES"), default=256 * 1024)
+    # Recommendation memoization: 'memory' or 'sqlite' persistent tier
+    RECOMMENDATION_CACHE_ENABLED = _to_bool(os.environ.get("RECOMMENDATION_CACHE_ENABLED"), default=True)
+    RECOMMENDATION_CACHE_BACKEND = os.environ.get("RECOMMENDATION_CACHE_BACKEND", "memory").strip().lower()
+    RECOMMENDATION_CACHE_DB_PATH = os.environ.get("RECOMMENDATION_CACHE_DB_PATH", "data/recommendation_cache.db")
+    RECOMMENDATION_CACHE_MAX_ITEMS = _to_int(os.environ.get("RECOMMENDATION_CACHE_MAX_ITEMS"), default=1024)
+    RECOMMENDATION_CACHE_MAX_BYTES = _to_int(os.environ.get("RECOMMENDATION_CACHE_MAX_BYTES"), default=64 * 1024 * 1024)
+    RECOMMENDATION_CACHE_TTL_SECONDS = _to_int(os.environ.get("RECOMMENDATION_CACHE_TTL_SECONDS"), default=86400)
+    
+    # Upload limits: request bodies, image uploads and decoded pixel count
+    MAX_CONTENT_LENGTH = _to_int(os.environ.get("MAX_CONTENT_LENGTH"), default=256 * 1024 * 1024)
+    MAX_UPLOAD_BYTES = _to_int(os.environ.get("MAX_UPLOAD_BYTES"), default=20 * 1024 * 1024)
+    MAX_IMAGE_PIXELS = _to_int(os.environ.get("MAX_IMAGE_PIXELS"), default=50_000_000)
+    # JPEGs are decoded at the smallest 1/2, 1/4 or 1/8 scale that covers this size (0 disables)
+    UPLOAD_DRAFT_SIZE = _to_square_size(os.environ.get("UPLOAD_DRAFT_SIZE"), default=512)
+    
+    # Background jobs: SQLite queue, worker threads per process (0 = submit only), retries and result TTL
+    JOB_DB_PATH = os.environ.get("JOB_DB_PATH", "data/jobs.db")
+    JOB_SPOOL_DIR = os.environ.get("JOB_SPOOL_DIR", "data/job_inputs")
+    JOB_WORKERS = _to_int(os.environ.get("JOB_WORKERS"), default=2)
+    JOB_MAX_ATTEMPTS = _to_int(os.environ.get("JOB_MAX_ATTEMPTS"), default=3)
+    JOB_RETRY_BACKOFF_SECONDS = _to_float(os.environ.get("JOB_RETRY_BACKOFF_SECONDS"), default=5.0)
+    JOB_LEASE_SECONDS = _to_float(os.environ.get("JOB_LEASE_SECONDS"), default=300.0)
+    JOB_RESULT_TTL_SECONDS = _to_int(os.environ.get("JOB_RESULT_TTL_SECONDS"), default=86400)
+    JOB_POLL_INTERVAL_SECONDS = _to_float(os.environ.get("JOB_POLL_INTERVAL_SECONDS"), default=1.0)
+    JOB_PURGE_INTERVAL_SECONDS = _to_float(os.environ.get("JOB_PURGE_INTERVAL_SECONDS"), default=300.0)
+    JOB_EVENTS_POLL_SECONDS = _to_float(os.environ.get("JOB_EVENTS_POLL_SECONDS"), default=0.5)
+    # Prediction history: append-only SQLite log written in batches by a background thread
+    HISTORY_ENABLED = _to_bool(os.environ.get("HISTORY_ENABLED"), default=True)
+    HISTORY_DB_PATH = os.environ.get("HISTORY_DB_PATH", "data/prediction_history.db")
+    HISTORY_BATCH_SIZE = _to_int(os.environ.get("HISTORY_BATCH_SIZE"), default=100)
+    HISTORY_FLUSH_INTERVAL_SECONDS = _to_float(os.environ.get("HISTORY_FLUSH_INTERVAL_SECONDS"), default=0.5)
+    HISTORY_QUEUE_MAX = _to_int(os.environ.get("HISTORY_QUEUE_MAX"), default=10000)
+    # Keep mask_image / overlay_image in stored results (large; off by default)
+    HISTORY_STORE_IMAGES = _to_bool(os.environ.get("HISTORY_STORE_IMAGES"), default=False)
+    HISTORY_PAGE_SIZE = _to_int(os.environ.get("HISTORY_PAGE_SIZE"), default=50)
+    HISTORY_MAX_PAGE_SIZE = _to_int(os.environ.get("HISTORY_MAX_PAGE_SIZE"), default=500)
+    # Supabase access tokens: HS256 secret (legacy projects) or the project URL for JWKS signing keys
+    SUPABASE_URL = os.environ.get("SUPABASE_URL", "")
+    SUPABASE_JWT_SECRET = os.environ.get("SUPABASE_JWT_SECRET", "")
+    SUPABASE_JWT_AUDIENCE = os.environ.get("SUPABASE_JWT_AUDIENCE", "authenticated")
     
     # Image processing settings
     IMAGE_SIZE = (256, 256)
     THRESHOLD_DEFAULT = 0.5
-    
+    # Tumor mask output: png (1-bit, fast zlib level), webp, rle or polygon
+    MASK_ENCODING = os.environ.get("MASK_ENCODING", "png").strip().lower()
+    MASK_PNG_COMPRESS_LEVEL = _to_int(os.environ.get("MASK_PNG_COMPRESS_LEVEL"), default=1)
+    MASK_MAX_COMPONENTS = _to_int(os.environ.get("MASK_MAX_COMPONENTS"), default=32)
+    # Tiled segmentation (tiled=true): tile overlap in pixels, tiles per forward pass, tile limit
+    UNET_TILE_OVERLAP = _to_int(os.environ.get("UNET_TILE_OVERLAP"), default=64)
+    UNET_TILE_BATCH_SIZE = _to_int(os.environ.get("UNET_TILE_BATCH_SIZE"), default=16)
+    UNET_TILE_MAX_TILES = _to_int(os.environ.get("UNET_TILE_MAX_TILES"), default=256)
+    # Test-time augmentation (tta=true): copies added to the original, from hflip, vflip, rot90, rot180, rot270
+    TTA_TRANSFORMS = _parse_model_list("TTA_TRANSFORMS", default=("hflip", "vflip"))
+    # CT volume segmentation: slices per U-Net batch, slice limit and HU window (lung window)
+    VOLUME_BATCH_SIZE = _to_int(os.environ.get("VOLUME_BATCH_SIZE"), default=16)
+    VOLUME_MAX_SLICES = _to_int(os.environ.get("VOLUME_MAX_SLICES"), default=2048)
+    VOLUME_MAX_VOXELS = _to_int(os.environ.get("VOLUME_MAX_VOXELS"), default=512 * 512 * 1024)
+    MAX_VOLUME_BYTES = _to_int(os.environ.get("MAX_VOLUME_BYTES"), default=256 * 1024 * 1024)
+    VOLUME_WINDOW_CENTER = _to_float(os.environ.get("VOLUME_WINDOW_CENTER"), default=-600.0)
+    VOLUME_WINDOW_WIDTH = _to_float(os.environ.get("VOLUME_WINDOW_WIDTH"), default=1500.0)
+
+    # Inference batching settings
+    UNET_BATCH_MAX_SIZE = _to_int(os.environ.get("UNET_BATCH_MAX_SIZE"), default=8)
+    UNET_BATCH_MAX_WAIT_MS = _to_float(os.environ.get("UNET_BATCH_MAX_WAIT_MS"), default=5.0)
+    YOLO_BATCH_MAX_SIZE = _to_int(os.environ.get("YOLO_BATCH_MAX_SIZE"), default=8)
+    YOLO_BATCH_MAX_WAIT_MS = _to_float(os.environ.get("YOLO_BATCH_MAX_WAIT_MS"), default=5.0)
+
+    # Inference worker pools (kind: thread or process)
+    INFERENCE_EXECUTOR_KIND = os.environ.get("INFERENCE_EXECUTOR_KIND", "thread").strip().lower()
+    INFERENCE_WORKERS = {
+        'unet': _to_int(os.environ.get("UNET_WORKERS"), default=4),
+        'yolo': _to_int(os.environ.get("YOLO_WORKERS"), default=4),
+        'xgboost': _to_int(os.environ.get("XGB_WORKERS"), default=2)
+    }
+    INFERENCE_MAX_QUEUE = _to_int(os.environ.get("INFERENCE_MAX_QUEUE"), default=64)
+    INFERENCE_TIMEOUT = _to_float(os.environ.get("INFERENCE_TIMEOUT"), default=60.0)
+    INFERENCE_RETRY_AFTER = _to_int(os.environ.get("INFERENCE_RETRY_AFTER"), default=1)
+    # Framework thread pools (0 = framework default)
+    INTRA_OP_THREADS = _to_int(os.environ.get("INTRA_OP_THREADS"), default=0)
+    INTER_OP_THREADS = _to_int(os.environ.get("INTER_OP_THREADS"), default=0)
+
+    # Inference result cache settings
+    RESULT_CACHE_ENABLED = _to_bool(os.environ.get("RESULT_CACHE_ENABLED"), default=True)
+    RESULT_CACHE_MAX_ITEMS = _to_int(os.environ.get("RESULT_CACHE_MAX_ITEMS"), default=512)
+    RESULT_CACHE_MAX_BYTES = _to_int(os.environ.get("RESULT_CACHE_MAX_BYTES"), default=256 * 1024 * 1024)
+    RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR") or None
+    RESULT_CACHE_DISK_MAX_BYTES = _to_int(os.environ.get("RESULT_CACHE_DISK_MAX_BYTES"), default=1024 * 1024 * 1024)
+
+    # Bulk risk scoring settings
+    XGB_BATCH_CHUNK_SIZE = _to_int(os.environ.get("XGB_BATCH_CHUNK_SIZE"), default=4096)
+
     # Response settings
     MAX_RECOMMENDATIONS = 5
     
@@ -0,0 +1,30 @@
+"""
+Gunicorn configuration with pre-fork model sharing
+
+The app is imported once in the master (preload_app), which loads the
+PREFORK_MODELS before forking. Workers inherit those models copy-on-write
+instead of each holding a full copy. Models that are not fork-safe
+(TensorFlow U-Net) are loaded in each worker after fork.
+"""
+import os
+from config import Config
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5001")
+workers = int(os.environ.get("WEB_CONCURRENCY", "4"))
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+
+# Load the app (and the shared models) in the master before forking
+preload_app = bool(Config.PREFORK_MODELS)
+
+def post_fork(server, worker):
+    """Warm the per-worker models and start job workers once the worker process exists"""
+    from models.model_loader import load_all_models, warm_models_async
+    from services.job_queue import start_job_workers
+
+    if Config.MODEL_WARMUP == 'eager':
+        load_all_models()
+    elif Config.MODEL_WARMUP == 'background':
+        warm_models_async()
+
+    start_job_workers()
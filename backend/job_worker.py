@@ -0,0 +1,34 @@
+"""
+Standalone job worker (no HTTP server)
+
+    JOB_WORKERS=4 python job_worker.py
+
+Runs the job worker pool against the shared SQLite queue, so API processes
+can run with JOB_WORKERS=0 and leave long jobs to dedicated workers.
+"""
+import signal
+import threading
+from config import Config
+from models.model_loader import warm_models_async
+from services.job_queue import start_job_workers
+
+def main():
+    if Config.JOB_WORKERS <= 0:
+        raise SystemExit("Set JOB_WORKERS to at least 1 to run a job worker")
+
+    if Config.MODEL_WARMUP != 'lazy':
+        warm_models_async()
+
+    pool = start_job_workers()
+    print(f"Job worker running with {pool.workers} threads on {Config.JOB_DB_PATH}")
+
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+    signal.signal(signal.SIGINT, lambda *_: stopped.set())
+    stopped.wait()
+
+    print("Stopping job worker...")
+    pool.stop(timeout=30)
+
+if __name__ == '__main__':
+    main()
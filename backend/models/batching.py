@@ -0,0 +1,126 @@
+"""
+Dynamic micro-batching for model inference
+"""
+import queue
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from utils.metrics import REGISTRY
+
+_BATCHERS = weakref.WeakSet()
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-item requests into one batched model call
+
+    `batch_fn` receives a list of items and must return a list of results in
+    the same order. A background thread waits for the first item, then keeps
+    collecting until `max_batch_size` items are queued or `max_wait_ms` has
+    elapsed, and runs `batch_fn` once for the whole group.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=8, max_wait_ms=5.0, name='batcher'):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+        # Counters for monitoring
+        self.batches_run = 0
+        self.items_processed = 0
+        self.largest_batch = 0
+
+        _BATCHERS.add(self)
+
+    def submit(self, item):
+        """Queue an item and return a Future for its result"""
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item, timeout=None):
+        """Queue an item and block until its result is available"""
+        return self.submit(item).result(timeout=timeout)
+
+    def stats(self):
+        """Return batching counters"""
+        avg_batch = self.items_processed / self.batches_run if self.batches_run else 0.0
+        return {
+            'name': self.name,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'batches_run': self.batches_run,
+            'items_processed': self.items_processed,
+            'average_batch_size': avg_batch,
+            'largest_batch': self.largest_batch,
+            'queue_depth': self._queue.qsize()
+        }
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _collect_batch(self):
+        """Block for the first item, then gather more until full or the deadline passes"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+
+            # Skip requests whose callers already gave up
+            batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            items = [item for item, _ in batch]
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(
+                        f"{self.name}: batch function returned {len(results)} results for {len(items)} items"
+                    )
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+            self.batches_run += 1
+            self.items_processed += len(items)
+            self.largest_batch = max(self.largest_batch, len(items))
+
+def _collect_batcher_stats(field):
+    return lambda: [((batcher.name,), batcher.stats()[field]) for batcher in list(_BATCHERS)]
+
+REGISTRY.callback('inference_batch_queue_depth', 'Items waiting to join a micro-batch',
+                  _collect_batcher_stats('queue_depth'), labelnames=('batcher',))
+REGISTRY.callback('inference_batches_total', 'Batched model calls run by each micro-batcher',
+                  _collect_batcher_stats('batches_run'), labelnames=('batcher',), kind='counter')
+REGISTRY.callback('inference_batch_items_total', 'Items processed by each micro-batcher',
+                  _collect_batcher_stats('items_processed'), labelnames=('batcher',), kind='counter')
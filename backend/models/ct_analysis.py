@@ -0,0 +1,73 @@
+"""
+Combined CT analysis: one decode shared by U-Net segmentation and YOLO classification
+"""
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from models.unet_model import (
+    preprocess_image_for_unet,
+    get_tumor_probability_map,
+    summarize_probability_map
+)
+from models.yolo_model import preprocess_image_for_yolo, predict_cancer_stage
+from models.model_loader import ModelDisabledError
+from models.inference_executor import get_executor, InferenceQueueFullError, InferenceTimeoutError
+from utils.cache import image_content_hash
+from config import Config
+
+def analyze_ct_image(image, threshold=0.5, include_overlay=False, encoding=None, raw=False, content_hash=None,
+                     tta=False):
+    """Run tumor segmentation and cancer stage classification on one decoded image"""
+    try:
+        # Decode once, then derive both model inputs from the same pixels
+        image.load()
+        content_hash = content_hash or image_content_hash(image)
+        unet_input = preprocess_image_for_unet(image)
+        yolo_input = preprocess_image_for_yolo(image)
+        
+        # Run both models concurrently on their inference pools
+        probability_future = get_executor('unet').submit(
+            get_tumor_probability_map, image, unet_input, content_hash, tta=tta
+        )
+        try:
+            stage_future = get_executor('yolo').submit(predict_cancer_stage, yolo_input, content_hash, tta=tta)
+        except InferenceQueueFullError:
+            probability_future.cancel()
+            raise
+        
+        # One deadline for both jobs, so the request never waits longer than INFERENCE_TIMEOUT
+        timeout = Config.INFERENCE_TIMEOUT or None
+        deadline = time.monotonic() + timeout if timeout else None
+        try:
+            probability_map = probability_future.result(timeout=timeout)
+        except FutureTimeoutError:
+            probability_future.cancel()
+            stage_future.cancel()
+            raise InferenceTimeoutError(f"CT analysis U-Net job timed out after {timeout}s")
+        variance_map = None
+        if tta:
+            probability_map, variance_map = probability_map
+        tumor_result = summarize_probability_map(
+            probability_map, threshold, encoding,
+            image=image if include_overlay else None,
+            raw=raw, variance_map=variance_map
+        )
+        try:
+            stage_result = stage_future.result(timeout=max(0.0, deadline - time.monotonic()) if deadline else None)
+        except FutureTimeoutError:
+            stage_future.cancel()
+            raise InferenceTimeoutError(f"CT analysis YOLO job timed out after {timeout}s")
+        
+        result = {
+            'tumor': tumor_result,
+            'cancer_stage': stage_result
+        }
+        
+        if include_overlay:
+            result['overlay_image'] = tumor_result.pop('overlay_image')
+        
+        return result
+        
+    except (ModelDisabledError, InferenceQueueFullError, InferenceTimeoutError):
+        raise
+    except Exception as e:
+        raise Exception(f"Error in CT analysis: {str(e)}")
@@ -0,0 +1,198 @@
+"""
+Dedicated inference worker pools, decoupled from Flask request threads
+
+Each model gets its own bounded pool. Routes submit work and wait on the
+returned future; once a pool has `max_queue` jobs pending, new submissions
+are rejected with `InferenceQueueFullError` so the route can answer 503
+instead of piling up threads.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from utils.metrics import REGISTRY
+from config import Config
+
+class InferenceQueueFullError(Exception):
+    """Raised when an inference pool has reached its queue depth limit"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"Inference queue '{name}' is full, retry later")
+        self.name = name
+        self.retry_after = retry_after
+
+class InferenceTimeoutError(Exception):
+    """Raised when an inference job does not finish in time"""
+
+def _init_process_worker(thread_settings):
+    """Pin framework thread pools in a freshly spawned worker process"""
+    for key, value in thread_settings.items():
+        if value:
+            os.environ[key] = str(value)
+
+class InferenceExecutor:
+    """Bounded worker pool for one model"""
+
+    def __init__(self, name, workers=1, max_queue=64, kind='thread', thread_settings=None):
+        self.name = name
+        self.workers = max(1, int(workers))
+        self.max_queue = max(1, int(max_queue))
+        self.kind = kind
+
+        if kind == 'process':
+            # Spawn rather than fork: TensorFlow and PyTorch are not fork-safe once initialised
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_process_worker,
+                initargs=(thread_settings or {},)
+            )
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"infer-{name}")
+
+        self._pending = 0
+        self._lock = threading.Lock()
+
+        # Counters for monitoring
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue a job and return its Future, or raise InferenceQueueFullError"""
+        with self._lock:
+            if self._pending >= self.max_queue:
+                self.rejected += 1
+                raise InferenceQueueFullError(self.name, Config.INFERENCE_RETRY_AFTER)
+            self._pending += 1
+            self.submitted += 1
+
+        try:
+            future = self._pool.submit(fn, *args, **kwargs)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+
+        future.add_done_callback(self._on_done)
+        return future
+
+    def run(self, fn, *args, timeout=None, **kwargs):
+        """Submit a job and block until it finishes"""
+        timeout = Config.INFERENCE_TIMEOUT if timeout is None else timeout
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            return future.result(timeout=timeout or None)
+        except FutureTimeoutError:
+            future.cancel()
+            raise InferenceTimeoutError(f"Inference job on '{self.name}' timed out after {timeout}s")
+
+    def queue_depth(self):
+        with self._lock:
+            return self._pending
+
+    def stats(self):
+        """Return pool counters"""
+        with self._lock:
+            return {
+                'name': self.name,
+                'kind': self.kind,
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'queue_depth': self._pending,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected
+            }
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    def _on_done(self, future):
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+def _thread_settings():
+    """Environment variables that pin TF/PyTorch/XGBoost thread pools in worker processes"""
+    return {
+        'TF_NUM_INTRAOP_THREADS': Config.INTRA_OP_THREADS,
+        'TF_NUM_INTEROP_THREADS': Config.INTER_OP_THREADS,
+        'OMP_NUM_THREADS': Config.INTRA_OP_THREADS
+    }
+
+# Pools whose jobs wait on a micro-batcher, with the batch size setting they feed
+BATCHED_POOLS = {'unet': 'UNET_BATCH_MAX_SIZE', 'yolo': 'YOLO_BATCH_MAX_SIZE'}
+
+def pool_size(name):
+    """Worker count for a pool
+
+    In thread mode each worker blocks on the micro-batcher until its batch
+    runs, so a batch can only fill when the pool has at least as many
+    workers as the batch size. Process workers don't batch (see
+    `batching_enabled`), so their size is taken as configured.
+    """
+    workers = Config.INFERENCE_WORKERS[name]
+    if Config.INFERENCE_EXECUTOR_KIND != 'process' and name in BATCHED_POOLS:
+        workers = max(workers, getattr(Config, BATCHED_POOLS[name]))
+    return workers
+
+def batching_enabled(max_batch_size):
+    """Whether a micro-batcher with this max size can coalesce anything
+
+    A process-pool worker runs one job at a time, so a batcher inside it would
+    only ever see one request; batching is off in process mode.
+    """
+    return max_batch_size > 1 and Config.INFERENCE_EXECUTOR_KIND != 'process'
+
+_EXECUTORS = {}
+_EXECUTORS_LOCK = threading.Lock()
+
+def get_executor(name):
+    """Get the inference pool for a model ('unet', 'yolo' or 'xgboost')"""
+    executor = _EXECUTORS.get(name)
+    if executor is not None:
+        return executor
+
+    with _EXECUTORS_LOCK:
+        executor = _EXECUTORS.get(name)
+        if executor is None:
+            executor = InferenceExecutor(
+                name,
+                workers=pool_size(name),
+                max_queue=Config.INFERENCE_MAX_QUEUE,
+                kind=Config.INFERENCE_EXECUTOR_KIND,
+                thread_settings=_thread_settings()
+            )
+            _EXECUTORS[name] = executor
+    return executor
+
+def run_inference(name, fn, *args, **kwargs):
+    """Run a model function on its dedicated pool and wait for the result"""
+    return get_executor(name).run(fn, *args, **kwargs)
+
+def get_executor_stats():
+    """Report queue depth and counters for every pool that has been created"""
+    with _EXECUTORS_LOCK:
+        executors = list(_EXECUTORS.values())
+    return {executor.name: executor.stats() for executor in executors}
+
+def _collect_queue_depths():
+    return [((name,), stats['queue_depth']) for name, stats in get_executor_stats().items()]
+
+def _collect_job_outcomes():
+    return [
+        ((name, outcome), stats[outcome])
+        for name, stats in get_executor_stats().items()
+        for outcome in ('completed', 'failed', 'rejected')
+    ]
+
+REGISTRY.callback('inference_queue_depth', 'Jobs pending or running per inference pool',
+                  _collect_queue_depths, labelnames=('pool',))
+REGISTRY.callback('inference_jobs_total', 'Finished and rejected jobs per inference pool',
+                  _collect_job_outcomes, labelnames=('pool', 'outcome'), kind='counter')
@@ -1,65 +1,194 @@
 """
 Model loader for all AI models
+
+Models are loaded lazily on first use, each behind its own lock, and heavy
+frameworks (TensorFlow, ultralytics, joblib) are only imported when the model
+that needs them is loaded. `warm_models_async` loads the enabled models in
+parallel on background threads.
 """
-import tensorflow as tf
-import joblib
-from ultralytics import YOLO
+import gc
+import threading
+import time
+from models.risk_scorer import FastRiskScorer
+from utils.metrics import REGISTRY
 from config import Config
 
-# Global model variables
-UNET_MODEL = None
-XGB_MODEL = None
-SCALER = None
-YOLO_CLS_MODEL = None
+class ModelDisabledError(Exception):
+    """Raised when a model is requested that this deployment has disabled"""
+
+# Deployment-level model groups (ENABLED_MODELS) and the artifacts they cover
+MODEL_GROUPS = {
+    'unet': ('unet',),
+    'xgboost': ('xgboost', 'scaler', 'risk_scorer'),
+    'yolo': ('yolo',)
+}
+
+def _load_unet():
+    # Keras, tf.function, TFLite or ONNX Runtime depending on UNET_BACKEND
+    from models.unet_backends import load_unet_backend
+    return load_unet_backend()
+
+def _load_xgboost():
+    import joblib
+    model = joblib.load(Config.XGBOOST_MODEL_PATH)
+    if Config.INTRA_OP_THREADS and hasattr(model, 'set_params'):
+        model.set_params(n_jobs=Config.INTRA_OP_THREADS)
+    return model
+
+def _load_scaler():
+    import joblib
+    return joblib.load(Config.SCALER_PATH)
+
+def _load_risk_scorer():
+    # Build the compiled single-row scorer from the loaded model and scaler
+    return FastRiskScorer(load_model('xgboost'), load_model('scaler'))
+
+def _load_yolo():
+    # ultralytics (PyTorch), ONNX Runtime or OpenVINO depending on YOLO_RUNTIME
+    from models.yolo_runtimes import load_yolo_runtime
+    return load_yolo_runtime()
+
+_LOADERS = {
+    'unet': (_load_unet, "U-Net model"),
+    'xgboost': (_load_xgboost, "XGBoost model"),
+    'scaler': (_load_scaler, "Scaler"),
+    'risk_scorer': (_load_risk_scorer, "Risk scorer"),
+    'yolo': (_load_yolo, "YOLO Classification model")
+}
+
+_MODELS = {}
+_MODEL_STATUS = {name: {'state': 'not_loaded', 'load_seconds': None, 'error': None} for name in _LOADERS}
+_MODEL_LOCKS = {name: threading.Lock() for name in _LOADERS}
+
+def _group_of(name):
+    for group, artifacts in MODEL_GROUPS.items():
+        if name in artifacts:
+            return group
+    return name
+
+def is_model_enabled(name):
+    """Check whether a model (or the group it belongs to) is enabled"""
+    return _group_of(name) in Config.ENABLED_MODELS
+
+def load_model(name):
+    """Load a single model on first use and return it"""
+    model = _MODELS.get(name)
+    if model is not None:
+        return model
+
+    if not is_model_enabled(name):
+        _MODEL_STATUS[name]['state'] = 'disabled'
+        raise ModelDisabledError(f"Model '{_group_of(name)}' is disabled on this server")
+
+    loader, label = _LOADERS[name]
+    with _MODEL_LOCKS[name]:
+        # Another thread may have finished loading while we waited
+        model = _MODELS.get(name)
+        if model is not None:
+            return model
+
+        status = _MODEL_STATUS[name]
+        status['state'] = 'loading'
+        start = time.perf_counter()
+        try:
+            model = loader()
+        except Exception as e:
+            status['state'] = 'error'
+            status['error'] = str(e)
+            print(f"Error loading {label}: {str(e)}")
+            raise
+
+        status['load_seconds'] = time.perf_counter() - start
+        status['state'] = 'loaded'
+        status['error'] = None
+        _MODELS[name] = model
+        print(f"{label} loaded successfully in {status['load_seconds']:.2f}s")
+        return model
+
+def _enabled_artifacts():
+    return [name for name in _LOADERS if is_model_enabled(name)]
 
 def load_all_models():
-    """Load all AI models"""
-    global UNET_MODEL, XGB_MODEL, SCALER, YOLO_CLS_MODEL
-    
+    """Load all enabled AI models in parallel and wait for them"""
+    threads = warm_models_async()
+    for thread in threads:
+        thread.join()
+
+    failed = [name for name in _enabled_artifacts() if _MODEL_STATUS[name]['state'] == 'error']
+    if failed:
+        raise Exception(f"Error loading models: {', '.join(failed)}")
+
+def warm_models_async():
+    """Start loading every enabled model on background threads"""
+    threads = []
+    for name in _enabled_artifacts():
+        if name in _MODELS:
+            continue
+        thread = threading.Thread(target=_warm_model, args=(name,), name=f"warm-{name}", daemon=True)
+        thread.start()
+        threads.append(thread)
+    return threads
+
+def _warm_model(name):
     try:
-        # Load U-Net model
-        if UNET_MODEL is None:
-            UNET_MODEL = tf.keras.models.load_model(Config.UNET_MODEL_PATH, compile=False)
-            print("U-Net model loaded successfully")
-        
-        # Load XGBoost model and scaler
-        if XGB_MODEL is None:
-            XGB_MODEL = joblib.load(Config.XGBOOST_MODEL_PATH)
-            print("XGBoost model loaded successfully")
-        
-        if SCALER is None:
-            SCALER = joblib.load(Config.SCALER_PATH)
-            print("Scaler loaded successfully")
-        
-        # Load YOLO classification model
-        if YOLO_CLS_MODEL is None:
-            YOLO_CLS_MODEL = YOLO(Config.YOLO_MODEL_PATH)
-            print("YOLO Classification model loaded successfully")
-            
-    except Exception as e:
-        print(f"Error loading models: {str(e)}")
-        raise
+        load_model(name)
+    except Exception:
+        # Recorded in the model status; the next request retries the load
+        pass
+
+def preload_models_for_fork(groups):
+    """Load model groups in the pre-fork master so workers share them copy-on-write
+
+    Loads sequentially on the calling thread (no background threads may be
+    alive when the master forks), then freezes the collected objects so the
+    garbage collector in each worker does not dirty the shared pages.
+    """
+    for group in groups:
+        if group not in MODEL_GROUPS:
+            raise ValueError(f"Unknown model group for pre-fork loading: {group}")
+        for name in MODEL_GROUPS[group]:
+            if is_model_enabled(name):
+                load_model(name)
+
+    gc.collect()
+    gc.freeze()
+
+def get_model_status():
+    """Report load state and load time for every model"""
+    status = {}
+    for name, entry in _MODEL_STATUS.items():
+        entry = dict(entry)
+        if not is_model_enabled(name):
+            entry['state'] = 'disabled'
+        status[name] = entry
+    return status
+
+def _collect_model_load_seconds():
+    return [((name,), entry['load_seconds']) for name, entry in _MODEL_STATUS.items()]
+
+def _collect_models_loaded():
+    return [((name,), 1 if entry['state'] == 'loaded' else 0) for name, entry in _MODEL_STATUS.items()]
+
+REGISTRY.callback('model_load_seconds', 'Time taken to load each model artifact',
+                  _collect_model_load_seconds, labelnames=('model',))
+REGISTRY.callback('model_loaded', '1 when the model artifact is loaded', _collect_models_loaded, labelnames=('model',))
 
 def get_unet_model():
     """Get U-Net model instance"""
-    if UNET_MODEL is None:
-        load_all_models()
-    return UNET_MODEL
+    return load_model('unet')
 
 def get_xgboost_model():
     """Get XGBoost model instance"""
-    if XGB_MODEL is None:
-        load_all_models()
-    return XGB_MODEL
+    return load_model('xgboost')
 
 def get_scaler():
     """Get scaler instance"""
-    if SCALER is None:
-        load_all_models()
-    return SCALER
+    return load_model('scaler')
+
+def get_risk_scorer():
+    """Get compiled XGBoost risk scorer instance"""
+    return load_model('risk_scorer')
 
 def get_yolo_model():
     """Get YOLO classification model instance"""
-    if YOLO_CLS_MODEL is None:
-        load_all_models()
-    return YOLO_CLS_MODEL
+    return load_model('yolo')
@@ -0,0 +1,118 @@
+"""
+Pandas-free compiled scorer for single-row lung cancer risk prediction
+"""
+import threading
+import numpy as np
+
+# Feature order expected by the scaler and model (lowercase as in original model)
+FEATURE_ORDER = (
+    'age',
+    'gender',
+    'air_pollution',
+    'alcohol_use',
+    'dust_allergy',
+    'occupational_hazards',
+    'genetic_risk',
+    'chronic_lung_disease',
+    'balanced_diet',
+    'obesity',
+    'smoking',
+    'passive_smoker',
+    'chest_pain',
+    'coughing_of_blood',
+    'fatigue',
+    'weight_loss',
+    'shortness_of_breath',
+    'wheezing',
+    'swallowing_difficulty',
+    'clubbing_of_finger_nails',
+    'frequent_cold',
+    'dry_cough',
+    'snoring'
+)
+
+# Map prediction to label
+LABEL_MAP = {0: "Low", 1: "Medium", 2: "High"}
+
+class FastRiskScorer:
+    """Score patients without building DataFrames
+
+    Built once after the XGBoost model and scaler are loaded. The
+    StandardScaler is reduced to its per-column affine map
+    (x - mean_) / scale_, and the booster is called through
+    `inplace_predict` on a per-thread preallocated row buffer.
+    """
+
+    def __init__(self, model, scaler, feature_order=FEATURE_ORDER):
+        self.model = model
+        self.feature_order = tuple(feature_order)
+        n_features = len(self.feature_order)
+
+        # StandardScaler sets mean_/scale_ to None when with_mean/with_std is off
+        mean = getattr(scaler, 'mean_', None)
+        scale = getattr(scaler, 'scale_', None)
+        self.mean = np.zeros(n_features) if mean is None else np.asarray(mean, dtype=np.float64).copy()
+        self.scale = np.ones(n_features) if scale is None else np.asarray(scale, dtype=np.float64).copy()
+        if self.mean.shape != (n_features,) or self.scale.shape != (n_features,):
+            raise ValueError(f"Scaler expects {self.mean.shape[0]} features, scorer has {n_features}")
+
+        # Use the raw booster when available (XGBClassifier), else fall back to model.predict
+        self.booster = model.get_booster() if hasattr(model, 'get_booster') else None
+        self.iteration_range = self._iteration_range(model)
+        self.binary = str(getattr(model, 'objective', '') or '').startswith('binary:')
+        self._local = threading.local()
+
+    @staticmethod
+    def _iteration_range(model):
+        # Mirror XGBClassifier.predict: respect early stopping when it was used
+        try:
+            best_iteration = model.best_iteration
+        except AttributeError:
+            return (0, 0)
+        return (0, int(best_iteration) + 1)
+
+    def _row_buffer(self):
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = np.empty((1, len(self.feature_order)), dtype=np.float64)
+            self._local.buffer = buffer
+        return buffer
+
+    def _predict_classes(self, scaled):
+        if self.booster is None:
+            return np.asarray(self.model.predict(scaled))
+
+        output = self.booster.inplace_predict(scaled, iteration_range=self.iteration_range)
+        if output.ndim == 2:
+            # multi:softprob - one column per class
+            return np.argmax(output, axis=1)
+        if self.binary:
+            # binary:logistic - probability of the positive class
+            return (output > 0.5).astype(np.int64)
+        # multi:softmax - class ids
+        return output.astype(np.int64)
+
+    def transform(self, features):
+        """Apply the scaler's affine map in place on a float64 matrix"""
+        features -= self.mean
+        features /= self.scale
+        return features
+
+    def predict_label(self, patient_data):
+        """Predict the risk label for one patient dict"""
+        buffer = self._row_buffer()
+        row = buffer[0]
+        for col, feature in enumerate(self.feature_order):
+            value = patient_data.get(feature, 0)
+            # Null features are missing values (NaN), as in the DataFrame path
+            row[col] = np.nan if value is None else value
+
+        prediction = self._predict_classes(self.transform(buffer))[0]
+        return LABEL_MAP[int(prediction)]
+
+    def predict_labels(self, features):
+        """Predict risk labels for a (N, n_features) matrix in feature order"""
+        features = np.asarray(features, dtype=np.float64)
+        # Not transformed in place: float64 input is the caller's array, not a copy
+        scaled = (features - self.mean) / self.scale
+        return [LABEL_MAP[int(prediction)] for prediction in self._predict_classes(scaled)]
@@ -0,0 +1,162 @@
+"""
+Pluggable U-Net inference backends
+
+Every backend takes a float32 (N, H, W, 1) batch and returns (N, H, W, 1)
+probabilities, so `predict_probability_maps` does not care which one is
+loaded. Selected with UNET_BACKEND:
+
+- keras: the original `model.predict` path
+- tf_function: the Keras graph traced once for (None, H, W, 1) float32
+  inputs, skipping `predict`'s per-call data-adapter overhead
+- tflite / onnx: exported models (see scripts/convert_unet.py), optionally
+  float16/int8 quantized; these never import TensorFlow when tflite_runtime
+  or onnxruntime is installed
+"""
+import threading
+import numpy as np
+from config import Config
+
+UNET_BACKENDS = ('keras', 'tf_function', 'tflite', 'onnx')
+
+class KerasBackend:
+    """Original Keras `predict` path"""
+
+    name = 'keras'
+
+    def __init__(self, model):
+        self.model = model
+
+    def predict(self, batch):
+        return self.model.predict(batch, verbose=0)
+
+class TFFunctionBackend:
+    """Keras model traced once with a fixed input signature"""
+
+    name = 'tf_function'
+
+    def __init__(self, model, image_size):
+        import tensorflow as tf
+
+        width, height = image_size
+        self.model = model
+        # Only the batch dimension varies, so the graph is traced exactly once
+        self._call = tf.function(
+            lambda batch: model(batch, training=False),
+            input_signature=[tf.TensorSpec((None, height, width, 1), tf.float32)]
+        )
+
+    def predict(self, batch):
+        return self._call(np.asarray(batch, dtype=np.float32)).numpy()
+
+def _tflite_interpreter_class():
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+class TFLiteBackend:
+    """TFLite interpreter, one per thread (interpreters are not thread-safe)"""
+
+    name = 'tflite'
+
+    def __init__(self, path, num_threads=0):
+        self.path = path
+        self.num_threads = num_threads or None
+        self._interpreter_class = _tflite_interpreter_class()
+        self._local = threading.local()
+        # Fail at load time rather than on the first request
+        self._interpreter()
+
+    def _interpreter(self):
+        state = getattr(self._local, 'state', None)
+        if state is None:
+            interpreter = self._interpreter_class(model_path=self.path, num_threads=self.num_threads)
+            interpreter.allocate_tensors()
+            state = {
+                'interpreter': interpreter,
+                'input': interpreter.get_input_details()[0],
+                'output': interpreter.get_output_details()[0],
+                'batch': None
+            }
+            self._local.state = state
+        return state
+
+    def predict(self, batch):
+        state = self._interpreter()
+        interpreter = state['interpreter']
+        batch = np.asarray(batch, dtype=np.float32)
+
+        # Resize only when the batch size changes (allocation is the slow part)
+        if state['batch'] != len(batch):
+            interpreter.resize_tensor_input(state['input']['index'], batch.shape)
+            interpreter.allocate_tensors()
+            state['input'] = interpreter.get_input_details()[0]
+            state['output'] = interpreter.get_output_details()[0]
+            state['batch'] = len(batch)
+
+        interpreter.set_tensor(state['input']['index'], batch)
+        interpreter.invoke()
+        return interpreter.get_tensor(state['output']['index'])
+
+class OnnxBackend:
+    """ONNX Runtime session (thread-safe, shared by all pool workers)"""
+
+    name = 'onnx'
+
+    def __init__(self, path, intra_op_threads=0, inter_op_threads=0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads:
+            options.inter_op_num_threads = inter_op_threads
+
+        self.session = ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.output_name = self.session.get_outputs()[0].name
+
+    def predict(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        return self.session.run([self.output_name], {self.input_name: batch})[0]
+
+def load_keras_unet(path):
+    """Load the original Keras U-Net"""
+    import tensorflow as tf
+
+    # Thread pools must be pinned before TensorFlow initialises its runtime
+    try:
+        if Config.INTRA_OP_THREADS:
+            tf.config.threading.set_intra_op_parallelism_threads(Config.INTRA_OP_THREADS)
+        if Config.INTER_OP_THREADS:
+            tf.config.threading.set_inter_op_parallelism_threads(Config.INTER_OP_THREADS)
+    except RuntimeError as e:
+        print(f"Warning: could not pin TensorFlow threads: {str(e)}")
+
+    return tf.keras.models.load_model(path, compile=False)
+
+def unet_artifact_path(backend=None):
+    """Model file used by a backend"""
+    backend = backend or Config.UNET_BACKEND
+    if backend == 'tflite':
+        return Config.UNET_TFLITE_PATH
+    if backend == 'onnx':
+        return Config.UNET_ONNX_PATH
+    return Config.UNET_MODEL_PATH
+
+def load_unet_backend(backend=None):
+    """Load the U-Net behind the configured (or given) backend"""
+    backend = backend or Config.UNET_BACKEND
+    if backend not in UNET_BACKENDS:
+        raise ValueError(f"Unknown UNET_BACKEND '{backend}', use one of: {', '.join(UNET_BACKENDS)}")
+
+    if backend == 'keras':
+        return KerasBackend(load_keras_unet(Config.UNET_MODEL_PATH))
+    if backend == 'tf_function':
+        return TFFunctionBackend(load_keras_unet(Config.UNET_MODEL_PATH), Config.IMAGE_SIZE)
+    if backend == 'tflite':
+        return TFLiteBackend(Config.UNET_TFLITE_PATH, Config.INTRA_OP_THREADS)
+    return OnnxBackend(Config.UNET_ONNX_PATH, Config.INTRA_OP_THREADS, Config.INTER_OP_THREADS)
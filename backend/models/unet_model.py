@@ -2,78 +2,260 @@
 U-Net model operations for tumor segmentation
 """
 import numpy as np
-from PIL import Image
-import base64
-import io
-from models.model_loader import get_unet_model
+import threading
+from models.batching import MicroBatcher
+from models.inference_executor import batching_enabled
+from models.model_loader import ModelDisabledError, get_unet_model
+from models.unet_backends import unet_artifact_path
+from utils.cache import get_result_cache, image_content_hash, result_cache_key, model_identity
+from utils.image_utils import compose_overlay
+from utils.mask_utils import MASK_ENCODINGS, analyze_mask, encode_mask, encode_image
+from utils.metrics import time_stage
+from utils.tile_utils import extract_tiles, stitch_tiles
+from utils.tta_utils import ROTATIONS, tta_plan, augment_batch, merge_augmented
 from config import Config
 
 def preprocess_image_for_unet(image):
     """Preprocess image for U-Net model"""
-    # Convert to grayscale and resize
-    if image.mode != 'L':
-        image = image.convert('L')
-    
-    image = image.resize(Config.IMAGE_SIZE)
+    with time_stage('unet', 'preprocess'):
+        # Convert to grayscale and resize
+        if image.mode != 'L':
+            image = image.convert('L')
+        
+        image = image.resize(Config.IMAGE_SIZE)
+        
+        # Convert to numpy array and normalize
+        img_array = np.array(image, dtype=np.float32) / 255.0
+        
+        # Add batch and channel dimensions
+        img_array = np.expand_dims(img_array, axis=0)  # Add batch dimension
+        img_array = np.expand_dims(img_array, axis=-1)  # Add channel dimension
+        
+        return img_array
+
+def predict_probability_maps(batch):
+    """Run U-Net on a (N, H, W, 1) batch and return (N, H, W) probability maps"""
+    backend = get_unet_model()
+    with time_stage('unet', 'predict'):
+        prediction = backend.predict(batch)
+    return prediction[..., 0]
+
+def _predict_probability_batch(arrays):
+    """Batch function for the micro-batcher: one forward pass for all queued slices"""
+    batch = np.stack(arrays, axis=0)
+    probability_maps = predict_probability_maps(batch)
+    return list(probability_maps)
+
+_UNET_BATCHER = None
+_UNET_BATCHER_LOCK = threading.Lock()
+
+def get_unet_batcher():
+    """Get the shared U-Net micro-batcher (None when batching is disabled)"""
+    global _UNET_BATCHER
+
+    if not batching_enabled(Config.UNET_BATCH_MAX_SIZE):
+        return None
+
+    if _UNET_BATCHER is None:
+        with _UNET_BATCHER_LOCK:
+            if _UNET_BATCHER is None:
+                _UNET_BATCHER = MicroBatcher(
+                    _predict_probability_batch,
+                    max_batch_size=Config.UNET_BATCH_MAX_SIZE,
+                    max_wait_ms=Config.UNET_BATCH_MAX_WAIT_MS,
+                    name='unet-batcher'
+                )
+    return _UNET_BATCHER
+
+def predict_probability_map(processed_image):
+    """Predict a single (H, W) probability map, coalescing with concurrent requests"""
+    batcher = get_unet_batcher()
+    if batcher is None:
+        return predict_probability_maps(processed_image)[0]
+    return batcher(processed_image[0])
+
+def predict_tiled_probability_map(image):
+    """Full-resolution (H, W) probability map from overlapping U-Net tiles
+
+    The grayscale image is cut into IMAGE_SIZE tiles overlapping by
+    UNET_TILE_OVERLAP pixels, the tiles go through U-Net in batches of
+    UNET_TILE_BATCH_SIZE, and overlaps are blended with edge-ramped weights.
+    """
+    tile = Config.IMAGE_SIZE[0]
+    overlap = Config.UNET_TILE_OVERLAP
+    with time_stage('unet', 'preprocess'):
+        if image.mode != 'L':
+            image = image.convert('L')
+        pixels = np.asarray(image, dtype=np.float32) / 255.0
+        tiles, grid, padded_shape = extract_tiles(pixels, tile, overlap)
     
-    # Convert to numpy array and normalize
-    img_array = np.array(image, dtype=np.float32) / 255.0
+    batch_size = max(1, Config.UNET_TILE_BATCH_SIZE)
+    probability_tiles = np.concatenate([
+        predict_probability_maps(tiles[start:start + batch_size, ..., None])
+        for start in range(0, len(tiles), batch_size)
+    ])
     
-    # Add batch and channel dimensions
-    img_array = np.expand_dims(img_array, axis=0)  # Add batch dimension
-    img_array = np.expand_dims(img_array, axis=-1)  # Add channel dimension
+    with time_stage('unet', 'stitch'):
+        return stitch_tiles(probability_tiles, grid, padded_shape, pixels.shape, overlap)
+
+def predict_tta_probability_map(processed_image):
+    """(2, H, W) mean probability map and per-pixel variance over TTA_TRANSFORMS
+
+    The original slice and its flipped/rotated copies go through U-Net as one
+    batch; each output is turned back before averaging.
+    """
+    plan = tta_plan(Config.TTA_TRANSFORMS)
+    width, height = Config.IMAGE_SIZE
+    if width != height and any(name in ROTATIONS for name in plan):
+        raise ValueError("rot90/rot270 TTA needs a square IMAGE_SIZE")
     
-    return img_array
+    with time_stage('unet', 'preprocess'):
+        batch = augment_batch(processed_image, plan)
+    probability_maps = predict_probability_maps(batch)
+    with time_stage('unet', 'merge'):
+        mean, variance = merge_augmented(probability_maps, plan)
+        return np.stack([mean[0], variance[0]])
 
-def predict_tumor_segmentation(image, threshold=0.5):
-    """Predict tumor segmentation using U-Net model"""
-    try:
-        model = get_unet_model()
+def summarize_uncertainty(variance_map, binary_mask):
+    """TTA uncertainty: mean per-pixel variance overall and inside the mask"""
+    tumor_variance = variance_map[binary_mask]
+    return {
+        'transforms': list(tta_plan(Config.TTA_TRANSFORMS)),
+        'uncertainty': float(variance_map.mean()),
+        'tumor_uncertainty': float(tumor_variance.mean()) if tumor_variance.size else None,
+        'max_variance': float(variance_map.max())
+    }
+
+def summarize_probability_map(probability_map, threshold=0.5, encoding=None, image=None, raw=False,
+                              variance_map=None):
+    """Threshold a probability map and build the tumor prediction response
+
+    `encoding` selects the mask format (png, webp, rle, polygon or bitmap).
+    When the original `image` is given, a server-side overlay is included as
+    `overlay_image`. With `raw`, images and bitmaps are left as bytes for the
+    binary response formats instead of base64. A TTA `variance_map` adds
+    the uncertainty scores as `tta`.
+    """
+    encoding = encoding or Config.MASK_ENCODING
+    if encoding not in MASK_ENCODINGS:
+        raise ValueError(f"Unsupported mask encoding: {encoding}")
+    
+    # Threshold once and collect area, max probability and components together
+    with time_stage('unet', 'postprocess'):
+        analysis = analyze_mask(probability_map, threshold, Config.MASK_MAX_COMPONENTS)
+    binary_mask = analysis['binary_mask']
+    
+    total_area = binary_mask.shape[0] * binary_mask.shape[1]
+    tumor_percentage = (analysis['tumor_pixels'] / total_area) * 100
+    
+    has_tumor = analysis['tumor_pixels'] > 0
+    max_probability = analysis['max_probability']
+    confidence = max_probability * 100 if has_tumor else (1 - max_probability) * 100
+    
+    result = {
+        'has_tumor': bool(has_tumor),
+        'tumor_area': float(tumor_percentage),
+        'confidence': float(confidence),
+        'max_probability': max_probability,
+        'components': analysis['components'],
+        'bounding_boxes': analysis['bounding_boxes'],
+        'mask_encoding': encoding,
+        'mask_image': None
+    }
+    
+    if variance_map is not None:
+        result['tta'] = summarize_uncertainty(variance_map, binary_mask)
+    
+    with time_stage('unet', 'encode'):
+        if has_tumor:
+            encoded = encode_mask(binary_mask, encoding, Config.MASK_PNG_COMPRESS_LEVEL, raw)
+            if not isinstance(encoded, dict):
+                result['mask_image'] = encoded
+            else:
+                result['mask'] = encoded
         
+        if image is not None:
+            result['overlay_image'] = encode_overlay(image, binary_mask, encoding, raw) if has_tumor else None
+    
+    return result
+
+def encode_overlay(image, binary_mask, encoding='png', raw=False):
+    """Compose the tumor overlay on the original image and encode it"""
+    overlay = compose_overlay(image, binary_mask)
+    if encoding == 'webp':
+        return encode_image(overlay, 'WEBP', raw, quality=85, method=0)
+    return encode_image(overlay, 'PNG', raw, compress_level=Config.MASK_PNG_COMPRESS_LEVEL)
+
+def get_tumor_probability_map(image, processed_image=None, content_hash=None, tiled=False, tta=False):
+    """Get the (H, W) U-Net probability map for an image, using the result cache
+
+    Callers that already decoded and preprocessed the upload can pass
+    `processed_image` and `content_hash` to skip that work here. With
+    `tiled`, the map is predicted tile by tile at the image's own resolution.
+    With `tta`, a (2, H, W) array of mean map and variance is returned.
+    """
+    if tiled and tta:
+        raise ValueError("Test-time augmentation is not supported with tiled segmentation")
+    
+    # The cache holds the raw probability map, so a new threshold on the
+    # same image only redoes thresholding and PNG encoding
+    cache = get_result_cache()
+    cache_key = None
+    if cache is not None:
+        content_hash = content_hash or image_content_hash(image)
+        # Exported/quantized backends can differ slightly, so each gets its own entries
+        unet_id = model_identity(f'unet-{Config.UNET_BACKEND}', unet_artifact_path())
+        params = {'tiled': tiled}
+        if tta:
+            # TTA entries hold mean and variance and depend on the transform set
+            params['tta'] = Config.TTA_TRANSFORMS
+        cache_key = result_cache_key(content_hash, unet_id, **params)
+        probability_map = cache.get(cache_key)
+        if probability_map is not None:
+            return probability_map
+    
+    if tiled:
+        probability_map = predict_tiled_probability_map(image)
+    else:
         # Preprocess image
-        processed_image = preprocess_image_for_unet(image)
-        
-        # Make prediction
-        prediction = model.predict(processed_image, verbose=0)
+        if processed_image is None:
+            processed_image = preprocess_image_for_unet(image)
         
-        # Apply threshold
-        binary_mask = (prediction[0, :, :, 0] > threshold).astype(np.uint8)
-        
-        # Calculate tumor area and confidence
-        tumor_area = np.sum(binary_mask)
-        total_area = binary_mask.shape[0] * binary_mask.shape[1]
-        tumor_percentage = (tumor_area / total_area) * 100
-        
-        has_tumor = tumor_area > 0
-        confidence = np.max(prediction[0, :, :, 0]) * 100 if has_tumor else (1 - np.max(prediction[0, :, :, 0])) * 100
-        
-        # Convert mask to base64 image
-        mask_image_b64 = None
-        if has_tumor:
-            mask_image_b64 = mask_to_base64(binary_mask)
-        
-        return {
-            'has_tumor': bool(has_tumor),
-            'tumor_area': float(tumor_percentage),
-            'confidence': float(confidence),
-            'mask_image': mask_image_b64
-        }
+        if tta:
+            probability_map = predict_tta_probability_map(processed_image)
+        else:
+            # Make prediction (batched with concurrent requests when enabled)
+            probability_map = predict_probability_map(processed_image)
+    probability_map = np.asarray(probability_map, dtype=np.float32)
+    probability_map.setflags(write=False)
+    
+    if cache is not None:
+        cache.set(cache_key, probability_map)
+    return probability_map
+
+def predict_tumor_segmentation(image, threshold=0.5, processed_image=None, content_hash=None,
+                               encoding=None, include_overlay=False, raw=False, tiled=False, tta=False):
+    """Predict tumor segmentation using U-Net model"""
+    try:
+        probability_map = get_tumor_probability_map(image, processed_image, content_hash, tiled, tta)
+        variance_map = None
+        if tta:
+            probability_map, variance_map = probability_map
+        return summarize_probability_map(
+            probability_map, threshold, encoding,
+            image=image if include_overlay else None,
+            raw=raw, variance_map=variance_map
+        )
         
+    except ModelDisabledError:
+        raise
     except Exception as e:
         raise Exception(f"Error in tumor prediction: {str(e)}")
 
 def mask_to_base64(mask):
     """Convert binary mask to base64 encoded image"""
     try:
-        # Convert binary mask to PIL Image
-        mask_img = Image.fromarray((mask * 255).astype(np.uint8), mode='L')
-        
-        # Convert to base64
-        buffer = io.BytesIO()
-        mask_img.save(buffer, format='PNG')
-        mask_b64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-        
-        return f"data:image/png;base64,{mask_b64}"
+        return encode_mask(np.asarray(mask, dtype=bool), 'png', Config.MASK_PNG_COMPRESS_LEVEL)
         
     except Exception as e:
         print(f"Error converting mask to base64: {str(e)}")
@@ -0,0 +1,77 @@
+"""
+Tumor segmentation over a multi-slice CT volume
+"""
+from models.unet_model import predict_probability_maps
+from models.model_loader import ModelDisabledError
+from models.inference_executor import InferenceQueueFullError, InferenceTimeoutError
+from utils.mask_utils import analyze_mask
+from utils.volume_utils import check_volume_size, normalize_slices, resize_batch
+from utils.metrics import time_stage
+from config import Config
+
+def analyze_volume(volume, threshold=0.5, batch_size=None, predict_batch=None,
+                   window_center=None, window_width=None):
+    """Segment every slice of a volume in fixed-size batches
+
+    Only one batch of slices and probability maps is alive at a time. Returns
+    a per-slice summary plus the aggregated tumor volume, using the voxel
+    spacing (mm) scaled to the U-Net mask resolution.
+    """
+    try:
+        batch_size = max(1, int(batch_size or Config.VOLUME_BATCH_SIZE))
+        predict_batch = predict_batch or predict_probability_maps
+        window_center = Config.VOLUME_WINDOW_CENTER if window_center is None else window_center
+        window_width = Config.VOLUME_WINDOW_WIDTH if window_width is None else window_width
+
+        check_volume_size(volume)
+
+        # Area of one mask pixel in mm^2 after resizing to the U-Net input size
+        slice_spacing, row_spacing, column_spacing = volume.spacing
+        mask_width, mask_height = Config.IMAGE_SIZE
+        pixel_area = (volume.shape[0] * row_spacing / mask_height) * (volume.shape[1] * column_spacing / mask_width)
+
+        slices = []
+        tumor_pixels = 0
+        max_probability = 0.0
+
+        for start, batch in volume.iter_batches(batch_size):
+            with time_stage('volume', 'preprocess'):
+                batch = normalize_slices(batch, volume.intensity, window_center, window_width)
+                batch = resize_batch(batch, Config.IMAGE_SIZE)
+            probability_maps = predict_batch(batch[..., None])
+
+            for offset, probability_map in enumerate(probability_maps):
+                analysis = analyze_mask(probability_map, threshold, Config.MASK_MAX_COMPONENTS)
+                tumor_pixels += analysis['tumor_pixels']
+                max_probability = max(max_probability, analysis['max_probability'])
+                slices.append({
+                    'index': start + offset,
+                    'has_tumor': analysis['tumor_pixels'] > 0,
+                    'tumor_area': analysis['tumor_pixels'] / (mask_width * mask_height) * 100,
+                    'tumor_area_mm2': analysis['tumor_pixels'] * pixel_area,
+                    'max_probability': analysis['max_probability'],
+                    'components': analysis['components'],
+                    'bounding_boxes': analysis['bounding_boxes']
+                })
+
+        tumor_slices = [entry['index'] for entry in slices if entry['has_tumor']]
+        tumor_volume_mm3 = tumor_pixels * pixel_area * slice_spacing
+
+        return {
+            'has_tumor': bool(tumor_slices),
+            'num_slices': volume.num_slices,
+            'slice_shape': list(volume.shape),
+            'spacing_mm': [slice_spacing, row_spacing, column_spacing],
+            'tumor_slices': tumor_slices,
+            'tumor_volume_mm3': float(tumor_volume_mm3),
+            'tumor_volume_ml': float(tumor_volume_mm3 / 1000.0),
+            'max_probability': float(max_probability),
+            'slices': slices
+        }
+
+    except (ModelDisabledError, InferenceQueueFullError, InferenceTimeoutError):
+        raise
+    except ValueError:
+        raise
+    except Exception as e:
+        raise Exception(f"Error in volume analysis: {str(e)}") from e
@@ -1,57 +1,98 @@
 """
 XGBoost model operations for lung cancer risk prediction
 """
+import itertools
+import numpy as np
 import pandas as pd
-from models.model_loader import get_xgboost_model, get_scaler
+from models.model_loader import ModelDisabledError, get_xgboost_model, get_scaler, get_risk_scorer
+from models.risk_scorer import FEATURE_ORDER, LABEL_MAP
+from utils.metrics import time_stage
+from config import Config
 
 def predict_lung_cancer_risk(patient_data):
     """Predict lung cancer risk using XGBoost model"""
     try:
-        model = get_xgboost_model()
-        scaler = get_scaler()
-
-        # Create DataFrame with proper feature names (lowercase as in original model)
-        df = pd.DataFrame([{
-            'age': patient_data.get('age', 0),
-            'gender': patient_data.get('gender', 0),
-            'air_pollution': patient_data.get('air_pollution', 0),
-            'alcohol_use': patient_data.get('alcohol_use', 0),
-            'dust_allergy': patient_data.get('dust_allergy', 0),
-            'occupational_hazards': patient_data.get('occupational_hazards', 0),
-            'genetic_risk': patient_data.get('genetic_risk', 0),
-            'chronic_lung_disease': patient_data.get('chronic_lung_disease', 0),
-            'balanced_diet': patient_data.get('balanced_diet', 0),
-            'obesity': patient_data.get('obesity', 0),
-            'smoking': patient_data.get('smoking', 0),
-            'passive_smoker': patient_data.get('passive_smoker', 0),
-            'chest_pain': patient_data.get('chest_pain', 0),
-            'coughing_of_blood': patient_data.get('coughing_of_blood', 0),
-            'fatigue': patient_data.get('fatigue', 0),
-            'weight_loss': patient_data.get('weight_loss', 0),
-            'shortness_of_breath': patient_data.get('shortness_of_breath', 0),
-            'wheezing': patient_data.get('wheezing', 0),
-            'swallowing_difficulty': patient_data.get('swallowing_difficulty', 0),
-            'clubbing_of_finger_nails': patient_data.get('clubbing_of_finger_nails', 0),
-            'frequent_cold': patient_data.get('frequent_cold', 0),
-            'dry_cough': patient_data.get('dry_cough', 0),
-            'snoring': patient_data.get('snoring', 0)
-        }])
-
-        # Scale features
-        scaled_features = scaler.transform(df)
-
-        # Make prediction
-        prediction = model.predict(scaled_features)[0]
-
-        # Map prediction to label
-        label_map = {0: "Low", 1: "Medium", 2: "High"}
-        result_label = label_map[prediction]
+        # Compiled scorer: no DataFrame, scaler folded into a preallocated buffer
+        scorer = get_risk_scorer()
+        with time_stage('xgboost', 'predict'):
+            result_label = scorer.predict_label(patient_data)
 
         return {
             'prediction': result_label
         }
 
+    except ModelDisabledError:
+        raise
     except Exception as e:
         raise Exception(f"Error in lung cancer risk prediction: {str(e)}")
 
+def predict_lung_cancer_risk_dataframe(patient_data):
+    """Reference DataFrame + scaler path, kept for parity checks against the fast scorer"""
+    model = get_xgboost_model()
+    scaler = get_scaler()
 
+    # Create DataFrame with proper feature names
+    df = pd.DataFrame([{
+        feature: patient_data.get(feature, 0) for feature in FEATURE_ORDER
+    }])
+
+    # Scale features
+    scaled_features = scaler.transform(df)
+
+    # Make prediction
+    prediction = model.predict(scaled_features)[0]
+
+    return {
+        'prediction': LABEL_MAP[prediction]
+    }
+
+def build_feature_matrix(records):
+    """Build a contiguous float32 (N, 23) matrix in FEATURE_ORDER from patient dicts"""
+    records = list(records)
+    matrix = np.zeros((len(records), len(FEATURE_ORDER)), dtype=np.float32)
+
+    for row, record in enumerate(records):
+        if not isinstance(record, dict):
+            raise ValueError(f"Record {row} is not an object")
+        for col, feature in enumerate(FEATURE_ORDER):
+            value = record.get(feature, 0)
+            if value is None or value == '':
+                value = 0
+            try:
+                matrix[row, col] = float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"Record {row}: invalid value for '{feature}': {value!r}")
+
+    return matrix
+
+def predict_lung_cancer_risk_matrix(features):
+    """Predict risk labels for a (N, 23) feature matrix in FEATURE_ORDER"""
+    scorer = get_risk_scorer()
+    with time_stage('xgboost', 'predict_batch'):
+        return scorer.predict_labels(features)
+
+def predict_lung_cancer_risk_batch(records, chunk_size=None, predict_matrix=None):
+    """Score an iterable of patient records chunk by chunk
+
+    Yields (index, label) pairs in input order. Only one chunk of records is
+    held in memory at a time, so arbitrarily large cohorts can be streamed.
+    `predict_matrix` overrides how each chunk's feature matrix is scored.
+    """
+    chunk_size = chunk_size or Config.XGB_BATCH_CHUNK_SIZE
+    predict_matrix = predict_matrix or predict_lung_cancer_risk_matrix
+    records = iter(records)
+    offset = 0
+
+    while True:
+        chunk = list(itertools.islice(records, chunk_size))
+        if not chunk:
+            return
+
+        try:
+            labels = predict_matrix(build_feature_matrix(chunk))
+        except Exception as e:
+            raise Exception(f"Error in lung cancer risk prediction (records {offset}-{offset + len(chunk) - 1}): {str(e)}")
+
+        for i, label in enumerate(labels):
+            yield offset + i, label
+        offset += len(chunk)
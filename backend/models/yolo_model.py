@@ -1,46 +1,140 @@
 """
 YOLO model operations for cancer stage classification
 """
-from PIL import Image
-from models.model_loader import get_yolo_model
+import copy
+import threading
+import numpy as np
+from models.batching import MicroBatcher
+from models.inference_executor import batching_enabled
+from models.model_loader import ModelDisabledError, get_yolo_model
+from models.yolo_runtimes import yolo_artifact_path
+from utils.cache import get_result_cache, image_content_hash, result_cache_key, model_identity
+from utils.metrics import time_stage
+from utils.tta_utils import tta_plan, augment_images, merge_probabilities
 from config import Config
 
-def predict_cancer_stage(image):
-    """Predict cancer stage using YOLO classification model"""
-    try:
-        model = get_yolo_model()
-        
-        # Ensure image is in RGB format for YOLO
-        if image.mode != 'RGB':
+def preprocess_image_for_yolo(image):
+    """Ensure image is in RGB format for YOLO"""
+    if image.mode != 'RGB':
+        with time_stage('yolo', 'preprocess'):
             image = image.convert('RGB')
+    return image
+
+def build_stage_result(probabilities):
+    """Build the cancer stage response dict from one image's class probabilities"""
+    # Get top prediction
+    top_class_idx = int(np.argmax(probabilities))
+    confidence = float(probabilities[top_class_idx])
+    predicted_class = Config.CANCER_STAGE_CLASSES[top_class_idx]
+    
+    # Get all class probabilities
+    all_probs = {}
+    for i, prob in enumerate(probabilities):
+        all_probs[Config.CANCER_STAGE_CLASSES[i]] = float(prob)
+    
+    # Create boolean flags
+    is_malignant = predicted_class == 'Malignant'
+    is_benign = predicted_class == 'Benign'
+    is_normal = predicted_class == 'Normal'
+    
+    return {
+        'predicted_class': predicted_class,
+        'confidence': confidence,
+        'class_probabilities': all_probs,
+        'is_malignant': is_malignant,
+        'is_benign': is_benign,
+        'is_normal': is_normal
+    }
+
+def predict_cancer_stage_batch(images):
+    """Classify a list of RGB images with one batched YOLO call"""
+    runtime = get_yolo_model()
+    with time_stage('yolo', 'predict'):
+        probabilities = runtime.classify(images)
+    with time_stage('yolo', 'postprocess'):
+        return [build_stage_result(row) for row in probabilities]
+
+def predict_cancer_stage_tta(image):
+    """Classify an RGB image and its TTA_TRANSFORMS copies in one YOLO call
+
+    Class probabilities are averaged over the copies; the variance of the
+    predicted class's probability is reported as the uncertainty.
+    """
+    plan = tta_plan(Config.TTA_TRANSFORMS)
+    with time_stage('yolo', 'preprocess'):
+        images = augment_images([image], plan)
+    runtime = get_yolo_model()
+    with time_stage('yolo', 'predict'):
+        probabilities = runtime.classify(images)
+    with time_stage('yolo', 'postprocess'):
+        mean, variance = merge_probabilities(probabilities, plan)
+        result = build_stage_result(mean[0])
+        top_class_idx = int(np.argmax(mean[0]))
+        result['tta'] = {
+            'transforms': list(plan),
+            'uncertainty': float(variance[0][top_class_idx]),
+            'class_variance': {
+                Config.CANCER_STAGE_CLASSES[i]: float(value) for i, value in enumerate(variance[0])
+            }
+        }
+        return result
+
+_YOLO_BATCHER = None
+_YOLO_BATCHER_LOCK = threading.Lock()
+
+def get_yolo_batcher():
+    """Get the shared YOLO request coalescer (None when batching is disabled)"""
+    global _YOLO_BATCHER
+
+    if not batching_enabled(Config.YOLO_BATCH_MAX_SIZE):
+        return None
+
+    if _YOLO_BATCHER is None:
+        with _YOLO_BATCHER_LOCK:
+            if _YOLO_BATCHER is None:
+                _YOLO_BATCHER = MicroBatcher(
+                    predict_cancer_stage_batch,
+                    max_batch_size=Config.YOLO_BATCH_MAX_SIZE,
+                    max_wait_ms=Config.YOLO_BATCH_MAX_WAIT_MS,
+                    name='yolo-batcher'
+                )
+    return _YOLO_BATCHER
+
+def predict_cancer_stage(image, content_hash=None, tta=False):
+    """Predict cancer stage using YOLO classification model
+
+    With `tta`, the image is classified together with its flipped/rotated
+    copies and the result carries a `tta` uncertainty section.
+    """
+    try:
+        cache = get_result_cache()
+        cache_key = None
+        if cache is not None:
+            content_hash = content_hash or image_content_hash(image)
+            yolo_id = model_identity(f'yolo-cls-{Config.YOLO_RUNTIME}', yolo_artifact_path())
+            params = {'tta': Config.TTA_TRANSFORMS} if tta else {}
+            cache_key = result_cache_key(content_hash, yolo_id, **params)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return copy.deepcopy(cached)
         
-        # Run YOLO classification
-        results = model(image, verbose=False)
-        result = results[0]
-        
-        # Get top prediction
-        top_class_idx = result.probs.top1
-        confidence = float(result.probs.top1conf)
-        predicted_class = Config.CANCER_STAGE_CLASSES[top_class_idx]
-        
-        # Get all class probabilities
-        all_probs = {}
-        for i, prob in enumerate(result.probs.data):
-            all_probs[Config.CANCER_STAGE_CLASSES[i]] = float(prob)
+        image = preprocess_image_for_yolo(image)
         
-        # Create boolean flags
-        is_malignant = predicted_class == 'Malignant'
-        is_benign = predicted_class == 'Benign'
-        is_normal = predicted_class == 'Normal'
+        # Run YOLO classification (batched with concurrent requests when enabled)
+        batcher = get_yolo_batcher()
+        if tta:
+            # Already a batch of its own, so it skips the coalescer
+            result = predict_cancer_stage_tta(image)
+        elif batcher is None:
+            result = predict_cancer_stage_batch([image])[0]
+        else:
+            result = batcher(image)
         
-        return {
-            'predicted_class': predicted_class,
-            'confidence': confidence,
-            'class_probabilities': all_probs,
-            'is_malignant': is_malignant,
-            'is_benign': is_benign,
-            'is_normal': is_normal
-        }
+        if cache is not None:
+            cache.set(cache_key, copy.deepcopy(result))
+        return result
         
+    except ModelDisabledError:
+        raise
     except Exception as e:
         raise Exception(f"Error in cancer stage prediction: {str(e)}")
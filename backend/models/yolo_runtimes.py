@@ -0,0 +1,173 @@
+"""
+Runtimes for the YOLO cancer stage classifier
+
+Every runtime takes a list of RGB PIL images and returns an (N, classes)
+array of softmax probabilities. Selected with YOLO_RUNTIME:
+
+- ultralytics: the original `YOLO(...)` PyTorch model
+- onnx / openvino: a model exported with scripts/export_yolo.py, run with
+  onnxruntime or OpenVINO; preprocessing is done here with PIL and NumPy, so
+  neither torch nor ultralytics is imported (or needs to be installed)
+"""
+import ast
+import os
+import numpy as np
+from PIL import Image
+from config import Config
+
+YOLO_RUNTIMES = ('ultralytics', 'onnx', 'openvino')
+
+def classify_preprocess(image, size):
+    """Same transform as ultralytics' classify_transforms (default crop fraction)
+
+    Resize the shorter side to `size` (bilinear), center-crop to size x size,
+    scale to [0, 1] and return a float32 CHW array. Classification models are
+    center-cropped rather than letterboxed.
+    """
+    width, height = image.size
+    if width <= height:
+        new_width, new_height = size, int(size * height / width)
+    else:
+        new_width, new_height = int(size * width / height), size
+    if (new_width, new_height) != (width, height):
+        image = image.resize((new_width, new_height), Image.BILINEAR)
+
+    top = int(round((new_height - size) / 2.0))
+    left = int(round((new_width - size) / 2.0))
+    pixels = np.asarray(image, dtype=np.float32)[top:top + size, left:left + size] / 255.0
+    return np.ascontiguousarray(pixels.transpose(2, 0, 1))
+
+def _parse_image_size(value):
+    """imgsz from export metadata: '224', '[224, 224]' or a list"""
+    if isinstance(value, str):
+        value = ast.literal_eval(value)
+    if isinstance(value, (list, tuple)):
+        value = value[0]
+    return int(value)
+
+class UltralyticsClassifier:
+    """Original ultralytics PyTorch model"""
+
+    name = 'ultralytics'
+
+    def __init__(self, model):
+        self.model = model
+
+    def classify(self, images):
+        results = self.model(list(images), verbose=False)
+        return np.stack([result.probs.data.cpu().numpy() for result in results])
+
+class OnnxClassifier:
+    """ONNX Runtime session on an ultralytics classification export"""
+
+    name = 'onnx'
+
+    def __init__(self, path, image_size=0, intra_op_threads=0, inter_op_threads=0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads:
+            options.inter_op_num_threads = inter_op_threads
+
+        self.session = ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.output_name = self.session.get_outputs()[0].name
+
+        # Exports without dynamic=True have a fixed batch of 1
+        self.fixed_batch = model_input.shape[0] if isinstance(model_input.shape[0], int) else None
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        if image_size:
+            self.image_size = image_size
+        elif 'imgsz' in metadata:
+            self.image_size = _parse_image_size(metadata['imgsz'])
+        else:
+            self.image_size = int(model_input.shape[2])
+
+    def _run(self, batch):
+        return self.session.run([self.output_name], {self.input_name: batch})[0]
+
+    def classify(self, images):
+        batch = np.stack([classify_preprocess(image, self.image_size) for image in images])
+        if self.fixed_batch == 1 and len(batch) > 1:
+            return np.concatenate([self._run(batch[i:i + 1]) for i in range(len(batch))])
+        return self._run(batch)
+
+class OpenVINOClassifier:
+    """OpenVINO compiled model on an ultralytics classification export"""
+
+    name = 'openvino'
+
+    def __init__(self, path, image_size=0, threads=0):
+        import openvino as ov
+
+        core = ov.Core()
+        if threads:
+            core.set_property('CPU', {'INFERENCE_NUM_THREADS': threads})
+        model = core.read_model(path)
+
+        input_shape = model.input(0).get_partial_shape()
+        self.fixed_batch = input_shape[0].get_length() if input_shape[0].is_static else None
+        if image_size:
+            self.image_size = image_size
+        elif model.has_rt_info(['model_info', 'imgsz']):
+            self.image_size = _parse_image_size(model.get_rt_info(['model_info', 'imgsz']).astype(str))
+        else:
+            self.image_size = input_shape[2].get_length()
+
+        self.compiled = core.compile_model(model, 'CPU')
+        self.output = self.compiled.output(0)
+
+    def _run(self, batch):
+        # A fresh infer request per call keeps concurrent pool workers independent
+        return self.compiled.create_infer_request().infer({0: batch})[self.output]
+
+    def classify(self, images):
+        batch = np.stack([classify_preprocess(image, self.image_size) for image in images])
+        if self.fixed_batch == 1 and len(batch) > 1:
+            return np.concatenate([self._run(batch[i:i + 1]) for i in range(len(batch))])
+        return self._run(batch)
+
+def load_ultralytics_yolo(path):
+    """Load the original ultralytics model (imports torch)"""
+    import torch
+    from ultralytics import YOLO
+
+    try:
+        if Config.INTRA_OP_THREADS:
+            torch.set_num_threads(Config.INTRA_OP_THREADS)
+        if Config.INTER_OP_THREADS:
+            torch.set_num_interop_threads(Config.INTER_OP_THREADS)
+    except RuntimeError as e:
+        print(f"Warning: could not pin PyTorch threads: {str(e)}")
+
+    return YOLO(path)
+
+def yolo_artifact_path(runtime=None):
+    """Model file used by a runtime"""
+    runtime = runtime or Config.YOLO_RUNTIME
+    if runtime == 'onnx':
+        return Config.YOLO_ONNX_PATH
+    if runtime == 'openvino':
+        return Config.YOLO_OPENVINO_PATH
+    return Config.YOLO_MODEL_PATH
+
+def load_yolo_runtime(runtime=None):
+    """Load the stage classifier behind the configured (or given) runtime"""
+    runtime = runtime or Config.YOLO_RUNTIME
+    if runtime not in YOLO_RUNTIMES:
+        raise ValueError(f"Unknown YOLO_RUNTIME '{runtime}', use one of: {', '.join(YOLO_RUNTIMES)}")
+
+    if runtime == 'ultralytics':
+        return UltralyticsClassifier(load_ultralytics_yolo(Config.YOLO_MODEL_PATH))
+    if runtime == 'onnx':
+        return OnnxClassifier(
+            Config.YOLO_ONNX_PATH, Config.YOLO_IMAGE_SIZE,
+            Config.INTRA_OP_THREADS, Config.INTER_OP_THREADS
+        )
+    if not os.path.exists(Config.YOLO_OPENVINO_PATH):
+        raise FileNotFoundError(f"OpenVINO model not found: {Config.YOLO_OPENVINO_PATH}")
+    return OpenVINOClassifier(Config.YOLO_OPENVINO_PATH, Config.YOLO_IMAGE_SIZE, Config.INTRA_OP_THREADS)
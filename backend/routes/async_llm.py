@@ -0,0 +1,71 @@
+"""
+Async chat and recommendations routes for the ASGI serving mode
+
+Same request/response contract as routes/chat.py and
+routes/recommendations.py, but the LLM round trip is awaited on the event
+loop instead of holding a worker thread.
+"""
+from quart import Blueprint, request, Response
+from services.ai_service import chat_context, handle_chat_stream_async, resolve_chat_session
+from services.fallback_service import get_fallback_recommendations_async
+from services.history_store import record_prediction
+from routes.history import HISTORY_HEADER, history_user_id
+from routes.chat import SSE_HEADERS
+
+async_llm_bp = Blueprint('async_llm', __name__)
+
+def _error(message, status_code):
+    return {'error': message, 'status_code': status_code}, status_code
+
+@async_llm_bp.route('/api/chat', methods=['POST'])
+async def chat():
+    """Handle chat conversation with AI"""
+    try:
+        data = await request.get_json()
+
+        if not data or 'message' not in data:
+            return _error("No message provided", 400)
+
+        message = data['message']
+        conversation_history = data.get('conversation_history', [])
+        patient_info = data.get('patient_info', None)
+        diagnosis_result = data.get('diagnosis_result', None)
+
+        # Reuse the server-side session so only the new message is needed
+        session = resolve_chat_session(data.get('session_id'), conversation_history, chat_context(data))
+
+        # Stream AI response
+        return Response(
+            handle_chat_stream_async(message, conversation_history, patient_info, diagnosis_result, session=session),
+            mimetype='text/event-stream',
+            headers={**SSE_HEADERS, 'X-Session-Id': session.id}
+        )
+
+    except Exception as e:
+        return _error(f"Error in chat: {str(e)}", 500)
+
+@async_llm_bp.route('/api/recommendations', methods=['POST'])
+async def get_recommendations():
+    """Get medical recommendations based on diagnosis results"""
+    try:
+        data = await request.get_json()
+
+        if not data:
+            return _error("No data provided", 400)
+
+        result = await get_fallback_recommendations_async(
+            lung_cancer_label=data.get('lung_cancer_label', 'Low'),
+            tumor_detected=data.get('tumor_detected', False),
+            cancer_stage=data.get('cancer_stage', {}),
+            patient_info=data.get('patient_info', {}),
+            overlay_image=data.get('overlay_image', None)
+        )
+        history_id = record_prediction(
+            'recommendations', 'gemini', result, inputs=data,
+            user_id=history_user_id(request.headers)
+        )
+
+        return result, 200, {HISTORY_HEADER: history_id} if history_id else {}
+
+    except Exception as e:
+        return _error(f"Error generating recommendations: {str(e)}", 500)
@@ -2,11 +2,14 @@
 Chat routes for AI conversation
 """
 from flask import Blueprint, request, Response
-from services.ai_service import handle_chat_stream
+from services.ai_service import chat_context, handle_chat_stream, resolve_chat_session
 from utils.response_utils import error_response
 
 chat_bp = Blueprint('chat', __name__)
 
+# Disable proxy buffering so each SSE event reaches the client immediately
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
 @chat_bp.route('/api/chat', methods=['POST'])
 def chat():
     """Handle chat conversation with AI"""
@@ -21,10 +24,14 @@ def chat():
         patient_info = data.get('patient_info', None)
         diagnosis_result = data.get('diagnosis_result', None)
 
+        # Reuse the server-side session so only the new message is needed
+        session = resolve_chat_session(data.get('session_id'), conversation_history, chat_context(data))
+
         # Stream AI response
         return Response(
-            handle_chat_stream(message, conversation_history, patient_info, diagnosis_result),
-            mimetype='text/plain'
+            handle_chat_stream(message, conversation_history, patient_info, diagnosis_result, session=session),
+            mimetype='text/event-stream',
+            headers={**SSE_HEADERS, 'X-Session-Id': session.id}
         )
 
     except Exception as e:
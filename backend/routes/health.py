@@ -2,15 +2,33 @@
 Health check routes
 """
 from flask import Blueprint, jsonify
+from models.model_loader import get_model_status
+from models.inference_executor import get_executor_stats
+from utils.cache import get_result_cache
+from services.session_store import get_session_store
+from services.recommendation_cache import get_recommendation_cache
+from services.job_queue import get_job_store
+from services.history_store import get_history_stats
+from config import Config
 
 health_bp = Blueprint('health', __name__)
 
 @health_bp.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
+    cache = get_result_cache()
+    recommendation_cache = get_recommendation_cache()
     return jsonify({
         'status': 'healthy',
-        'message': 'Medical AI API is running'
+        'message': 'Medical AI API is running',
+        'models': get_model_status(),
+        'runtimes': {'unet': Config.UNET_BACKEND, 'yolo': Config.YOLO_RUNTIME},
+        'inference_pools': get_executor_stats(),
+        'result_cache': cache.stats() if cache is not None else None,
+        'chat_sessions': get_session_store().stats(),
+        'recommendation_cache': recommendation_cache.stats() if recommendation_cache is not None else None,
+        'jobs': get_job_store().counts(),
+        'history': get_history_stats()
     })
 
 @health_bp.route('/', methods=['GET'])
@@ -22,9 +40,15 @@ def root():
         'endpoints': {
             'health': '/health',
             'lung_cancer_prediction': '/api/predict/lung-cancer',
+            'lung_cancer_batch_prediction': '/api/predict/lung-cancer/batch',
             'tumor_detection': '/api/predict/tumor',
+            'tumor_volume': '/api/predict/tumor/volume',
             'cancer_stage': '/api/predict/cancer-stage',
+            'ct_analysis': '/api/predict/ct-analysis',
             'chat': '/api/chat',
+            'jobs': '/api/jobs',
+            'history': '/api/history',
+            'metrics': '/metrics',
             'recommendations': '/api/recommendations'
         }
     })
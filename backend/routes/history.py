@@ -0,0 +1,117 @@
+"""
+Prediction history routes
+
+Prediction routes call `record_history` after a successful inference; the
+entry id is returned in the X-History-Id header. Entries are owned by the
+user of the Supabase access token the frontend sends as a Bearer token;
+anonymous predictions are recorded without an owner and can't be read back.
+"""
+from flask import Blueprint, request, jsonify, g
+from services.history_store import InvalidCursorError, get_history_store, record_prediction
+from utils.auth_utils import AuthError, AuthNotConfiguredError, request_user_id
+from utils.response_utils import error_response
+from config import Config
+
+history_bp = Blueprint('history', __name__)
+
+HISTORY_HEADER = 'X-History-Id'
+
+def history_user_id(headers=None):
+    """Owner for a new history entry: the verified token's user, else None
+
+    Defaults to the current Flask request's headers; async routes pass
+    their own request's headers.
+    """
+    try:
+        return request_user_id(request.headers if headers is None else headers, required=False)
+    except AuthError as e:
+        # Predictions don't require sign-in, so a bad token only drops ownership
+        print(f"History entry recorded without owner: {str(e)}")
+        return None
+
+def record_history(endpoint, model, result, inputs=None, content_hash=None):
+    """Queue a result for the history store from inside a Flask request"""
+    history_id = record_prediction(
+        endpoint, model, result,
+        inputs=inputs,
+        content_hash=content_hash,
+        user_id=history_user_id()
+    )
+    if history_id is not None:
+        g.history_id = history_id
+    return history_id
+
+@history_bp.after_app_request
+def add_history_header(response):
+    history_id = g.pop('history_id', None)
+    if history_id is not None:
+        response.headers[HISTORY_HEADER] = history_id
+    return response
+
+@history_bp.route('/api/history', methods=['GET'])
+def list_history():
+    """The caller's prediction history, newest first, with keyset pagination
+
+    Filters: endpoint, model, model_version, content_hash, since/until (epoch
+    seconds). Pass the returned `next_cursor` as `cursor` for the next page.
+    """
+    try:
+        store = get_history_store()
+        if store is None:
+            return error_response("Prediction history is disabled on this server", 503)
+        user_id = request_user_id(request.headers)
+
+        args = request.args
+        limit = args.get('limit', Config.HISTORY_PAGE_SIZE, type=int)
+        if limit < 1 or limit > Config.HISTORY_MAX_PAGE_SIZE:
+            return error_response(f"limit must be between 1 and {Config.HISTORY_MAX_PAGE_SIZE}", 400)
+
+        filters = {
+            'endpoint': args.get('endpoint'),
+            'model': args.get('model'),
+            'model_version': args.get('model_version'),
+            'content_hash': args.get('content_hash')
+        }
+        include_result = args.get('include_result', 'true').strip().lower() in {'1', 'true', 'yes', 'on'}
+
+        entries, next_cursor = store.query(
+            user_id,
+            filters,
+            since=args.get('since', type=float),
+            until=args.get('until', type=float),
+            limit=limit,
+            cursor=args.get('cursor'),
+            include_result=include_result
+        )
+        return jsonify({'items': entries, 'next_cursor': next_cursor})
+
+    except AuthNotConfiguredError as e:
+        return error_response(str(e), 503)
+    except AuthError as e:
+        return error_response(str(e), 401)
+    except InvalidCursorError as e:
+        return error_response(str(e), 400)
+    except Exception as e:
+        return error_response(f"Error reading prediction history: {str(e)}", 500)
+
+@history_bp.route('/api/history/<entry_id>', methods=['GET'])
+def get_history_entry(entry_id):
+    """One of the caller's history entries by id"""
+    try:
+        store = get_history_store()
+        if store is None:
+            return error_response("Prediction history is disabled on this server", 503)
+        user_id = request_user_id(request.headers)
+
+        # Other users' entries are indistinguishable from missing ones
+        entry = store.get(entry_id, user_id)
+        if entry is None:
+            return error_response("History entry not found", 404)
+        return jsonify(entry)
+
+    except AuthNotConfiguredError as e:
+        return error_response(str(e), 503)
+    except AuthError as e:
+        return error_response(str(e), 401)
+    except Exception as e:
+        return error_response(f"Error reading prediction history: {str(e)}", 500)
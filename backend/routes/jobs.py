@@ -0,0 +1,236 @@
+"""
+Job routes for long-running cohorts, volumes and recommendations
+
+Jobs belong to the user of the Supabase access token they were submitted
+with; other users' jobs are reported as not found.
+"""
+import json
+import os
+import time
+import uuid
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+import services.job_handlers  # noqa: F401  (registers the built-in job kinds)
+from services.job_queue import (
+    JOB_STATES,
+    TERMINAL_STATES,
+    UnknownJobKindError,
+    get_job_store,
+    get_job_kinds,
+    submit_job,
+    cancel_job
+)
+from routes.chat import SSE_HEADERS
+from utils.record_utils import detect_record_format
+from utils.volume_utils import INTENSITY_MODES, detect_volume_format
+from utils.auth_utils import AuthError, AuthNotConfiguredError, request_user_id
+from utils.response_utils import error_response
+from config import Config
+
+jobs_bp = Blueprint('jobs', __name__)
+
+def _job_view(job, include_result=True):
+    """Public representation of a job (the input payload is not echoed back)"""
+    view = {
+        'job_id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'priority': job['priority'],
+        'progress': job['progress'],
+        'message': job['message'],
+        'attempts': job['attempts'],
+        'max_attempts': job['max_attempts'],
+        'error': job['error'],
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+        'expires_at': job['expires_at']
+    }
+    if include_result and job['status'] == 'succeeded':
+        view['result'] = job['result']
+    return view
+
+def _spool_upload(upload):
+    """Save an uploaded input file for a worker to read later"""
+    os.makedirs(Config.JOB_SPOOL_DIR, exist_ok=True)
+    extension = os.path.splitext(upload.filename or '')[1].lower()
+    path = os.path.join(Config.JOB_SPOOL_DIR, f"{uuid.uuid4().hex}{extension}")
+    upload.save(path)
+    return path
+
+def _multipart_payload(kind):
+    """Build a job payload from a multipart upload; returns (payload, spooled input path)"""
+    form = request.form
+
+    if kind == 'lung_cancer_batch':
+        upload = request.files.get('file')
+        if upload is None:
+            raise ValueError("No file provided")
+        record_format = detect_record_format(upload.mimetype, upload.filename)
+        if record_format is None:
+            raise ValueError("Unsupported format: send a JSON array, NDJSON or CSV")
+        return {
+            'format': record_format,
+            'chunk_size': form.get('chunk_size', type=int)
+        }, _spool_upload(upload)
+
+    if kind == 'tumor_volume':
+        upload = request.files.get('volume') or request.files.get('file')
+        if upload is None:
+            raise ValueError("No volume provided")
+        volume_format = detect_volume_format(upload.filename)
+        if volume_format is None:
+            raise ValueError("Unsupported volume: send a DICOM series .zip, .npy or .npz")
+        intensity = form.get('intensity', 'hu').strip().lower()
+        if intensity not in INTENSITY_MODES:
+            raise ValueError(f"Unsupported intensity, use one of: {', '.join(INTENSITY_MODES)}")
+        spacing = [float(value) for value in form.get('spacing', '1,1,1').split(',')]
+        if len(spacing) != 3:
+            raise ValueError("spacing must be 'slice,row,column' in mm")
+        return {
+            'format': volume_format,
+            'threshold': float(form.get('threshold', 0.5)),
+            'intensity': intensity,
+            'spacing': spacing,
+            'batch_size': form.get('batch_size', type=int),
+            'window_center': form.get('window_center', type=float),
+            'window_width': form.get('window_width', type=float)
+        }, _spool_upload(upload)
+
+    raise ValueError(f"Job kind '{kind}' takes a JSON body")
+
+@jobs_bp.route('/api/jobs', methods=['POST'])
+def create_job():
+    """Queue a job; returns 202 with the job id
+
+    JSON body: {"kind", "payload", "priority"?, "max_attempts"?}. Cohort and
+    volume files can instead be uploaded as multipart with a `kind` field.
+    """
+    try:
+        user_id = request_user_id(request.headers)
+        if request.mimetype == 'multipart/form-data':
+            kind = request.form.get('kind', '')
+            priority = request.form.get('priority', 0, type=int)
+            max_attempts = request.form.get('max_attempts', type=int)
+            payload, input_path = _multipart_payload(kind) if kind in get_job_kinds() else (None, None)
+        else:
+            data = request.get_json()
+            if not data:
+                return error_response("No data provided", 400)
+            kind = data.get('kind', '')
+            priority = int(data.get('priority', 0))
+            max_attempts = data.get('max_attempts')
+            payload = data.get('payload', {})
+            input_path = None
+            if not isinstance(payload, dict):
+                return error_response("payload must be a JSON object", 400)
+            # Files reach a job only through a multipart upload into the spool directory
+            if 'path' in payload:
+                return error_response("payload.path is not accepted; upload the file as multipart", 400)
+            if kind == 'tumor_volume':
+                return error_response("tumor_volume jobs need a multipart volume upload", 400)
+
+        job_id = submit_job(kind, payload, priority, max_attempts, input_path, user_id)
+        response = jsonify({
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': f"/api/jobs/{job_id}",
+            'events_url': f"/api/jobs/{job_id}/events"
+        })
+        response.headers['Location'] = f"/api/jobs/{job_id}"
+        return response, 202
+
+    except AuthNotConfiguredError as e:
+        return error_response(str(e), 503)
+    except AuthError as e:
+        return error_response(str(e), 401)
+    except UnknownJobKindError as e:
+        return error_response(str(e), 400)
+    except ValueError as e:
+        return error_response(str(e), 400)
+    except Exception as e:
+        return error_response(f"Error creating job: {str(e)}", 500)
+
+def _auth_error_response(error):
+    """401 for a missing or invalid token, 503 when the server can't verify tokens"""
+    if isinstance(error, AuthNotConfiguredError):
+        return error_response(str(error), 503)
+    return error_response(str(error), 401)
+
+@jobs_bp.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """List the caller's recent jobs, optionally filtered by status"""
+    try:
+        user_id = request_user_id(request.headers)
+    except AuthError as e:
+        return _auth_error_response(e)
+
+    status = request.args.get('status')
+    if status and status not in JOB_STATES:
+        return error_response(f"Unknown status, use one of: {', '.join(JOB_STATES)}", 400)
+    limit = min(request.args.get('limit', 50, type=int), 500)
+
+    jobs = get_job_store().list(user_id, status, limit)
+    return jsonify({'jobs': [_job_view(job, include_result=False) for job in jobs]})
+
+@jobs_bp.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Job status, progress and (once succeeded) its result"""
+    try:
+        user_id = request_user_id(request.headers)
+    except AuthError as e:
+        return _auth_error_response(e)
+
+    # Other users' jobs are indistinguishable from missing ones
+    job = get_job_store().get(job_id, user_id)
+    if job is None:
+        return error_response("Job not found", 404)
+    return jsonify(_job_view(job))
+
+@jobs_bp.route('/api/jobs/<job_id>', methods=['DELETE'])
+def delete_job(job_id):
+    """Cancel a job (queued jobs stop immediately, running jobs at their next progress report)"""
+    try:
+        user_id = request_user_id(request.headers)
+    except AuthError as e:
+        return _auth_error_response(e)
+
+    status = cancel_job(job_id, user_id)
+    if status is None:
+        return error_response("Job not found", 404)
+    return jsonify({'job_id': job_id, 'status': status})
+
+@jobs_bp.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Stream job progress as SSE events until the job finishes"""
+    try:
+        user_id = request_user_id(request.headers)
+    except AuthError as e:
+        return _auth_error_response(e)
+
+    store = get_job_store()
+    if store.get(job_id, user_id) is None:
+        return error_response("Job not found", 404)
+
+    def generate():
+        last = None
+        last_sent = time.monotonic()
+        while True:
+            job = store.get(job_id, user_id)
+            if job is None:
+                yield f"data: {json.dumps({'job_id': job_id, 'status': 'expired'})}\n\n"
+                return
+
+            state = (job['status'], job['progress'], job['message'], job['attempts'])
+            if state != last:
+                last = state
+                last_sent = time.monotonic()
+                yield f"data: {json.dumps(_job_view(job, include_result=False))}\n\n"
+            elif time.monotonic() - last_sent >= Config.CHAT_HEARTBEAT_SECONDS:
+                last_sent = time.monotonic()
+                yield ": heartbeat\n\n"
+
+            if job['status'] in TERMINAL_STATES:
+                return
+            time.sleep(Config.JOB_EVENTS_POLL_SECONDS)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=SSE_HEADERS)
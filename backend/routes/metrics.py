@@ -0,0 +1,43 @@
+"""
+Metrics routes for Prometheus scraping
+"""
+import time
+from flask import Blueprint, Response, g, request
+from utils.metrics import REGISTRY
+
+metrics_bp = Blueprint('metrics', __name__)
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Time until the response is returned, by route and status',
+    labelnames=('method', 'route', 'status')
+)
+
+def route_label(url_rule):
+    """Route template for a request (bounded label values; 'unmatched' for 404s)"""
+    return url_rule.rule if url_rule is not None else 'unmatched'
+
+def observe_request(method, url_rule, status, seconds):
+    """Record one request in the per-route histogram"""
+    HTTP_REQUEST_SECONDS.observe(seconds, method=method, route=route_label(url_rule), status=status)
+
+def register_request_metrics(app):
+    """Time every request of a Flask app into http_request_duration_seconds
+
+    Streaming responses are timed until their headers are returned; chat
+    streams have their own time-to-first-token and tokens/s metrics.
+    """
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def observe_request_time(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            observe_request(request.method, request.url_rule, response.status_code, time.perf_counter() - started)
+        return response
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text exposition of all registered metrics"""
+    return Response(REGISTRY.render_prometheus(), mimetype='text/plain; version=0.0.4')
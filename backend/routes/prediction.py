@@ -1,15 +1,55 @@
 """
 Prediction routes for AI models
 """
-from flask import Blueprint, request, jsonify
-from PIL import Image
-from models.xgboost_model import predict_lung_cancer_risk
-from models.unet_model import predict_tumor_segmentation
+import json
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from werkzeug.exceptions import RequestEntityTooLarge
+from models.xgboost_model import (
+    predict_lung_cancer_risk,
+    predict_lung_cancer_risk_batch,
+    predict_lung_cancer_risk_matrix
+)
+from models.unet_model import predict_probability_maps, predict_tumor_segmentation
 from models.yolo_model import predict_cancer_stage
-from utils.response_utils import error_response
+from models.ct_analysis import analyze_ct_image
+from models.volume_analysis import analyze_volume
+from models.model_loader import ModelDisabledError, is_model_enabled
+from models.inference_executor import (
+    run_inference,
+    InferenceQueueFullError,
+    InferenceTimeoutError
+)
+from utils.record_utils import detect_record_format, iter_records
+from utils.mask_utils import MASK_ENCODINGS
+from utils.tile_utils import tile_count
+from utils.volume_utils import INTENSITY_MODES, VolumeTooLargeError, detect_volume_format, open_volume
+from utils.upload_utils import (
+    check_request_size,
+    load_upload_image,
+    UploadTooLargeError,
+    InvalidImageError
+)
+from utils.response_utils import error_response, busy_response, negotiate_result_format, result_response
+from routes.history import record_history
+from config import Config
 
 prediction_bp = Blueprint('prediction', __name__)
 
+def _form_flag(name, default='false'):
+    """Read a boolean form field"""
+    return request.form.get(name, default).strip().lower() in {'1', 'true', 'yes', 'on'}
+
+def _too_large_message(error):
+    """Message for uploads rejected by our limits or by MAX_CONTENT_LENGTH"""
+    if isinstance(error, RequestEntityTooLarge):
+        return f"Request body exceeds {Config.MAX_CONTENT_LENGTH} bytes"
+    return str(error)
+
+def _mask_encoding():
+    """Requested mask encoding (form field or query string), or None when unsupported"""
+    encoding = (request.form.get('encoding') or request.args.get('encoding') or Config.MASK_ENCODING).strip().lower()
+    return encoding if encoding in MASK_ENCODINGS else None
+
 @prediction_bp.route('/api/predict/lung-cancer', methods=['POST'])
 def predict_lung_cancer():
     """Predict lung cancer risk using patient data"""
@@ -20,50 +60,257 @@ def predict_lung_cancer():
             return error_response("No data provided", 400)
         
         # Predict lung cancer risk
-        result = predict_lung_cancer_risk(data)
+        result = run_inference('xgboost', predict_lung_cancer_risk, data)
+        record_history('lung_cancer', 'xgboost', result, inputs=data)
         
         return jsonify(result)
         
+    except ModelDisabledError as e:
+        return error_response(str(e), 503)
+    except InferenceQueueFullError as e:
+        return busy_response(str(e), e.retry_after)
+    except InferenceTimeoutError as e:
+        return error_response(str(e), 504)
     except Exception as e:
         return error_response(f"Error in lung cancer prediction: {str(e)}", 500)
 
+@prediction_bp.route('/api/predict/lung-cancer/batch', methods=['POST'])
+def predict_lung_cancer_batch():
+    """Predict lung cancer risk for a cohort of patients
+
+    Accepts a JSON array, NDJSON or CSV body (or a 'file' upload) and streams
+    one NDJSON line per patient: {"index": 0, "prediction": "Low"}.
+    """
+    try:
+        if 'file' in request.files:
+            upload = request.files['file']
+            record_format = detect_record_format(upload.mimetype, upload.filename)
+            stream = upload.stream
+        else:
+            record_format = detect_record_format(request.mimetype)
+            stream = request.stream
+        
+        if record_format is None:
+            return error_response("Unsupported format: send a JSON array, NDJSON or CSV", 415)
+        
+        if not is_model_enabled('xgboost'):
+            return error_response("Model 'xgboost' is disabled on this server", 503)
+        
+        chunk_size = request.args.get('chunk_size', type=int)
+        records = iter_records(stream, record_format)
+        
+        # Each chunk is scored on the XGBoost inference pool
+        def predict_chunk(features):
+            return run_inference('xgboost', predict_lung_cancer_risk_matrix, features)
+        
+        def generate():
+            try:
+                for index, label in predict_lung_cancer_risk_batch(records, chunk_size, predict_chunk):
+                    yield json.dumps({'index': index, 'prediction': label}) + "\n"
+            except Exception as e:
+                yield json.dumps({'error': str(e)}) + "\n"
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
+    except Exception as e:
+        return error_response(f"Error in lung cancer batch prediction: {str(e)}", 400)
+
 @prediction_bp.route('/api/predict/tumor', methods=['POST'])
 def predict_tumor():
     """Predict tumor segmentation using CT scan image"""
     try:
+        check_request_size()
+        
         if 'image' not in request.files:
             return error_response("No image provided", 400)
         
         image_file = request.files['image']
         threshold = float(request.form.get('threshold', 0.5))
+        include_overlay = _form_flag('include_overlay')
+        tiled = _form_flag('tiled')
+        tta = _form_flag('tta')
+        if tiled and tta:
+            return error_response("tta cannot be combined with tiled", 400)
+        encoding = _mask_encoding()
+        if encoding is None:
+            return error_response(f"Unsupported mask encoding, use one of: {', '.join(MASK_ENCODINGS)}", 400)
         
-        # Load and process image
-        img = Image.open(image_file.stream)
+        # Decode once and hash the raw upload bytes; tiled mode needs full resolution,
+        # so it skips JPEG reduce-on-load
+        img, content_hash = load_upload_image(image_file, draft_size=0 if tiled else None)
+        
+        if tiled:
+            tiles = tile_count((img.height, img.width), Config.IMAGE_SIZE[0], Config.UNET_TILE_OVERLAP)
+            if tiles > Config.UNET_TILE_MAX_TILES:
+                return error_response(f"Image needs {tiles} tiles, limit is {Config.UNET_TILE_MAX_TILES}", 413)
+        
+        # Binary formats carry mask and overlay bytes without base64
+        result_format = negotiate_result_format()
         
         # Predict tumor segmentation
-        result = predict_tumor_segmentation(img, threshold)
+        result = run_inference(
+            'unet', predict_tumor_segmentation, img, threshold,
+            content_hash=content_hash, encoding=encoding, include_overlay=include_overlay,
+            raw=result_format != 'json', tiled=tiled, tta=tta
+        )
+        record_history(
+            'tumor', 'unet', result, content_hash=content_hash,
+            inputs={'threshold': threshold, 'encoding': encoding, 'tiled': tiled, 'tta': tta}
+        )
         
-        return jsonify(result)
+        return result_response(result, result_format)
         
+    except (UploadTooLargeError, RequestEntityTooLarge) as e:
+        return error_response(_too_large_message(e), 413)
+    except InvalidImageError as e:
+        return error_response(str(e), 400)
+    except ModelDisabledError as e:
+        return error_response(str(e), 503)
+    except InferenceQueueFullError as e:
+        return busy_response(str(e), e.retry_after)
+    except InferenceTimeoutError as e:
+        return error_response(str(e), 504)
     except Exception as e:
         return error_response(f"Error in tumor prediction: {str(e)}", 500)
 
+@prediction_bp.route('/api/predict/tumor/volume', methods=['POST'])
+def predict_tumor_volume():
+    """Tumor segmentation over a CT volume (DICOM series zip, .npy or .npz)
+
+    Slices are windowed, resized and segmented in fixed-size batches on the
+    U-Net pool; the response has a per-slice summary and the 3D tumor volume.
+    """
+    try:
+        check_request_size(Config.MAX_VOLUME_BYTES)
+        
+        upload = request.files.get('volume') or request.files.get('file')
+        if upload is None:
+            return error_response("No volume provided", 400)
+        
+        volume_format = detect_volume_format(upload.filename)
+        if volume_format is None:
+            return error_response("Unsupported volume: send a DICOM series .zip, .npy or .npz", 415)
+        
+        threshold = float(request.form.get('threshold', 0.5))
+        batch_size = request.form.get('batch_size', type=int)
+        intensity = request.form.get('intensity', 'hu').strip().lower()
+        if intensity not in INTENSITY_MODES:
+            return error_response(f"Unsupported intensity, use one of: {', '.join(INTENSITY_MODES)}", 400)
+        
+        # Voxel spacing (slice, row, column) in mm for NumPy volumes; DICOM carries its own
+        spacing = tuple(float(value) for value in request.form.get('spacing', '1,1,1').split(','))
+        if len(spacing) != 3:
+            return error_response("spacing must be 'slice,row,column' in mm", 400)
+        
+        window_center = request.form.get('window_center', type=float)
+        window_width = request.form.get('window_width', type=float)
+        
+        # Slice, slice size and voxel limits are checked from the header before any pixels are read
+        volume = open_volume(upload.stream, volume_format, spacing, intensity)
+        
+        # Each batch of slices is one job on the U-Net inference pool
+        def predict_batch(batch):
+            return run_inference('unet', predict_probability_maps, batch)
+        
+        result = analyze_volume(
+            volume, threshold, batch_size, predict_batch,
+            window_center=window_center, window_width=window_width
+        )
+        record_history('tumor_volume', 'unet', result, inputs={
+            'filename': upload.filename, 'threshold': threshold, 'intensity': intensity,
+            'spacing': list(spacing), 'window_center': window_center, 'window_width': window_width
+        })
+        
+        return result_response(result, negotiate_result_format())
+        
+    except (UploadTooLargeError, VolumeTooLargeError, RequestEntityTooLarge) as e:
+        return error_response(_too_large_message(e), 413)
+    except ValueError as e:
+        return error_response(str(e), 400)
+    except ModelDisabledError as e:
+        return error_response(str(e), 503)
+    except InferenceQueueFullError as e:
+        return busy_response(str(e), e.retry_after)
+    except InferenceTimeoutError as e:
+        return error_response(str(e), 504)
+    except Exception as e:
+        return error_response(f"Error in volume prediction: {str(e)}", 500)
+
 @prediction_bp.route('/api/predict/cancer-stage', methods=['POST'])
 def predict_cancer_stage_route():
     """Predict cancer stage classification using CT scan image"""
     try:
+        check_request_size()
+        
         if 'image' not in request.files:
             return error_response("No image provided", 400)
         
         image_file = request.files['image']
+        tta = _form_flag('tta')
         
-        # Load and process image
-        img = Image.open(image_file.stream)
+        # Decode once (reduce-on-load for JPEG) and hash the raw upload bytes
+        img, content_hash = load_upload_image(image_file)
         
         # Predict cancer stage
-        result = predict_cancer_stage(img)
+        result = run_inference('yolo', predict_cancer_stage, img, content_hash, tta=tta)
+        record_history('cancer_stage', 'yolo', result, content_hash=content_hash, inputs={'tta': tta})
         
         return jsonify(result)
         
+    except (UploadTooLargeError, RequestEntityTooLarge) as e:
+        return error_response(_too_large_message(e), 413)
+    except InvalidImageError as e:
+        return error_response(str(e), 400)
+    except ModelDisabledError as e:
+        return error_response(str(e), 503)
+    except InferenceQueueFullError as e:
+        return busy_response(str(e), e.retry_after)
+    except InferenceTimeoutError as e:
+        return error_response(str(e), 504)
     except Exception as e:
         return error_response(f"Error in cancer stage prediction: {str(e)}", 500)
+
+@prediction_bp.route('/api/predict/ct-analysis', methods=['POST'])
+def predict_ct_analysis():
+    """Tumor segmentation and cancer stage classification from a single upload"""
+    try:
+        check_request_size()
+        
+        if 'image' not in request.files:
+            return error_response("No image provided", 400)
+        
+        image_file = request.files['image']
+        threshold = float(request.form.get('threshold', 0.5))
+        include_overlay = _form_flag('include_overlay')
+        tta = _form_flag('tta')
+        encoding = _mask_encoding()
+        if encoding is None:
+            return error_response(f"Unsupported mask encoding, use one of: {', '.join(MASK_ENCODINGS)}", 400)
+        
+        # Load image once for both models
+        img, content_hash = load_upload_image(image_file)
+        
+        result_format = negotiate_result_format()
+        result = analyze_ct_image(
+            img, threshold, include_overlay, encoding,
+            raw=result_format != 'json', content_hash=content_hash, tta=tta
+        )
+        record_history(
+            'ct_analysis', 'unet+yolo', result, content_hash=content_hash,
+            inputs={'threshold': threshold, 'encoding': encoding, 'tta': tta}
+        )
+        
+        return result_response(result, result_format)
+        
+    except (UploadTooLargeError, RequestEntityTooLarge) as e:
+        return error_response(_too_large_message(e), 413)
+    except InvalidImageError as e:
+        return error_response(str(e), 400)
+    except ModelDisabledError as e:
+        return error_response(str(e), 503)
+    except InferenceQueueFullError as e:
+        return busy_response(str(e), e.retry_after)
+    except InferenceTimeoutError as e:
+        return error_response(str(e), 504)
+    except Exception as e:
+        return error_response(f"Error in CT analysis: {str(e)}", 500)
@@ -4,6 +4,7 @@ Recommendations routes for medical advice
 from flask import Blueprint, request, jsonify
 from services.fallback_service import get_fallback_recommendations
 from utils.response_utils import error_response
+from routes.history import record_history
 
 recommendations_bp = Blueprint('recommendations', __name__)
 
@@ -37,6 +38,7 @@ def get_recommendations():
             patient_info=patient_info,
             overlay_image=overlay_image
         )
+        record_history('recommendations', 'gemini', result, inputs=data)
 
         return jsonify(result)
 
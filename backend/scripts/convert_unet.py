@@ -0,0 +1,184 @@
+"""
+Export the Keras U-Net to TFLite or ONNX and check mask parity
+
+Converts UNET_MODEL_PATH (optionally float16 or int8 quantized), then runs the
+original Keras model and the export on the same slices and reports per-slice
+Dice/IoU of the thresholded masks, the largest probability difference and
+per-slice latency. Exits 1 when the mean Dice is below --min-dice.
+
+int8 calibration uses --samples (a directory of CT slice images) when given,
+otherwise synthetic slices; use real slices for a meaningful parity check.
+
+Usage (from the backend directory):
+    python -m scripts.convert_unet --format onnx --samples data/sample_slices
+    python -m scripts.convert_unet --format tflite --quantize int8 --samples data/sample_slices
+    python -m scripts.convert_unet --format tf_function --check-only
+Then serve it with UNET_BACKEND=onnx (or tflite / tf_function).
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+from PIL import Image
+from config import Config
+from models.unet_backends import (
+    KerasBackend,
+    TFFunctionBackend,
+    TFLiteBackend,
+    OnnxBackend,
+    load_keras_unet,
+    unet_artifact_path
+)
+from models.unet_model import preprocess_image_for_unet
+from utils.mask_utils import mask_agreement
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+
+def load_samples(samples_dir=None, count=64):
+    """Preprocessed (N, H, W, 1) slices from a directory, or synthetic ones"""
+    if samples_dir:
+        names = sorted(name for name in os.listdir(samples_dir) if name.lower().endswith(IMAGE_EXTENSIONS))
+        images = [Image.open(os.path.join(samples_dir, name)) for name in names[:count]]
+        if not images:
+            raise SystemExit(f"No images found in {samples_dir}")
+    else:
+        from benchmarks.prediction_suite import make_synthetic_images
+        images = make_synthetic_images(count)
+    return np.concatenate([preprocess_image_for_unet(image) for image in images], axis=0)
+
+def export_tflite(model, path, quantize, samples):
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantize == 'float16':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantize == 'int8':
+        # Weights and activations in int8; inputs/outputs stay float32
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = lambda: ([sample[None]] for sample in samples)
+
+    with open(path, 'wb') as f:
+        f.write(converter.convert())
+
+class _CalibrationReader:
+    """Feeds calibration slices to onnxruntime's static quantizer one at a time"""
+
+    def __init__(self, input_name, samples):
+        self.input_name = input_name
+        self.samples = iter(samples)
+
+    def get_next(self):
+        sample = next(self.samples, None)
+        return None if sample is None else {self.input_name: sample[None]}
+
+    def rewind(self):
+        pass
+
+def export_onnx(model, path, quantize, samples):
+    import tensorflow as tf
+    import tf2onnx
+
+    width, height = Config.IMAGE_SIZE
+    signature = (tf.TensorSpec((None, height, width, 1), tf.float32, name='input'),)
+    float_path = path if quantize == 'none' else f"{path}.float.onnx"
+    tf2onnx.convert.from_keras(model, input_signature=signature, opset=17, output_path=float_path)
+
+    if quantize == 'float16':
+        import onnx
+        from onnxconverter_common import float16
+
+        converted = float16.convert_float_to_float16(onnx.load(float_path), keep_io_types=True)
+        onnx.save(converted, path)
+    elif quantize == 'int8':
+        from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+
+        quantize_static(
+            float_path, path, _CalibrationReader('input', samples),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QInt8,
+            weight_type=QuantType.QInt8
+        )
+
+    if float_path != path:
+        os.remove(float_path)
+
+def load_candidate(backend, model, path):
+    if backend == 'tf_function':
+        return TFFunctionBackend(model, Config.IMAGE_SIZE)
+    if backend == 'tflite':
+        return TFLiteBackend(path, Config.INTRA_OP_THREADS)
+    return OnnxBackend(path, Config.INTRA_OP_THREADS, Config.INTER_OP_THREADS)
+
+def predict_all(backend, samples, batch_size):
+    """Probability maps for every sample plus the mean latency per slice"""
+    backend.predict(samples[:1])  # warm-up
+    outputs = []
+    start = time.perf_counter()
+    for offset in range(0, len(samples), batch_size):
+        outputs.append(backend.predict(samples[offset:offset + batch_size])[..., 0])
+    elapsed = time.perf_counter() - start
+    return np.concatenate(outputs, axis=0), elapsed / len(samples) * 1000.0
+
+def check_parity(reference, candidate, samples, threshold=0.5, batch_size=8):
+    """Compare thresholded masks from two backends slice by slice"""
+    expected, reference_ms = predict_all(reference, samples, batch_size)
+    actual, candidate_ms = predict_all(candidate, samples, batch_size)
+
+    scores = [mask_agreement(a > threshold, b > threshold) for a, b in zip(expected, actual)]
+    dice = np.array([score['dice'] for score in scores])
+    iou = np.array([score['iou'] for score in scores])
+    return {
+        'slices': len(samples),
+        'dice_mean': float(dice.mean()),
+        'dice_min': float(dice.min()),
+        'iou_mean': float(iou.mean()),
+        'iou_min': float(iou.min()),
+        'max_probability_diff': float(np.abs(expected - actual).max()),
+        'reference_ms_per_slice': reference_ms,
+        'candidate_ms_per_slice': candidate_ms
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--format', choices=('tflite', 'onnx', 'tf_function'), required=True)
+    parser.add_argument('--quantize', choices=('none', 'float16', 'int8'), default='none')
+    parser.add_argument('--output', help='export path (default UNET_TFLITE_PATH / UNET_ONNX_PATH)')
+    parser.add_argument('--samples', help='directory of CT slice images for calibration and parity')
+    parser.add_argument('--count', type=int, default=64, help='slices to use')
+    parser.add_argument('--threshold', type=float, default=0.5)
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--min-dice', type=float, default=0.98)
+    parser.add_argument('--check-only', action='store_true', help='check an existing export')
+    args = parser.parse_args()
+
+    model = load_keras_unet(Config.UNET_MODEL_PATH)
+    samples = load_samples(args.samples, args.count)
+    path = args.output or unet_artifact_path(args.format)
+
+    if args.format != 'tf_function' and not args.check_only:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        if args.format == 'tflite':
+            export_tflite(model, path, args.quantize, samples)
+        else:
+            export_onnx(model, path, args.quantize, samples)
+        print(f"Exported {args.format} ({args.quantize}) to {path}: {os.path.getsize(path) / 1e6:.1f} MB")
+
+    report = check_parity(
+        KerasBackend(model), load_candidate(args.format, model, path), samples,
+        args.threshold, args.batch_size
+    )
+    print(f"Slices:       {report['slices']}")
+    print(f"Dice:         mean {report['dice_mean']:.4f}  min {report['dice_min']:.4f}")
+    print(f"IoU:          mean {report['iou_mean']:.4f}  min {report['iou_min']:.4f}")
+    print(f"Max |p diff|: {report['max_probability_diff']:.4f}")
+    print(f"Latency:      keras {report['reference_ms_per_slice']:.1f} ms/slice, "
+          f"{args.format} {report['candidate_ms_per_slice']:.1f} ms/slice")
+
+    if report['dice_mean'] < args.min_dice:
+        print(f"Mean Dice below {args.min_dice}: do not deploy this export")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
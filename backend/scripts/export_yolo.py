@@ -0,0 +1,115 @@
+"""
+Export the YOLO stage classifier to ONNX or OpenVINO and check parity
+
+Exports YOLO_MODEL_PATH with ultralytics (dynamic batch), then classifies the
+same images with the original PyTorch model and the exported runtime and
+reports the largest class probability difference, top-1 agreement and
+per-image latency. Exits 1 when probabilities differ by more than
+--tolerance. Exporting needs torch/ultralytics; serving the export does not.
+
+Usage (from the backend directory):
+    python -m scripts.export_yolo --format onnx --samples data/sample_slices
+    python -m scripts.export_yolo --format openvino --samples data/sample_slices
+Then serve it with YOLO_RUNTIME=onnx (or openvino).
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+import numpy as np
+from PIL import Image
+from config import Config
+from models.yolo_runtimes import (
+    UltralyticsClassifier,
+    OnnxClassifier,
+    OpenVINOClassifier,
+    load_ultralytics_yolo,
+    yolo_artifact_path
+)
+from models.yolo_model import preprocess_image_for_yolo
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+
+def load_samples(samples_dir=None, count=32):
+    """RGB images from a directory, or synthetic slices"""
+    if samples_dir:
+        names = sorted(name for name in os.listdir(samples_dir) if name.lower().endswith(IMAGE_EXTENSIONS))
+        images = [Image.open(os.path.join(samples_dir, name)) for name in names[:count]]
+        if not images:
+            raise SystemExit(f"No images found in {samples_dir}")
+    else:
+        from benchmarks.prediction_suite import make_synthetic_images
+        images = make_synthetic_images(count)
+    return [preprocess_image_for_yolo(image) for image in images]
+
+def export(model, export_format, output, half=False):
+    """Export with ultralytics and move the result to `output`"""
+    exported = model.export(format=export_format, dynamic=True, half=half, simplify=export_format == 'onnx')
+
+    if export_format == 'openvino':
+        # ultralytics writes a <name>_openvino_model/ directory holding the .xml/.bin pair
+        target_dir = os.path.dirname(output)
+        if os.path.abspath(exported) != os.path.abspath(target_dir):
+            shutil.rmtree(target_dir, ignore_errors=True)
+            shutil.move(exported, target_dir)
+        return output
+
+    if os.path.abspath(exported) != os.path.abspath(output):
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        shutil.move(exported, output)
+    return output
+
+def classify_all(runtime, images, batch_size):
+    """Probabilities for every image plus the mean latency per image"""
+    runtime.classify(images[:1])  # warm-up
+    outputs = []
+    start = time.perf_counter()
+    for offset in range(0, len(images), batch_size):
+        outputs.append(runtime.classify(images[offset:offset + batch_size]))
+    elapsed = time.perf_counter() - start
+    return np.concatenate(outputs, axis=0), elapsed / len(images) * 1000.0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--format', choices=('onnx', 'openvino'), required=True)
+    parser.add_argument('--output', help='export path (default YOLO_ONNX_PATH / YOLO_OPENVINO_PATH)')
+    parser.add_argument('--half', action='store_true', help='float16 weights (OpenVINO)')
+    parser.add_argument('--samples', help='directory of CT slice images for the parity check')
+    parser.add_argument('--count', type=int, default=32)
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--tolerance', type=float, default=1e-4, help='max allowed probability difference')
+    parser.add_argument('--check-only', action='store_true', help='check an existing export')
+    args = parser.parse_args()
+
+    model = load_ultralytics_yolo(Config.YOLO_MODEL_PATH)
+    output = args.output or yolo_artifact_path(args.format)
+    if not args.check_only:
+        export(model, args.format, output, args.half)
+        print(f"Exported {args.format} to {output}")
+
+    start = time.perf_counter()
+    if args.format == 'onnx':
+        candidate = OnnxClassifier(output, Config.YOLO_IMAGE_SIZE, Config.INTRA_OP_THREADS, Config.INTER_OP_THREADS)
+    else:
+        candidate = OpenVINOClassifier(output, Config.YOLO_IMAGE_SIZE, Config.INTRA_OP_THREADS)
+    load_seconds = time.perf_counter() - start
+
+    images = load_samples(args.samples, args.count)
+    expected, reference_ms = classify_all(UltralyticsClassifier(model), images, args.batch_size)
+    actual, candidate_ms = classify_all(candidate, images, args.batch_size)
+
+    max_diff = float(np.abs(expected - actual).max())
+    top1_agreement = float(np.mean(np.argmax(expected, axis=1) == np.argmax(actual, axis=1)))
+    print(f"Images:          {len(images)} (input size {candidate.image_size})")
+    print(f"Max |p diff|:    {max_diff:.2e}")
+    print(f"Top-1 agreement: {top1_agreement:.2%}")
+    print(f"Latency:         ultralytics {reference_ms:.1f} ms/image, {args.format} {candidate_ms:.1f} ms/image")
+    print(f"Session load:    {load_seconds:.2f}s")
+
+    if max_diff > args.tolerance:
+        print(f"Probabilities differ by more than {args.tolerance}: check preprocessing and export settings")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -1,115 +1,310 @@
 """
 AI service for Gemini API interactions
 """
+import asyncio
 import json
+import queue
+import threading
+import time
 import google.generativeai as genai
+from services.gemini_client import configure_gemini, get_async_client, record_llm_call
+from services.session_store import get_session_store
+from utils.metrics import REGISTRY
 from config import Config
 
-def configure_gemini():
-    """Configure Gemini AI"""
-    if Config.GEMINI_API_KEY:
-        genai.configure(api_key=Config.GEMINI_API_KEY)
-        return True
-    return False
+CHAT_TTFT = REGISTRY.histogram(
+    'chat_time_to_first_token_seconds',
+    'Time from chat request to the first streamed token'
+)
+CHAT_TOKENS_PER_SECOND = REGISTRY.histogram(
+    'chat_tokens_per_second',
+    'Generation speed of completed chat streams',
+    buckets=(1, 5, 10, 25, 50, 100, 200, 400)
+)
+CHAT_TOKENS = REGISTRY.counter('chat_tokens_total', 'Tokens streamed to chat clients')
+CHAT_STREAMS = REGISTRY.counter('chat_streams_total', 'Chat streams by outcome', labelnames=('outcome',))
 
-def handle_chat_stream(message, conversation_history, patient_info=None, diagnosis_result=None):
-    """Handle streaming chat with Gemini AI"""
+# Request keys that make up a chat session's patient context
+CHAT_CONTEXT_KEYS = ('patient_info', 'diagnosis_result')
+
+def build_chat_prefix(patient_info=None, diagnosis_result=None):
+    """Build the fixed conversation prefix: system prompt and the model's acknowledgement"""
+    # Build system prompt
+    system_prompt = "Bạn là Serna AI Trợ lý AI Y tế chuyên về Ung thư Phổi. Trả lời ngắn gọn, cụ thể, thân thiện. Luôn khuyến khích tham khảo bác sĩ."
+
+    # Add patient info context if available
+    if patient_info:
+        age = patient_info.get('age', 'Không rõ')
+        gender = "Nam" if patient_info.get('gender') == 1 else "Nữ" if patient_info.get('gender') == 0 else "Không rõ"
+        health_factors = patient_info.get('health_factors', {})
+
+        # Format ALL health factors (not just high-risk)
+        factors_list = []
+        if health_factors:
+            for factor, value in health_factors.items():
+                if isinstance(value, (int, float)):
+                    # Use abbreviations to reduce token count
+                    factor_short = ''.join([w[0] for w in factor.split('_')])
+                    factors_list.append(f"{factor_short}:{value}")
+
+        factors_text = f"Yếu tố: {', '.join(factors_list)}" if factors_list else "Yếu tố: Không có"
+
+        system_prompt += f"\n[BN] Tuổi:{age}, GT:{gender}. {factors_text}"
+
+    # Add diagnosis result context if available
+    if diagnosis_result:
+        full_response = diagnosis_result.get('full_response', '')
+        xgboost_result = diagnosis_result.get('xgboost_result', {})
+        tumor_result = diagnosis_result.get('tumor_result', {})
+        cancer_stage = diagnosis_result.get('cancer_stage', {})
+
+        # Add model results
+        model_results = []
+        if xgboost_result:
+            risk_level = xgboost_result.get('risk_level', '?')
+            model_results.append(f"XGB:{risk_level}")
+
+        if tumor_result:
+            has_tumor = tumor_result.get('has_tumor', False)
+            model_results.append(f"U:{'Có' if has_tumor else 'Không'}")
+
+        if cancer_stage:
+            stage = cancer_stage.get('stage', '?')
+            model_results.append(f"Stage:{stage}")
+
+        if model_results:
+            system_prompt += f"\n[KQ] {' | '.join(model_results)}"
+
+        # Add full clinical assessment from recommendations if available
+        if full_response:
+            # full_response contains NHẬN ĐỊNH LÂM SÀNG with all diagnosis info
+            # Expand to first 1000 chars to keep more key info
+            assessment_short = full_response[:1000] if len(full_response) > 1000 else full_response
+            system_prompt += f"\n[ASSESS] {assessment_short}"
+
+    # Build conversation context
+    contents = []
+
+    # Add system prompt as first message
+    contents.append({
+        "role": "user",
+        "parts": [{"text": system_prompt}]
+    })
+    contents.append({
+        "role": "model",
+        "parts": [{"text": "Tôi hiểu vai trò của mình. Tôi là Serna AI Trợ lý AI Y tế chuyên về Ung thư Phổi, sẵn sàng hỗ trợ bạn với các câu hỏi về sức khỏe phổi và ung thư phổi. Tôi sẽ cung cấp thông tin chính xác, an toàn và luôn khuyến khích bạn tham khảo ý kiến bác sĩ chuyên khoa khi cần thiết."}]
+    })
+
+    return contents
+
+def build_chat_contents(message, conversation_history, patient_info=None, diagnosis_result=None):
+    """Build the Gemini conversation: system prompt, acknowledgement, history and new message"""
+    contents = build_chat_prefix(patient_info, diagnosis_result)
+
+    # Add conversation history
+    for msg in conversation_history:
+        role = "user" if msg.get("role") == "user" else "model"
+        contents.append({
+            "role": role,
+            "parts": [{"text": msg.get("content", "")}]
+        })
+
+    # Add current message
+    contents.append({
+        "role": "user",
+        "parts": [{"text": message}]
+    })
+
+    return contents
+
+def chat_context(data):
+    """The context keys present in a chat request body (absent = unchanged)"""
+    return {key: data[key] for key in CHAT_CONTEXT_KEYS if key in data}
+
+def resolve_chat_session(session_id, conversation_history, context=None):
+    """Find the chat session for a request, creating one when needed
+
+    A known session only needs the new message. New sessions are seeded with
+    the prefix and any `conversation_history` the client sent. `context`
+    holds the patient_info / diagnosis_result keys the client sent; keys it
+    left out keep the session's value (null clears one). The prefix is only
+    rebuilt when the merged context changed.
+    """
+    store = get_session_store()
+    session = store.get(session_id)
+    if session is None:
+        merged = {key: (context or {}).get(key) for key in CHAT_CONTEXT_KEYS}
+        return store.create(build_chat_prefix(**merged), conversation_history, merged)
+
+    current = {key: session.context.get(key) for key in CHAT_CONTEXT_KEYS}
+    merged = {**current, **(context or {})}
+    if merged != current:
+        store.set_prefix(session, build_chat_prefix(**merged), merged)
+    return session
+
+def _chunk_text(chunk):
+    """Text of a streamed chunk ('' when the chunk carries no text, e.g. safety metadata)"""
+    try:
+        return chunk.text or ''
+    except Exception:
+        return ''
+
+def _chunk_token_count(chunk):
+    """Running candidate token count reported by Gemini (0 when absent)"""
+    usage = getattr(chunk, 'usage_metadata', None)
+    if usage is None:
+        return 0
+    return getattr(usage, 'candidates_token_count', 0) or 0
+
+class ChatStreamMetrics:
+    """Records time-to-first-token, tokens/s and the outcome of one chat stream"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_token_at = None
+        self.words = 0
+        self.tokens = 0
+
+    def on_chunk(self, text, token_count=0):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+            CHAT_TTFT.observe(self.first_token_at - self.start)
+        self.words += len(text.split())
+        # Gemini reports the running candidate token count; fall back to words
+        self.tokens = max(self.tokens, token_count)
+
+    def finish(self, outcome):
+        CHAT_STREAMS.inc(outcome=outcome)
+        tokens = self.tokens or self.words
+        CHAT_TOKENS.inc(tokens)
+        record_llm_call('chat', time.perf_counter() - self.start, outcome, completion_tokens=tokens)
+        if self.first_token_at is not None and outcome == 'completed':
+            elapsed = time.perf_counter() - self.first_token_at
+            if elapsed > 0:
+                CHAT_TOKENS_PER_SECOND.observe(tokens / elapsed)
+
+def handle_chat_stream(message, conversation_history, patient_info=None, diagnosis_result=None, session=None):
+    """Handle streaming chat with Gemini AI
+
+    Each chunk from Gemini is forwarded as its own SSE `data:` event as soon
+    as it arrives. A producer thread reads the Gemini stream so this
+    generator can emit heartbeat comments while waiting; when the client
+    disconnects the generator is closed and the producer stops reading.
+    With a `session`, the prompt comes from the session and the completed
+    exchange is appended to it.
+    """
     if not configure_gemini():
         yield "data: {\"text\": \"Gemini API key not configured\"}\n\n"
         return
 
+    metrics = ChatStreamMetrics()
+    events = queue.Queue()
+    cancelled = threading.Event()
+    outcome = 'cancelled'
+    reply = []
+
+    if session is not None:
+        contents = session.build_contents(message)
+    else:
+        contents = build_chat_contents(message, conversation_history, patient_info, diagnosis_result)
+
+    def produce():
+        try:
+            model = genai.GenerativeModel(Config.GEMINI_MODEL)
+            response = model.generate_content(contents, stream=True)
+            for chunk in response:
+                if cancelled.is_set():
+                    return
+                events.put(('chunk', chunk))
+            events.put(('done', None))
+        except Exception as e:
+            events.put(('error', e))
+
+    threading.Thread(target=produce, name='chat-stream', daemon=True).start()
+
     try:
-        model = genai.GenerativeModel(Config.GEMINI_MODEL)
-
-        # Build system prompt
-        system_prompt = "Bạn là Serna AI Trợ lý AI Y tế chuyên về Ung thư Phổi. Trả lời ngắn gọn, cụ thể, thân thiện. Luôn khuyến khích tham khảo bác sĩ."
-
-        # Add patient info context if available
-        if patient_info:
-            age = patient_info.get('age', 'Không rõ')
-            gender = "Nam" if patient_info.get('gender') == 1 else "Nữ" if patient_info.get('gender') == 0 else "Không rõ"
-            health_factors = patient_info.get('health_factors', {})
-
-            # Format ALL health factors (not just high-risk)
-            factors_list = []
-            if health_factors:
-                for factor, value in health_factors.items():
-                    if isinstance(value, (int, float)):
-                        # Use abbreviations to reduce token count
-                        factor_short = ''.join([w[0] for w in factor.split('_')])
-                        factors_list.append(f"{factor_short}:{value}")
-
-            factors_text = f"Yếu tố: {', '.join(factors_list)}" if factors_list else "Yếu tố: Không có"
-
-            system_prompt += f"\n[BN] Tuổi:{age}, GT:{gender}. {factors_text}"
-
-        # Add diagnosis result context if available
-        if diagnosis_result:
-            full_response = diagnosis_result.get('full_response', '')
-            xgboost_result = diagnosis_result.get('xgboost_result', {})
-            tumor_result = diagnosis_result.get('tumor_result', {})
-            cancer_stage = diagnosis_result.get('cancer_stage', {})
-
-            # Add model results
-            model_results = []
-            if xgboost_result:
-                risk_level = xgboost_result.get('risk_level', '?')
-                model_results.append(f"XGB:{risk_level}")
-
-            if tumor_result:
-                has_tumor = tumor_result.get('has_tumor', False)
-                model_results.append(f"U:{'Có' if has_tumor else 'Không'}")
-
-            if cancer_stage:
-                stage = cancer_stage.get('stage', '?')
-                model_results.append(f"Stage:{stage}")
-
-            if model_results:
-                system_prompt += f"\n[KQ] {' | '.join(model_results)}"
-
-            # Add full clinical assessment from recommendations if available
-            if full_response:
-                # full_response contains NHẬN ĐỊNH LÂM SÀNG with all diagnosis info
-                # Expand to first 1000 chars to keep more key info
-                assessment_short = full_response[:1000] if len(full_response) > 1000 else full_response
-                system_prompt += f"\n[ASSESS] {assessment_short}"
-
-        # Build conversation context
-        contents = []
-
-        # Add system prompt as first message
-        contents.append({
-            "role": "user",
-            "parts": [{"text": system_prompt}]
-        })
-        contents.append({
-            "role": "model",
-            "parts": [{"text": "Tôi hiểu vai trò của mình. Tôi là Serna AI Trợ lý AI Y tế chuyên về Ung thư Phổi, sẵn sàng hỗ trợ bạn với các câu hỏi về sức khỏe phổi và ung thư phổi. Tôi sẽ cung cấp thông tin chính xác, an toàn và luôn khuyến khích bạn tham khảo ý kiến bác sĩ chuyên khoa khi cần thiết."}]
-        })
+        while True:
+            try:
+                kind, payload = events.get(timeout=Config.CHAT_HEARTBEAT_SECONDS)
+            except queue.Empty:
+                # SSE comment keeps proxies and the client from timing out
+                yield ": heartbeat\n\n"
+                continue
 
-        # Add conversation history
-        for msg in conversation_history:
-            role = "user" if msg.get("role") == "user" else "model"
-            contents.append({
-                "role": role,
-                "parts": [{"text": msg.get("content", "")}]
-            })
+            if kind == 'chunk':
+                text = _chunk_text(payload)
+                if text:
+                    metrics.on_chunk(text, _chunk_token_count(payload))
+                    reply.append(text)
+                    yield f"data: {json.dumps({'text': text})}\n\n"
+            elif kind == 'done':
+                outcome = 'completed'
+                if session is not None:
+                    get_session_store().append_exchange(session, message, ''.join(reply))
+                # Send completion signal
+                yield f"data: {json.dumps({'done': True})}\n\n"
+                return
+            else:
+                outcome = 'error'
+                yield f"data: {json.dumps({'text': f'Error: {str(payload)}'})}\n\n"
+                return
+    finally:
+        # Client disconnects close the generator before completion
+        cancelled.set()
+        metrics.finish(outcome)
 
-        # Add current message
-        contents.append({
-            "role": "user",
-            "parts": [{"text": message}]
-        })
-        
-        # Generate response (non-streaming for compatibility)
-        response = model.generate_content(contents)
-        if response.text:
-            yield f"data: {json.dumps({'text': response.text})}\n\n"
+async def handle_chat_stream_async(message, conversation_history, patient_info=None, diagnosis_result=None, session=None):
+    """Async version of handle_chat_stream for the ASGI serving mode"""
+    client = get_async_client()
+    if client is None:
+        yield "data: {\"text\": \"Gemini API key not configured\"}\n\n"
+        return
 
-        # Send completion signal
-        yield f"data: {json.dumps({'done': True})}\n\n"
-                
-    except Exception as e:
-        yield f"data: {json.dumps({'text': f'Error: {str(e)}'})}\n\n"
+    metrics = ChatStreamMetrics()
+    outcome = 'cancelled'
+    reply = []
+    if session is not None:
+        contents = session.build_contents(message)
+    else:
+        contents = build_chat_contents(message, conversation_history, patient_info, diagnosis_result)
+    chunks = client.stream_generate_content(contents).__aiter__()
+    pending = None
+
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(chunks.__anext__())
+            done, _ = await asyncio.wait({pending}, timeout=Config.CHAT_HEARTBEAT_SECONDS)
+            if not done:
+                # SSE comment keeps proxies and the client from timing out
+                yield ": heartbeat\n\n"
+                continue
 
+            task, pending = pending, None
+            try:
+                text = task.result()
+            except StopAsyncIteration:
+                outcome = 'completed'
+                if session is not None:
+                    get_session_store().append_exchange(session, message, ''.join(reply))
+                # Send completion signal
+                yield f"data: {json.dumps({'done': True})}\n\n"
+                return
+            except Exception as e:
+                outcome = 'error'
+                yield f"data: {json.dumps({'text': f'Error: {str(e)}'})}\n\n"
+                return
 
+            metrics.on_chunk(text)
+            reply.append(text)
+            yield f"data: {json.dumps({'text': text})}\n\n"
+    finally:
+        # Client disconnects cancel the generator; stop reading from Gemini
+        if pending is not None:
+            pending.cancel()
+            try:
+                await pending
+            except BaseException:
+                pass
+        await chunks.aclose()
+        metrics.finish(outcome)
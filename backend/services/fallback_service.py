@@ -2,20 +2,14 @@
 Recommendations service using Gemini AI
 """
 import json
+import time
 import google.generativeai as genai
+from services.gemini_client import configure_gemini, get_async_client, record_llm_call
+from services.recommendation_cache import get_recommendation_cache, recommendation_cache_key
 from config import Config
 
-def configure_gemini():
-    """Configure Gemini AI"""
-    if Config.GEMINI_API_KEY:
-        genai.configure(api_key=Config.GEMINI_API_KEY)
-        return True
-    return False
-
-def get_fallback_recommendations(lung_cancer_label, tumor_detected,
-                               cancer_stage, patient_info, overlay_image=None):
-    """Generate medical recommendations using Gemini AI"""
-
+def prepare_patient_context(patient_info, cancer_stage):
+    """Normalize patient info and stage result into the values used by the prompt"""
     # Extract patient information
     age = patient_info.get('age', 'Không rõ')
     gender = patient_info.get('gender', 'Không rõ')
@@ -35,25 +29,37 @@ def get_fallback_recommendations(lung_cancer_label, tumor_detected,
                 factor_name = factor.replace('_', ' ').title()
                 all_factors.append(f"{factor_name}: {value}/8")
 
+    return age, gender_text, all_factors, cancer_stage_class
+
+def build_recommendation_result(full_response, lung_cancer_label, tumor_detected):
+    """Build the recommendations response from the model's full text"""
+    # Extract recommendations from response
+    recommendations = extract_recommendations_from_response(full_response)
+
+    return {
+        'full_response': full_response,
+        'recommendations': recommendations,
+        'diagnosis_summary': {
+            'lung_cancer_label': lung_cancer_label,
+            'tumor_detected': tumor_detected
+        }
+    }
+
+def get_fallback_recommendations(lung_cancer_label, tumor_detected,
+                               cancer_stage, patient_info, overlay_image=None):
+    """Generate medical recommendations using Gemini AI"""
+
+    age, gender_text, all_factors, cancer_stage_class = prepare_patient_context(patient_info, cancer_stage)
+
     try:
-        # Try to generate AI recommendations
-        full_response = generate_ai_recommendations(
+        # Try to generate AI recommendations (memoized on the normalized inputs)
+        full_response = get_cached_ai_recommendations(
             age, gender_text, all_factors,
             lung_cancer_label, tumor_detected,
             cancer_stage_class, overlay_image
         )
 
-        # Extract recommendations from response
-        recommendations = extract_recommendations_from_response(full_response)
-
-        return {
-            'full_response': full_response,
-            'recommendations': recommendations,
-            'diagnosis_summary': {
-                'lung_cancer_label': lung_cancer_label,
-                'tumor_detected': tumor_detected
-            }
-        }
+        return build_recommendation_result(full_response, lung_cancer_label, tumor_detected)
     except Exception as e:
         print(f"AI recommendation error: {str(e)}")
         # Fallback to basic template if AI fails
@@ -63,13 +69,38 @@ def get_fallback_recommendations(lung_cancer_label, tumor_detected,
             cancer_stage_class
         )
 
-def generate_ai_recommendations(age, gender_text, all_factors,
-                              lung_cancer_label, tumor_detected,
-                              cancer_stage_class, overlay_image=None):
-    """Generate recommendations using Gemini AI with full patient information and overlay image"""
+def get_cached_ai_recommendations(age, gender_text, all_factors,
+                                  lung_cancer_label, tumor_detected,
+                                  cancer_stage_class, overlay_image=None):
+    """Return AI recommendations, reusing a cached answer for identical inputs"""
+    args = (age, gender_text, all_factors, lung_cancer_label, tumor_detected, cancer_stage_class, overlay_image)
 
-    if not configure_gemini():
-        raise Exception("Gemini API key not configured")
+    cache = get_recommendation_cache()
+    if cache is None:
+        return generate_ai_recommendations(*args)
+
+    # Only successful Gemini answers are cached; failures fall through to the basic template
+    return cache.get_or_compute(recommendation_cache_key(*args), lambda: generate_ai_recommendations(*args))
+
+async def get_cached_ai_recommendations_async(age, gender_text, all_factors,
+                                              lung_cancer_label, tumor_detected,
+                                              cancer_stage_class, overlay_image=None):
+    """Async version of get_cached_ai_recommendations"""
+    args = (age, gender_text, all_factors, lung_cancer_label, tumor_detected, cancer_stage_class, overlay_image)
+
+    cache = get_recommendation_cache()
+    if cache is None:
+        return await generate_ai_recommendations_async(*args)
+
+    return await cache.get_or_compute_async(
+        recommendation_cache_key(*args),
+        lambda: generate_ai_recommendations_async(*args)
+    )
+
+def build_recommendation_content(age, gender_text, all_factors,
+                                 lung_cancer_label, tumor_detected,
+                                 cancer_stage_class, overlay_image=None):
+    """Build the Gemini content parts: system prompt plus the overlay image when present"""
 
     # Format factors for display
     factors_text = "\n".join([f"• {f}" for f in all_factors]) if all_factors else "• Không có yếu tố nguy cơ cao"
@@ -124,42 +155,73 @@ def generate_ai_recommendations(age, gender_text, all_factors,
 
             QUAN TRỌNG: Trả lời TRỰC TIẾP với 3 mục trên, không cần lời chào, giới thiệu hay bất kỳ nội dung nào khác. Hãy chuyên nghiệp, cụ thể và có giá trị thực hành."""
 
+    # Prepare content parts
+    content_parts = [system_prompt]
+
+    # Add overlay image if available
+    if overlay_image and tumor_detected:
+        try:
+            import base64
+            from PIL import Image
+            import io
+
+            # Extract base64 data and its type from the data URL
+            mime_type = 'image/png'
+            if overlay_image.startswith('data:image'):
+                # Format: data:image/<png|webp>;base64,<base64_data> (see MASK_ENCODING)
+                header, base64_data = overlay_image.split(',', 1)
+                mime_type = header[len('data:'):].split(';')[0]
+            else:
+                base64_data = overlay_image
+
+            # Decode base64 to bytes
+            image_bytes = base64.b64decode(base64_data)
+
+            # Add image to content
+            content_parts.append({
+                'mime_type': mime_type,
+                'data': image_bytes
+            })
+
+            # Add instruction to analyze the image
+            content_parts.append("\n\nHãy phân tích chi tiết hình ảnh CT scan được tô vùng này. Mô tả vị trí, kích thước, đặc điểm của vùng bất thường được phát hiện để có thêm tính khách quan trong khuyến nghị.")
+        except Exception as img_error:
+            print(f"Warning: Could not process overlay image: {str(img_error)}")
+
+    return content_parts
+
+def generate_ai_recommendations(age, gender_text, all_factors,
+                              lung_cancer_label, tumor_detected,
+                              cancer_stage_class, overlay_image=None):
+    """Generate recommendations using Gemini AI with full patient information and overlay image"""
+
+    if not configure_gemini():
+        raise Exception("Gemini API key not configured")
+
+    content_parts = build_recommendation_content(
+        age, gender_text, all_factors,
+        lung_cancer_label, tumor_detected,
+        cancer_stage_class, overlay_image
+    )
+
+    start = time.perf_counter()
     try:
         model = genai.GenerativeModel(Config.GEMINI_MODEL)
 
-        # Prepare content parts
-        content_parts = [system_prompt]
-
-        # Add overlay image if available
-        if overlay_image and tumor_detected:
-            try:
-                import base64
-                from PIL import Image
-                import io
-
-                # Extract base64 data from data URL
-                if overlay_image.startswith('data:image'):
-                    # Format: data:image/png;base64,<base64_data>
-                    base64_data = overlay_image.split(',')[1]
-                else:
-                    base64_data = overlay_image
-
-                # Decode base64 to bytes
-                image_bytes = base64.b64decode(base64_data)
-
-                # Add image to content
-                content_parts.append({
-                    'mime_type': 'image/png',
-                    'data': image_bytes
-                })
-
-                # Add instruction to analyze the image
-                content_parts.append("\n\nHãy phân tích chi tiết hình ảnh CT scan được tô vùng này. Mô tả vị trí, kích thước, đặc điểm của vùng bất thường được phát hiện để có thêm tính khách quan trong khuyến nghị.")
-            except Exception as img_error:
-                print(f"Warning: Could not process overlay image: {str(img_error)}")
-
         response = model.generate_content(content_parts)
 
+    except Exception as e:
+        record_llm_call('recommendations', time.perf_counter() - start, 'error')
+        raise Exception(f"Gemini API error: {str(e)}")
+
+    usage = getattr(response, 'usage_metadata', None)
+    record_llm_call(
+        'recommendations', time.perf_counter() - start, 'ok',
+        getattr(usage, 'prompt_token_count', 0) or 0,
+        getattr(usage, 'candidates_token_count', 0) or 0
+    )
+
+    try:
         if response.text:
             return response.text
         else:
@@ -168,6 +230,53 @@ def generate_ai_recommendations(age, gender_text, all_factors,
     except Exception as e:
         raise Exception(f"Gemini API error: {str(e)}")
 
+async def get_fallback_recommendations_async(lung_cancer_label, tumor_detected,
+                                            cancer_stage, patient_info, overlay_image=None):
+    """Async version of get_fallback_recommendations for the ASGI serving mode"""
+
+    age, gender_text, all_factors, cancer_stage_class = prepare_patient_context(patient_info, cancer_stage)
+
+    try:
+        full_response = await get_cached_ai_recommendations_async(
+            age, gender_text, all_factors,
+            lung_cancer_label, tumor_detected,
+            cancer_stage_class, overlay_image
+        )
+
+        return build_recommendation_result(full_response, lung_cancer_label, tumor_detected)
+    except Exception as e:
+        print(f"AI recommendation error: {str(e)}")
+        # Fallback to basic template if AI fails
+        return generate_basic_fallback(
+            age, gender_text, all_factors,
+            lung_cancer_label, tumor_detected,
+            cancer_stage_class
+        )
+
+async def generate_ai_recommendations_async(age, gender_text, all_factors,
+                                            lung_cancer_label, tumor_detected,
+                                            cancer_stage_class, overlay_image=None):
+    """Async version of generate_ai_recommendations using the non-blocking REST client"""
+
+    client = get_async_client()
+    if client is None:
+        raise Exception("Gemini API key not configured")
+
+    content_parts = build_recommendation_content(
+        age, gender_text, all_factors,
+        lung_cancer_label, tumor_detected,
+        cancer_stage_class, overlay_image
+    )
+
+    try:
+        text = await client.generate_content(content_parts, operation='recommendations')
+    except Exception as e:
+        raise Exception(f"Gemini API error: {str(e)}")
+
+    if text:
+        return text
+    raise Exception("Gemini API error: Empty response from Gemini API")
+
 def extract_recommendations_from_response(response_text):
     """Extract key recommendations from AI response"""
     try:
@@ -0,0 +1,147 @@
+"""
+Gemini client setup: SDK configuration and the async REST client for the ASGI serving mode
+"""
+import base64
+import json
+import time
+import httpx
+from utils.metrics import REGISTRY
+from config import Config
+
+LLM_SECONDS = REGISTRY.histogram(
+    'llm_request_duration_seconds', 'Gemini call latency (whole stream for chat) by operation and outcome',
+    labelnames=('operation', 'outcome')
+)
+LLM_TOKENS = REGISTRY.counter(
+    'llm_tokens_total', 'Gemini tokens by operation and direction (prompt or completion)',
+    labelnames=('operation', 'direction')
+)
+
+def configure_gemini():
+    """Configure the Gemini SDK; returns False when no API key is set
+
+    GEMINI_API_BASE_URL points the SDK at a custom endpoint (e.g. the local
+    stub LLM server), which speaks the REST API.
+    """
+    if not Config.GEMINI_API_KEY:
+        return False
+
+    import google.generativeai as genai
+    if Config.GEMINI_API_BASE_URL:
+        genai.configure(
+            api_key=Config.GEMINI_API_KEY,
+            transport='rest',
+            client_options={'api_endpoint': Config.GEMINI_API_BASE_URL}
+        )
+    else:
+        genai.configure(api_key=Config.GEMINI_API_KEY)
+    return True
+
+def record_llm_call(operation, seconds, outcome, prompt_tokens=0, completion_tokens=0):
+    """Record latency and token usage of one Gemini call"""
+    LLM_SECONDS.observe(seconds, operation=operation, outcome=outcome)
+    if prompt_tokens:
+        LLM_TOKENS.inc(prompt_tokens, operation=operation, direction='prompt')
+    if completion_tokens:
+        LLM_TOKENS.inc(completion_tokens, operation=operation, direction='completion')
+
+def to_rest_contents(contents):
+    """Convert SDK-style contents into the REST `contents` payload
+
+    Accepts either a list of {"role", "parts"} messages (chat) or a flat list
+    of parts for a single user turn (strings and {"mime_type", "data"} blobs).
+    """
+    if contents and isinstance(contents[0], dict) and 'role' in contents[0]:
+        return contents
+
+    parts = []
+    for part in contents:
+        if isinstance(part, str):
+            parts.append({'text': part})
+        elif isinstance(part, dict) and 'mime_type' in part:
+            data = part['data']
+            if isinstance(data, (bytes, bytearray)):
+                data = base64.b64encode(data).decode('utf-8')
+            parts.append({'inline_data': {'mime_type': part['mime_type'], 'data': data}})
+        else:
+            parts.append(part)
+    return [{'role': 'user', 'parts': parts}]
+
+def _response_text(payload):
+    """Join the text parts of the first candidate"""
+    candidates = payload.get('candidates') or []
+    if not candidates:
+        return ''
+    parts = (candidates[0].get('content') or {}).get('parts') or []
+    return ''.join(part.get('text', '') for part in parts)
+
+class GeminiAsyncClient:
+    """Minimal non-blocking client for generateContent / streamGenerateContent"""
+
+    def __init__(self, api_key, model, base_url, timeout=120.0):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url.rstrip('/')
+        self._client = httpx.AsyncClient(timeout=timeout, headers={'x-goog-api-key': api_key})
+
+    def _url(self, method):
+        return f"{self.base_url}/v1beta/models/{self.model}:{method}"
+
+    async def generate_content(self, contents, operation='generate'):
+        """Generate a full response and return its text"""
+        start = time.perf_counter()
+        try:
+            response = await self._client.post(
+                self._url('generateContent'),
+                json={'contents': to_rest_contents(contents)}
+            )
+            response.raise_for_status()
+            payload = response.json()
+        except Exception:
+            record_llm_call(operation, time.perf_counter() - start, 'error')
+            raise
+
+        usage = payload.get('usageMetadata') or {}
+        record_llm_call(
+            operation, time.perf_counter() - start, 'ok',
+            usage.get('promptTokenCount', 0), usage.get('candidatesTokenCount', 0)
+        )
+        return _response_text(payload)
+
+    async def stream_generate_content(self, contents):
+        """Yield response text chunks as the model produces them"""
+        async with self._client.stream(
+            'POST',
+            self._url('streamGenerateContent'),
+            params={'alt': 'sse'},
+            json={'contents': to_rest_contents(contents)}
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith('data:'):
+                    continue
+                text = _response_text(json.loads(line[5:].strip()))
+                if text:
+                    yield text
+
+    async def aclose(self):
+        await self._client.aclose()
+
+_ASYNC_CLIENT = None
+
+def get_async_client():
+    """Get the shared async Gemini client (None when no API key is configured)"""
+    global _ASYNC_CLIENT
+
+    if not Config.GEMINI_API_KEY:
+        return None
+
+    # The ASGI server runs one event loop per process, so one client is enough
+    if _ASYNC_CLIENT is None:
+        _ASYNC_CLIENT = GeminiAsyncClient(
+            Config.GEMINI_API_KEY,
+            Config.GEMINI_MODEL,
+            Config.GEMINI_API_BASE_URL or 'https://generativelanguage.googleapis.com',
+            timeout=Config.GEMINI_TIMEOUT
+        )
+    return _ASYNC_CLIENT
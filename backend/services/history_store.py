@@ -0,0 +1,394 @@
+"""
+Prediction history: append-only audit log of prediction results
+
+Routes hand each result to `record_prediction`, which only copies it onto an
+in-memory queue; a background writer thread appends queued entries to SQLite
+in batches (one transaction per batch), so requests never wait on disk. When
+the queue is full, entries are dropped and counted rather than blocking.
+Rows are never updated or deleted (triggers enforce it). History is only read
+back for the user who owns it, newest first, with keyset pagination on
+(created_at, seq).
+"""
+import atexit
+import base64
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from config import Config
+from utils.cache import model_identity
+from utils.metrics import REGISTRY
+
+# Large image fields left out of stored results unless HISTORY_STORE_IMAGES is set
+IMAGE_FIELDS = ('mask_image', 'overlay_image')
+FILTERS = ('endpoint', 'model', 'model_version', 'content_hash')
+
+HISTORY_WRITES = REGISTRY.counter(
+    'history_writes_total', 'Prediction history entries by outcome', labelnames=('outcome',)
+)
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+def encode_cursor(created_at, seq):
+    """Opaque cursor for the row a page ended on"""
+    return base64.urlsafe_b64encode(json.dumps([created_at, seq]).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    try:
+        created_at, seq = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return float(created_at), int(seq)
+    except Exception:
+        raise InvalidCursorError("Invalid cursor")
+
+def _json_default(value):
+    # Raw (msgpack/multipart) results carry bytes; store them as base64 like the JSON responses
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(value)).decode('ascii')
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def history_view(value, store_images=False):
+    """Copy of a result or request body as it will be stored
+
+    Copies dicts and lists so later changes to the response do not leak into
+    the queued entry, and drops image fields unless `store_images`.
+    """
+    if isinstance(value, dict):
+        return {
+            key: history_view(item, store_images)
+            for key, item in value.items()
+            if store_images or key not in IMAGE_FIELDS
+        }
+    if isinstance(value, (list, tuple)):
+        return [history_view(item, store_images) for item in value]
+    return value
+
+class HistoryStore:
+    """SQLite-backed append-only history table"""
+
+    COLUMNS = (
+        'seq', 'id', 'created_at', 'endpoint', 'model', 'model_version',
+        'user_id', 'content_hash', 'inputs', 'result'
+    )
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS prediction_history ('
+            ' seq INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' id TEXT NOT NULL UNIQUE,'
+            ' created_at REAL NOT NULL,'
+            ' endpoint TEXT NOT NULL,'
+            ' model TEXT NOT NULL,'
+            ' model_version TEXT,'
+            ' user_id TEXT,'
+            ' content_hash TEXT,'
+            ' inputs TEXT,'
+            ' result TEXT NOT NULL)'
+        )
+        # Every listing is newest first, so each index ends with the keyset columns.
+        # Reads are always scoped to one user; the time and model indexes serve audits.
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_history_user ON prediction_history(user_id, created_at, seq)'
+        )
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_history_user_content'
+            ' ON prediction_history(user_id, content_hash, created_at, seq)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_history_created ON prediction_history(created_at, seq)')
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_history_model'
+            ' ON prediction_history(model, model_version, created_at, seq)'
+        )
+        # Unscoped lookups are no longer served; databases created before keep their columns
+        self._conn.execute('DROP INDEX IF EXISTS idx_history_patient')
+        self._conn.execute('DROP INDEX IF EXISTS idx_history_content')
+        for operation in ('UPDATE', 'DELETE'):
+            self._conn.execute(
+                f'CREATE TRIGGER IF NOT EXISTS prediction_history_no_{operation.lower()}'
+                f' BEFORE {operation} ON prediction_history'
+                " BEGIN SELECT RAISE(ABORT, 'prediction_history is append-only'); END"
+            )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        # Readers get their own connections so WAL lets them run during a batch write
+        self._local = threading.local()
+
+    def _reader(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def _row_to_entry(self, row, include_result=True):
+        entry = dict(zip(self.COLUMNS, row))
+        entry.pop('seq')
+        entry['inputs'] = json.loads(entry['inputs']) if entry['inputs'] is not None else None
+        if include_result:
+            entry['result'] = json.loads(entry['result'])
+        else:
+            entry.pop('result')
+        return entry
+
+    def append_many(self, entries):
+        """Insert a batch of entries in one transaction"""
+        rows = [
+            (
+                entry['id'], entry['created_at'], entry['endpoint'], entry['model'], entry['model_version'],
+                entry['user_id'], entry['content_hash'],
+                json.dumps(entry['inputs'], default=_json_default) if entry['inputs'] is not None else None,
+                json.dumps(entry['result'], default=_json_default)
+            )
+            for entry in entries
+        ]
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    'INSERT INTO prediction_history (id, created_at, endpoint, model, model_version,'
+                    ' user_id, content_hash, inputs, result) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    rows
+                )
+
+    def get(self, entry_id, user_id):
+        """One entry, only when it belongs to `user_id`"""
+        row = self._reader().execute(
+            f"SELECT {', '.join(self.COLUMNS)} FROM prediction_history WHERE id = ? AND user_id = ?",
+            (entry_id, user_id)
+        ).fetchone()
+        return self._row_to_entry(row) if row is not None else None
+
+    def query(self, user_id, filters=None, since=None, until=None, limit=50, cursor=None, include_result=True):
+        """Newest-first page of a user's entries; returns (entries, next cursor or None)"""
+        if not user_id:
+            raise ValueError("History queries must be scoped to a user")
+        clauses = ['user_id = ?']
+        params = [user_id]
+        for column, value in (filters or {}).items():
+            if column not in FILTERS:
+                raise ValueError(f"Unknown history filter '{column}'")
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append('created_at >= ?')
+            params.append(float(since))
+        if until is not None:
+            clauses.append('created_at < ?')
+            params.append(float(until))
+        if cursor:
+            # Keyset: continue strictly after the last row of the previous page
+            clauses.append('(created_at, seq) < (?, ?)')
+            params.extend(decode_cursor(cursor))
+
+        query = f"SELECT {', '.join(self.COLUMNS)} FROM prediction_history WHERE {' AND '.join(clauses)}"
+        query += ' ORDER BY created_at DESC, seq DESC LIMIT ?'
+        params.append(int(limit) + 1)
+
+        rows = self._reader().execute(query, params).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][2], rows[-1][0])
+        return [self._row_to_entry(row, include_result) for row in rows], next_cursor
+
+    def count(self):
+        row = self._reader().execute('SELECT COUNT(*) FROM prediction_history').fetchone()
+        return row[0]
+
+_STOP = object()
+
+class HistoryWriter:
+    """Background thread that appends queued history entries in batches
+
+    The thread waits for the first entry, then keeps collecting until
+    `batch_size` entries are queued or `flush_interval` seconds have passed,
+    and writes the group in one transaction.
+    """
+
+    def __init__(self, store, batch_size=100, flush_interval=0.5, max_queue=10000):
+        self.store = store
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.0, float(flush_interval))
+        self._queue = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._thread = None
+        self._lock = threading.Lock()
+
+        # Counters for monitoring
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, entry):
+        """Queue an entry without blocking; returns False when the queue is full"""
+        try:
+            self._queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            HISTORY_WRITES.inc(outcome='dropped')
+            return False
+
+    def stop(self, timeout=None):
+        """Write what is queued and stop the thread"""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        return {
+            'queued': self.queue_depth(),
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'batches': self.batches
+        }
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            stopping = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write(batch)
+            if stopping:
+                return
+
+    def _write(self, batch):
+        try:
+            self.store.append_many(batch)
+        except Exception as e:
+            print(f"Prediction history write failed ({len(batch)} entries): {str(e)}")
+            self.failed += len(batch)
+            HISTORY_WRITES.inc(len(batch), outcome='failed')
+            return
+        self.written += len(batch)
+        self.batches += 1
+        HISTORY_WRITES.inc(len(batch), outcome='written')
+
+def model_version(model):
+    """Version string of the artifact behind a model name (or the Gemini model)"""
+    if model == 'unet':
+        from models.unet_backends import unet_artifact_path
+        return model_identity(f'unet-{Config.UNET_BACKEND}', unet_artifact_path())
+    if model == 'yolo':
+        from models.yolo_runtimes import yolo_artifact_path
+        return model_identity(f'yolo-cls-{Config.YOLO_RUNTIME}', yolo_artifact_path())
+    if model == 'xgboost':
+        return model_identity('xgboost', Config.XGBOOST_MODEL_PATH)
+    if model == 'gemini':
+        return Config.GEMINI_MODEL
+    return None
+
+_HISTORY_STORE = None
+_HISTORY_WRITER = None
+_HISTORY_LOCK = threading.Lock()
+
+def get_history_store():
+    """Get the shared history store (None when history is disabled)"""
+    global _HISTORY_STORE
+
+    if not Config.HISTORY_ENABLED:
+        return None
+
+    if _HISTORY_STORE is None:
+        with _HISTORY_LOCK:
+            if _HISTORY_STORE is None:
+                _HISTORY_STORE = HistoryStore(Config.HISTORY_DB_PATH)
+    return _HISTORY_STORE
+
+def get_history_writer():
+    """Get this process's history writer, starting its thread on first use"""
+    global _HISTORY_WRITER
+
+    store = get_history_store()
+    if store is None:
+        return None
+
+    if _HISTORY_WRITER is None:
+        with _HISTORY_LOCK:
+            if _HISTORY_WRITER is None:
+                writer = HistoryWriter(
+                    store,
+                    batch_size=Config.HISTORY_BATCH_SIZE,
+                    flush_interval=Config.HISTORY_FLUSH_INTERVAL_SECONDS,
+                    max_queue=Config.HISTORY_QUEUE_MAX
+                )
+                writer.start()
+                # Write what is still queued when the process exits cleanly
+                atexit.register(writer.stop, 5.0)
+                _HISTORY_WRITER = writer
+    return _HISTORY_WRITER
+
+def get_history_stats():
+    """Writer counters for /health (None until this process records an entry)"""
+    return _HISTORY_WRITER.stats() if _HISTORY_WRITER is not None else None
+
+def _collect_history_queue_depth():
+    """Entries waiting for the writer (skipped until this process records one)"""
+    if _HISTORY_WRITER is None:
+        return []
+    return [((), _HISTORY_WRITER.queue_depth())]
+
+REGISTRY.callback(
+    'history_queue_depth', 'Prediction history entries waiting to be written', _collect_history_queue_depth
+)
+
+def record_prediction(endpoint, model, result, inputs=None, content_hash=None, user_id=None):
+    """Queue a prediction result for the history store; returns its id (None when disabled)
+
+    Never raises: a history failure must not fail the prediction.
+    """
+    try:
+        writer = get_history_writer()
+        if writer is None:
+            return None
+        entry_id = uuid.uuid4().hex
+        accepted = writer.submit({
+            'id': entry_id,
+            'created_at': time.time(),
+            'endpoint': endpoint,
+            'model': model,
+            'model_version': '+'.join(filter(None, (model_version(name) for name in model.split('+')))) or None,
+            'user_id': user_id or None,
+            'content_hash': content_hash,
+            'inputs': history_view(inputs, Config.HISTORY_STORE_IMAGES) if inputs is not None else None,
+            'result': history_view(result, Config.HISTORY_STORE_IMAGES)
+        })
+        return entry_id if accepted else None
+    except Exception as e:
+        print(f"Error recording prediction history: {str(e)}")
+        return None
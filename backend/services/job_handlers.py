@@ -0,0 +1,98 @@
+"""
+Job handlers for the built-in job kinds
+
+Each handler reuses the synchronous model functions and runs model work on
+the same inference pools as the HTTP routes, so background jobs share the
+pools' concurrency limits instead of bypassing them.
+"""
+import os
+from models.xgboost_model import predict_lung_cancer_risk_batch, predict_lung_cancer_risk_matrix
+from models.unet_model import predict_probability_maps
+from models.volume_analysis import analyze_volume
+from models.model_loader import ModelDisabledError
+from models.inference_executor import run_inference
+from services.fallback_service import get_fallback_recommendations
+from services.job_queue import register_job_handler, JobCancelledError
+from utils.record_utils import iter_records
+from utils.volume_utils import open_volume
+from config import Config
+
+# Bad input will not succeed on a retry; model and pool errors might
+NON_RETRYABLE = (ValueError, KeyError, TypeError, ModelDisabledError)
+
+def run_lung_cancer_batch(context):
+    """Score a cohort from inline `records` or a spooled upload (`format` in the payload)"""
+    payload = context.payload
+    chunk_size = payload.get('chunk_size') or Config.XGB_BATCH_CHUNK_SIZE
+
+    def predict_chunk(features):
+        return run_inference('xgboost', predict_lung_cancer_risk_matrix, features)
+
+    predictions = []
+    input_path = context.input_path
+    if input_path is not None:
+        total_bytes = os.path.getsize(input_path) or 1
+        with open(input_path, 'rb') as stream:
+            records = iter_records(stream, payload['format'])
+            for index, label in predict_lung_cancer_risk_batch(records, chunk_size, predict_chunk):
+                predictions.append(label)
+                if (index + 1) % chunk_size == 0:
+                    context.progress(stream.tell() / total_bytes, f"{index + 1} records scored")
+    else:
+        records = payload.get('records') or []
+        total = len(records) or 1
+        for index, label in predict_lung_cancer_risk_batch(records, chunk_size, predict_chunk):
+            predictions.append(label)
+            if (index + 1) % chunk_size == 0:
+                context.progress((index + 1) / total, f"{index + 1} of {total} records scored")
+
+    return {'count': len(predictions), 'predictions': predictions}
+
+def run_tumor_volume(context):
+    """Segment a spooled CT volume, reporting progress per slice batch"""
+    payload = context.payload
+    spacing = tuple(payload.get('spacing') or (1.0, 1.0, 1.0))
+    input_path = context.input_path
+    if input_path is None:
+        raise ValueError("tumor_volume jobs need an uploaded volume")
+
+    with open(input_path, 'rb') as stream:
+        volume = open_volume(stream, payload['format'], spacing, payload.get('intensity', 'hu'))
+        done = [0]
+
+        def predict_batch(batch):
+            probability_maps = run_inference('unet', predict_probability_maps, batch)
+            done[0] += len(batch)
+            context.progress(done[0] / max(volume.num_slices, 1), f"{done[0]} of {volume.num_slices} slices")
+            return probability_maps
+
+        try:
+            return analyze_volume(
+                volume,
+                payload.get('threshold', 0.5),
+                payload.get('batch_size'),
+                predict_batch,
+                window_center=payload.get('window_center'),
+                window_width=payload.get('window_width')
+            )
+        except Exception as e:
+            # analyze_volume wraps unexpected errors; surface a cancellation as-is
+            if isinstance(e.__cause__, JobCancelledError):
+                raise e.__cause__
+            raise
+
+def run_recommendations(context):
+    """Generate recommendations (same body as POST /api/recommendations)"""
+    data = context.payload
+    context.progress(0.0, "Generating recommendations")
+    return get_fallback_recommendations(
+        lung_cancer_label=data.get('lung_cancer_label', 'Low'),
+        tumor_detected=data.get('tumor_detected', False),
+        cancer_stage=data.get('cancer_stage', {}),
+        patient_info=data.get('patient_info', {}),
+        overlay_image=data.get('overlay_image', None)
+    )
+
+register_job_handler('lung_cancer_batch', run_lung_cancer_batch, NON_RETRYABLE)
+register_job_handler('tumor_volume', run_tumor_volume, NON_RETRYABLE)
+register_job_handler('recommendations', run_recommendations, NON_RETRYABLE)
@@ -0,0 +1,454 @@
+"""
+Persistent job queue for long-running work
+
+Jobs are rows in a SQLite table, so they survive restarts and are shared by
+every worker process on the host. A local pool of worker threads claims the
+highest-priority queued job, runs the handler registered for its kind and
+stores the JSON result until its TTL expires. Failed jobs are retried with
+exponential backoff; running jobs can be cancelled cooperatively through
+`JobContext.progress`.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from config import Config
+from utils.metrics import REGISTRY
+
+JOB_STATES = ('queued', 'running', 'succeeded', 'failed', 'cancelled')
+TERMINAL_STATES = ('succeeded', 'failed', 'cancelled')
+
+JOBS_FINISHED = REGISTRY.counter('jobs_finished_total', 'Finished jobs by kind and status', labelnames=('kind', 'status'))
+JOB_SECONDS = REGISTRY.histogram(
+    'job_duration_seconds', 'Job run time by kind', labelnames=('kind',),
+    buckets=(0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 3600.0)
+)
+
+class JobCancelledError(Exception):
+    """Raised inside a handler when its job has been cancelled"""
+
+class UnknownJobKindError(Exception):
+    """Raised when a job is submitted for a kind with no registered handler"""
+
+_HANDLERS = {}
+
+def spooled_input_path(path):
+    """Resolve a job input path, refusing anything outside JOB_SPOOL_DIR"""
+    spool_dir = os.path.realpath(Config.JOB_SPOOL_DIR)
+    resolved = os.path.realpath(path)
+    if os.path.commonpath([spool_dir, resolved]) != spool_dir or resolved == spool_dir:
+        raise ValueError("Job input is not in the spool directory")
+    return resolved
+
+def register_job_handler(kind, handler, non_retryable=()):
+    """Register handler(context) for a job kind
+
+    Failures are retried until the job's max_attempts, except exceptions
+    matching `non_retryable`, which fail the job immediately.
+    """
+    _HANDLERS[kind] = (handler, tuple(non_retryable))
+
+def get_job_kinds():
+    return sorted(_HANDLERS)
+
+class JobStore:
+    """SQLite-backed job table"""
+
+    COLUMNS = (
+        'id', 'kind', 'status', 'priority', 'payload', 'result', 'error',
+        'progress', 'message', 'attempts', 'max_attempts', 'cancel_requested',
+        'created_at', 'started_at', 'finished_at', 'run_after', 'lease_expires', 'expires_at',
+        'input_path', 'user_id'
+    )
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit mode; claims use explicit BEGIN IMMEDIATE transactions
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            ' id TEXT PRIMARY KEY,'
+            ' kind TEXT NOT NULL,'
+            ' status TEXT NOT NULL,'
+            ' priority INTEGER NOT NULL DEFAULT 0,'
+            ' payload TEXT NOT NULL,'
+            ' result TEXT,'
+            ' error TEXT,'
+            ' progress REAL NOT NULL DEFAULT 0,'
+            ' message TEXT,'
+            ' attempts INTEGER NOT NULL DEFAULT 0,'
+            ' max_attempts INTEGER NOT NULL DEFAULT 1,'
+            ' cancel_requested INTEGER NOT NULL DEFAULT 0,'
+            ' created_at REAL NOT NULL,'
+            ' started_at REAL,'
+            ' finished_at REAL,'
+            ' run_after REAL NOT NULL,'
+            ' lease_expires REAL,'
+            ' expires_at REAL,'
+            ' input_path TEXT,'
+            ' user_id TEXT)'
+        )
+        # Queues created before input_path was split out of the payload or jobs had owners
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(jobs)')}
+        if 'input_path' not in columns:
+            self._conn.execute('ALTER TABLE jobs ADD COLUMN input_path TEXT')
+        if 'user_id' not in columns:
+            self._conn.execute('ALTER TABLE jobs ADD COLUMN user_id TEXT')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs(status, priority DESC, created_at)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_expires ON jobs(expires_at)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs(user_id, created_at)')
+        self.path = path
+        self._lock = threading.Lock()
+        # Per-thread read connections: WAL readers never wait for the writer lock
+        self._local = threading.local()
+
+    def _reader(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def _row_to_job(self, row):
+        if row is None:
+            return None
+        job = dict(zip(self.COLUMNS, row))
+        job['payload'] = json.loads(job['payload'])
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        job['cancel_requested'] = bool(job['cancel_requested'])
+        return job
+
+    def create(self, kind, payload, priority=0, max_attempts=1, input_path=None, user_id=None):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO jobs (id, kind, status, priority, payload, max_attempts, created_at, run_after,'
+                ' input_path, user_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (job_id, kind, 'queued', int(priority), json.dumps(payload), max(1, int(max_attempts)), now, now,
+                 input_path, user_id)
+            )
+        return job_id
+
+    def get(self, job_id, user_id=None):
+        """One job; with `user_id`, only when it belongs to that user"""
+        query = f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE id = ?"
+        params = [job_id]
+        if user_id is not None:
+            query += ' AND user_id = ?'
+            params.append(user_id)
+        with self._lock:
+            row = self._conn.execute(query, params).fetchone()
+        return self._row_to_job(row)
+
+    def list(self, user_id, status=None, limit=50):
+        """A user's most recent jobs, optionally filtered by status"""
+        query = f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE user_id = ?"
+        params = [user_id]
+        if status:
+            query += ' AND status = ?'
+            params.append(status)
+        query += ' ORDER BY created_at DESC LIMIT ?'
+        params.append(int(limit))
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def claim(self, lease_seconds, ttl_seconds=None):
+        """Atomically move the best runnable job to 'running' and return it
+
+        Jobs whose worker died (lease expired) are requeued, or failed once
+        they have used all their attempts.
+        """
+        now = time.time()
+        expires_at = now + ttl_seconds if ttl_seconds else None
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                abandoned = self._conn.execute(
+                    "SELECT kind FROM jobs WHERE status = 'running' AND lease_expires < ?"
+                    " AND attempts >= max_attempts", (now,)
+                ).fetchall()
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, finished_at = ?, expires_at = ?,"
+                    " lease_expires = NULL WHERE status = 'running' AND lease_expires < ?"
+                    " AND attempts >= max_attempts",
+                    ('Worker stopped before the job finished', now, expires_at, now)
+                )
+                # Requeue jobs whose worker died without finishing them
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'queued', lease_expires = NULL"
+                    " WHERE status = 'running' AND lease_expires < ?", (now,)
+                )
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE status = 'queued' AND run_after <= ?"
+                    " ORDER BY priority DESC, created_at LIMIT 1", (now,)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ?,"
+                        " lease_expires = ?, error = NULL WHERE id = ?",
+                        (now, now + lease_seconds, row[0])
+                    )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        for (kind,) in abandoned:
+            JOBS_FINISHED.inc(kind=kind, status='failed')
+        return self.get(row[0]) if row is not None else None
+
+    def update_progress(self, job_id, progress, message, lease_seconds):
+        """Record progress, extend the lease and report whether cancellation was requested"""
+        with self._lock:
+            self._conn.execute(
+                'UPDATE jobs SET progress = ?, message = ?, lease_expires = ? WHERE id = ?',
+                (float(progress), message, time.time() + lease_seconds, job_id)
+            )
+            row = self._conn.execute('SELECT cancel_requested FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def finish(self, job_id, status, result=None, error=None, ttl_seconds=None):
+        now = time.time()
+        expires_at = now + ttl_seconds if ttl_seconds else None
+        with self._lock:
+            self._conn.execute(
+                'UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_expires = NULL,'
+                ' expires_at = ?, progress = CASE WHEN ? = \'succeeded\' THEN 1 ELSE progress END WHERE id = ?',
+                (status, json.dumps(result) if result is not None else None, error, now, expires_at, status, job_id)
+            )
+
+    def retry(self, job_id, error, delay):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'queued', error = ?, run_after = ?, lease_expires = NULL WHERE id = ?",
+                (error, time.time() + delay, job_id)
+            )
+
+    def cancel(self, job_id, user_id, ttl_seconds=None):
+        """Cancel a user's queued job immediately or flag a running one; returns the new status"""
+        now = time.time()
+        expires_at = now + ttl_seconds if ttl_seconds else None
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ?, expires_at = ?"
+                " WHERE id = ? AND user_id = ? AND status = 'queued'", (now, expires_at, job_id, user_id)
+            )
+            self._conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND user_id = ? AND status = 'running'",
+                (job_id, user_id)
+            )
+            row = self._conn.execute(
+                'SELECT status FROM jobs WHERE id = ? AND user_id = ?', (job_id, user_id)
+            ).fetchone()
+        return row[0] if row else None
+
+    def purge_expired(self):
+        """Delete finished jobs past their TTL and return their spooled input paths"""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT input_path FROM jobs WHERE expires_at IS NOT NULL AND expires_at < ?'
+                ' AND input_path IS NOT NULL', (now,)
+            ).fetchall()
+            self._conn.execute('DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at < ?', (now,))
+        return [row[0] for row in rows]
+
+    def counts(self):
+        # Off the writer lock, so /health and metrics never wait behind a claim
+        rows = self._reader().execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        counts = {state: 0 for state in JOB_STATES}
+        counts.update(dict(rows))
+        return counts
+
+class JobContext:
+    """Handed to job handlers: payload access and progress/cancellation"""
+
+    def __init__(self, job, store):
+        self.job_id = job['id']
+        self.kind = job['kind']
+        self.payload = job['payload']
+        self.attempt = job['attempts']
+        self._input_path = job['input_path']
+        self._store = store
+
+    @property
+    def input_path(self):
+        """Spooled upload for this job (None for inline payloads), checked to be in JOB_SPOOL_DIR"""
+        if self._input_path is None:
+            return None
+        return spooled_input_path(self._input_path)
+
+    def progress(self, fraction, message=None):
+        """Report progress in [0, 1]; raises JobCancelledError if the job was cancelled"""
+        cancelled = self._store.update_progress(
+            self.job_id, min(max(fraction, 0.0), 1.0), message, Config.JOB_LEASE_SECONDS
+        )
+        if cancelled:
+            raise JobCancelledError(f"Job {self.job_id} was cancelled")
+
+class JobWorkerPool:
+    """Local worker threads that run jobs from the store"""
+
+    def __init__(self, store, workers=2, poll_interval=1.0):
+        self.store = store
+        self.workers = max(1, int(workers))
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._last_purge = 0.0
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def notify(self):
+        """Wake idle workers after a job was submitted in this process"""
+        self._wakeup.set()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._maybe_purge()
+            try:
+                job = self.store.claim(Config.JOB_LEASE_SECONDS, Config.JOB_RESULT_TTL_SECONDS)
+            except sqlite3.OperationalError as e:
+                # Another process holds the write lock; try again shortly
+                print(f"Job claim failed: {str(e)}")
+                job = None
+
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self._execute(job)
+
+    def _execute(self, job):
+        kind = job['kind']
+        entry = _HANDLERS.get(kind)
+        if entry is None:
+            self.store.finish(job['id'], 'failed', error=f"No handler for job kind '{kind}'",
+                              ttl_seconds=Config.JOB_RESULT_TTL_SECONDS)
+            JOBS_FINISHED.inc(kind=kind, status='failed')
+            return
+
+        handler, non_retryable = entry
+        context = JobContext(job, self.store)
+        start = time.perf_counter()
+        try:
+            result = handler(context)
+        except JobCancelledError:
+            self.store.finish(job['id'], 'cancelled', ttl_seconds=Config.JOB_RESULT_TTL_SECONDS)
+            JOBS_FINISHED.inc(kind=kind, status='cancelled')
+            return
+        except Exception as e:
+            error = str(e)
+            if not isinstance(e, non_retryable) and job['attempts'] < job['max_attempts']:
+                delay = Config.JOB_RETRY_BACKOFF_SECONDS * (2 ** (job['attempts'] - 1))
+                print(f"Job {job['id']} ({kind}) failed on attempt {job['attempts']}, retrying in {delay:.1f}s: {error}")
+                self.store.retry(job['id'], error, delay)
+            else:
+                print(f"Job {job['id']} ({kind}) failed: {error}")
+                self.store.finish(job['id'], 'failed', error=error, ttl_seconds=Config.JOB_RESULT_TTL_SECONDS)
+                JOBS_FINISHED.inc(kind=kind, status='failed')
+            return
+        finally:
+            JOB_SECONDS.observe(time.perf_counter() - start, kind=kind)
+
+        self.store.finish(job['id'], 'succeeded', result=result, ttl_seconds=Config.JOB_RESULT_TTL_SECONDS)
+        JOBS_FINISHED.inc(kind=kind, status='succeeded')
+
+    def _maybe_purge(self):
+        now = time.time()
+        if now - self._last_purge < Config.JOB_PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = now
+        try:
+            for input_path in self.store.purge_expired():
+                # Remove spooled input files that belonged to expired jobs
+                try:
+                    path = spooled_input_path(input_path)
+                except ValueError:
+                    print(f"Not removing job input outside the spool directory: {input_path}")
+                    continue
+                if os.path.exists(path):
+                    os.remove(path)
+        except Exception as e:
+            print(f"Job purge failed: {str(e)}")
+
+_JOB_STORE = None
+_JOB_POOL = None
+_JOB_LOCK = threading.Lock()
+
+def get_job_store():
+    """Get the shared job store"""
+    global _JOB_STORE
+
+    if _JOB_STORE is None:
+        with _JOB_LOCK:
+            if _JOB_STORE is None:
+                _JOB_STORE = JobStore(Config.JOB_DB_PATH)
+    return _JOB_STORE
+
+def start_job_workers():
+    """Start this process's job worker threads (no-op when JOB_WORKERS is 0)"""
+    global _JOB_POOL
+
+    if Config.JOB_WORKERS <= 0:
+        return None
+
+    # Registers the handlers for the built-in job kinds
+    import services.job_handlers  # noqa: F401
+
+    with _JOB_LOCK:
+        if _JOB_POOL is None:
+            _JOB_POOL = JobWorkerPool(
+                get_job_store(),
+                workers=Config.JOB_WORKERS,
+                poll_interval=Config.JOB_POLL_INTERVAL_SECONDS
+            )
+            _JOB_POOL.start()
+    return _JOB_POOL
+
+def _collect_job_counts():
+    """Jobs per status in the shared queue (skipped until this process opens the store)"""
+    if _JOB_STORE is None:
+        return []
+    return [((status,), count) for status, count in _JOB_STORE.counts().items()]
+
+REGISTRY.callback('jobs', 'Jobs in the queue by status', _collect_job_counts, labelnames=('status',))
+
+def submit_job(kind, payload, priority=0, max_attempts=None, input_path=None, user_id=None):
+    """Queue a job and return its id
+
+    `input_path` is a file the server spooled for the job; it is kept out of
+    the payload so clients can never point a job at an arbitrary file.
+    `user_id` owns the job: only that user can read or cancel it.
+    """
+    if kind not in _HANDLERS:
+        raise UnknownJobKindError(f"Unknown job kind '{kind}', expected one of: {', '.join(get_job_kinds())}")
+    if input_path is not None:
+        input_path = spooled_input_path(input_path)
+
+    max_attempts = Config.JOB_MAX_ATTEMPTS if max_attempts is None else max_attempts
+    job_id = get_job_store().create(kind, payload, priority, max_attempts, input_path, user_id)
+    if _JOB_POOL is not None:
+        _JOB_POOL.notify()
+    return job_id
+
+def cancel_job(job_id, user_id):
+    """Cancel a user's job; returns its status afterwards, or None when unknown or not theirs"""
+    return get_job_store().cancel(job_id, user_id, Config.JOB_RESULT_TTL_SECONDS)
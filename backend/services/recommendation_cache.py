@@ -0,0 +1,261 @@
+"""
+Recommendation memoization
+
+The recommendations prompt depends only on a handful of discrete inputs
+(age, gender, health factors, risk label, tumor flag, stage class) and the
+overlay image, so identical screening inputs can reuse one Gemini answer.
+Entries live in a TTL-bounded in-memory LRU with an optional SQLite tier,
+and concurrent identical requests share a single in-flight LLM call.
+"""
+import asyncio
+import base64
+import json
+import os
+import sqlite3
+import threading
+import time
+from config import Config
+from utils.cache import LRUCache, hash_bytes
+from utils.metrics import REGISTRY
+
+# Bump when the recommendation prompt changes so old answers are not reused
+PROMPT_VERSION = 1
+
+CACHE_REQUESTS = REGISTRY.counter(
+    'recommendation_cache_requests_total',
+    'Recommendation cache lookups by result',
+    labelnames=('result',)
+)
+
+def _overlay_bytes(overlay_image):
+    """Decoded overlay image bytes (falls back to the raw string when not base64)"""
+    data = overlay_image.split(',', 1)[1] if overlay_image.startswith('data:image') else overlay_image
+    try:
+        return base64.b64decode(data)
+    except Exception:
+        return overlay_image.encode('utf-8')
+
+def recommendation_cache_key(age, gender_text, all_factors, lung_cancer_label,
+                             tumor_detected, cancer_stage_class, overlay_image=None):
+    """Canonical hash of the normalized prompt inputs and overlay bytes"""
+    # The overlay only reaches the prompt when a tumor was detected
+    use_overlay = bool(overlay_image) and bool(tumor_detected)
+    canonical = json.dumps({
+        'version': PROMPT_VERSION,
+        'model': Config.GEMINI_MODEL,
+        'age': str(age),
+        'gender': gender_text,
+        'factors': sorted(all_factors),
+        'label': str(lung_cancer_label),
+        'tumor': bool(tumor_detected),
+        'stage': str(cancer_stage_class),
+        'overlay': use_overlay
+    }, sort_keys=True, ensure_ascii=False).encode('utf-8')
+
+    if use_overlay:
+        return hash_bytes(canonical, _overlay_bytes(overlay_image))
+    return hash_bytes(canonical)
+
+class _Call:
+    """One in-flight computation shared by concurrent callers"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one execution"""
+
+    def __init__(self):
+        self._calls = {}
+        self._async_calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Run fn once per key; returns (result, shared)"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    async def do_async(self, key, coro_fn):
+        """Await coro_fn() once per key on the running event loop; returns (result, shared)
+
+        The call runs as its own task, so a cancelled caller (the leader
+        included) stops waiting without cancelling it for the others.
+        """
+        task = self._async_calls.get(key)
+        if task is not None:
+            return await asyncio.shield(task), True
+
+        task = asyncio.ensure_future(coro_fn())
+        self._async_calls[key] = task
+        task.add_done_callback(lambda done: self._finish_async(key, done))
+        return await asyncio.shield(task), False
+
+    def _finish_async(self, key, task):
+        if self._async_calls.get(key) is task:
+            del self._async_calls[key]
+        if not task.cancelled():
+            # Mark the exception retrieved when every caller was cancelled
+            task.exception()
+
+class SQLiteRecommendationBackend:
+    """Persistent recommendation tier in a single SQLite table"""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS recommendation_cache ('
+            ' key TEXT PRIMARY KEY,'
+            ' response TEXT NOT NULL,'
+            ' expires_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_recommendation_cache_expires ON recommendation_cache(expires_at)')
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def load(self, key):
+        """Return (response, expires_at) for a live entry, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT response, expires_at FROM recommendation_cache WHERE key = ? AND expires_at > ?',
+                (key, time.time())
+            ).fetchone()
+        return row
+
+    def save(self, key, response, expires_at):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO recommendation_cache (key, response, expires_at) VALUES (?, ?, ?)',
+                (key, response, expires_at)
+            )
+            self._conn.execute('DELETE FROM recommendation_cache WHERE expires_at <= ?', (time.time(),))
+            self._conn.commit()
+
+class RecommendationCache:
+    """Memoizes Gemini recommendation text by normalized input key"""
+
+    def __init__(self, max_items=1024, max_bytes=64 * 1024 * 1024, ttl_seconds=86400, backend=None):
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        self.memory = LRUCache(
+            max_items=max_items,
+            max_bytes=max_bytes,
+            ttl_seconds=ttl_seconds,
+            name='recommendations'
+        )
+        self.flight = SingleFlight()
+
+    def lookup(self, key):
+        """Cached response text from memory or the persistent tier"""
+        response = self.memory.get(key)
+        if response is not None:
+            return response
+
+        if self.backend is not None:
+            row = self.backend.load(key)
+            if row is not None:
+                response, expires_at = row
+                self.memory.set(key, response, expires_at=expires_at)
+                return response
+        return None
+
+    def store(self, key, response):
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds else None
+        self.memory.set(key, response, expires_at=expires_at)
+        if self.backend is not None:
+            try:
+                self.backend.save(key, response, expires_at or float('inf'))
+            except Exception as e:
+                print(f"Error persisting recommendation cache entry: {str(e)}")
+
+    def get_or_compute(self, key, compute):
+        """Return the cached response for key, calling compute() at most once per key"""
+        response = self.lookup(key)
+        if response is not None:
+            CACHE_REQUESTS.inc(result='hit')
+            return response
+
+        def compute_and_store():
+            # A previous leader may have stored the answer while we were queued
+            cached = self.lookup(key)
+            if cached is not None:
+                return cached
+            result = compute()
+            self.store(key, result)
+            return result
+
+        response, shared = self.flight.do(key, compute_and_store)
+        CACHE_REQUESTS.inc(result='shared' if shared else 'miss')
+        return response
+
+    async def get_or_compute_async(self, key, compute):
+        """Async version of get_or_compute; compute is a coroutine function"""
+        response = self.lookup(key)
+        if response is not None:
+            CACHE_REQUESTS.inc(result='hit')
+            return response
+
+        async def compute_and_store():
+            result = await compute()
+            self.store(key, result)
+            return result
+
+        response, shared = await self.flight.do_async(key, compute_and_store)
+        CACHE_REQUESTS.inc(result='shared' if shared else 'miss')
+        return response
+
+    def stats(self):
+        stats = self.memory.stats()
+        stats['backend'] = 'sqlite' if self.backend is not None else 'memory'
+        stats['ttl_seconds'] = self.ttl_seconds
+        return stats
+
+_RECOMMENDATION_CACHE = None
+_RECOMMENDATION_CACHE_LOCK = threading.Lock()
+
+def get_recommendation_cache():
+    """Get the shared recommendation cache (None when disabled)"""
+    global _RECOMMENDATION_CACHE
+
+    if not Config.RECOMMENDATION_CACHE_ENABLED:
+        return None
+
+    if _RECOMMENDATION_CACHE is None:
+        with _RECOMMENDATION_CACHE_LOCK:
+            if _RECOMMENDATION_CACHE is None:
+                backend = None
+                if Config.RECOMMENDATION_CACHE_BACKEND == 'sqlite':
+                    backend = SQLiteRecommendationBackend(Config.RECOMMENDATION_CACHE_DB_PATH)
+                _RECOMMENDATION_CACHE = RecommendationCache(
+                    max_items=Config.RECOMMENDATION_CACHE_MAX_ITEMS,
+                    max_bytes=Config.RECOMMENDATION_CACHE_MAX_BYTES,
+                    ttl_seconds=Config.RECOMMENDATION_CACHE_TTL_SECONDS,
+                    backend=backend
+                )
+    return _RECOMMENDATION_CACHE
@@ -0,0 +1,329 @@
+"""
+Server-side chat session store
+
+A session keeps the assembled prompt prefix (system prompt + model
+acknowledgement) and the turns so far, so clients only send the new message.
+History is trimmed to a token budget, and sessions are evicted by LRU order,
+idle TTL and a per-session memory cap. An optional SQLite backend persists
+sessions across restarts and workers; the in-memory LRU sits in front of it.
+With a backend, every read checks the stored version and reloads a session
+another worker changed, and every write is a compare-and-set on that
+version, so concurrent turns are merged instead of overwritten.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from config import Config
+
+def estimate_tokens(text):
+    """Rough token estimate (~4 characters per token)"""
+    return max(1, len(text) // 4) if text else 0
+
+def _content_text(content):
+    return ''.join(part.get('text', '') for part in content.get('parts', []))
+
+class ChatSession:
+    """Prompt prefix and conversation turns for one chat"""
+
+    def __init__(self, session_id, prefix, turns=None, updated_at=None, version=0, context=None):
+        self.id = session_id
+        self.prefix = prefix
+        self.turns = turns or []
+        # Patient/diagnosis context the prefix was built from
+        self.context = context or {}
+        self.updated_at = updated_at or time.time()
+        # Backend row version this state was loaded from or saved as (0 = never saved)
+        self.version = version
+        self.trimmed_turns = 0
+
+    def build_contents(self, message):
+        """Full Gemini contents for the next request"""
+        return self.prefix + self.turns + [{'role': 'user', 'parts': [{'text': message}]}]
+
+    def add_turn(self, role, text):
+        self.turns.append({'role': role, 'parts': [{'text': text}]})
+        self.updated_at = time.time()
+
+    def token_count(self):
+        return sum(estimate_tokens(_content_text(c)) for c in self.prefix + self.turns)
+
+    def size_bytes(self):
+        return len(self.to_json())
+
+    def trim(self, token_budget, max_bytes):
+        """Drop the oldest turns (in user/model pairs) until within budget"""
+        while self.turns and (self.token_count() > token_budget or self.size_bytes() > max_bytes):
+            drop = 2 if len(self.turns) >= 2 else 1
+            del self.turns[:drop]
+            self.trimmed_turns += drop
+
+    def to_json(self):
+        return json.dumps({'prefix': self.prefix, 'turns': self.turns, 'context': self.context}, ensure_ascii=False)
+
+    def replace_state(self, other):
+        """Take over the stored state of a newer copy of this session"""
+        self.prefix = other.prefix
+        self.turns = other.turns
+        self.context = other.context
+        self.updated_at = other.updated_at
+        self.version = other.version
+
+    @classmethod
+    def from_json(cls, session_id, data, updated_at=None, version=0):
+        payload = json.loads(data)
+        return cls(session_id, payload['prefix'], payload['turns'], updated_at, version, payload.get('context'))
+
+class SQLiteSessionBackend:
+    """Persistent session storage in a single SQLite table"""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS chat_sessions ('
+            ' id TEXT PRIMARY KEY,'
+            ' data TEXT NOT NULL,'
+            ' updated_at REAL NOT NULL,'
+            ' version INTEGER NOT NULL DEFAULT 1)'
+        )
+        # Stores created before writes were versioned
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(chat_sessions)')}
+        if 'version' not in columns:
+            self._conn.execute('ALTER TABLE chat_sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 1')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_chat_sessions_updated ON chat_sessions(updated_at)')
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def load(self, session_id):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT data, updated_at, version FROM chat_sessions WHERE id = ?', (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return ChatSession.from_json(session_id, row[0], row[1], row[2])
+
+    def version(self, session_id):
+        """Stored version of a session, or None when it is not stored"""
+        with self._lock:
+            row = self._conn.execute('SELECT version FROM chat_sessions WHERE id = ?', (session_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    def save(self, session):
+        """Write the session if the stored row is still at `session.version`
+
+        Returns False (and writes nothing) when another worker saved or
+        deleted it since it was loaded; on success `session.version` is bumped.
+        """
+        with self._lock:
+            if session.version:
+                cursor = self._conn.execute(
+                    'UPDATE chat_sessions SET data = ?, updated_at = ?, version = version + 1'
+                    ' WHERE id = ? AND version = ?',
+                    (session.to_json(), session.updated_at, session.id, session.version)
+                )
+            else:
+                cursor = self._conn.execute(
+                    'INSERT OR IGNORE INTO chat_sessions (id, data, updated_at, version) VALUES (?, ?, ?, 1)',
+                    (session.id, session.to_json(), session.updated_at)
+                )
+            self._conn.commit()
+        if cursor.rowcount != 1:
+            return False
+        session.version += 1
+        return True
+
+    def delete(self, session_id):
+        with self._lock:
+            self._conn.execute('DELETE FROM chat_sessions WHERE id = ?', (session_id,))
+            self._conn.commit()
+
+    def expire(self, older_than):
+        with self._lock:
+            self._conn.execute('DELETE FROM chat_sessions WHERE updated_at < ?', (older_than,))
+            self._conn.commit()
+
+class SessionStore:
+    """In-memory LRU of chat sessions with an optional persistent backend"""
+
+    # Compare-and-set retries before a write is given up on
+    SAVE_ATTEMPTS = 5
+
+    def __init__(self, max_sessions=1000, ttl_seconds=3600, token_budget=8000,
+                 max_session_bytes=256 * 1024, backend=None):
+        self.max_sessions = max(1, int(max_sessions))
+        self.ttl_seconds = ttl_seconds
+        self.token_budget = token_budget
+        self.max_session_bytes = max_session_bytes
+        self.backend = backend
+
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Counters for monitoring
+        self.created = 0
+        self.evicted = 0
+        self.expired = 0
+
+    def create(self, prefix, history=None, context=None):
+        """Create a session from an assembled prefix and optional prior turns"""
+        session = ChatSession(uuid.uuid4().hex, prefix, context=context)
+        for msg in history or []:
+            role = "user" if msg.get("role") == "user" else "model"
+            session.add_turn(role, msg.get("content", ""))
+        session.trim(self.token_budget, self.max_session_bytes)
+        self._put(session)
+        self._persist(session)
+        with self._lock:
+            self.created += 1
+        return session
+
+    def get(self, session_id):
+        """Return a live session or None when unknown or expired"""
+        if not session_id:
+            return None
+
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                if self._is_expired(session, now):
+                    del self._sessions[session_id]
+                    self.expired += 1
+                    session = None
+                else:
+                    self._sessions.move_to_end(session_id)
+
+        if self.backend is None:
+            return session
+
+        # The backend is the source of truth: another worker may have added turns
+        if session is not None:
+            version = self.backend.version(session_id)
+            if version == session.version:
+                return session
+            if version is None:
+                with self._lock:
+                    self._sessions.pop(session_id, None)
+                return None
+
+        stored = self.backend.load(session_id)
+        if stored is None or self._is_expired(stored, now):
+            return None
+        if session is not None:
+            # Refresh in place so callers holding the old object see the new turns
+            session.replace_state(stored)
+            stored = session
+        self._put(stored)
+        return stored
+
+    def set_prefix(self, session, prefix, context=None):
+        """Replace the prompt prefix (e.g. patient info or diagnosis changed)"""
+        def change(target):
+            target.prefix = prefix
+            target.context = context or {}
+        self._update(session, change)
+
+    def append_exchange(self, session, message, reply):
+        """Record a completed user message and model reply"""
+        def change(target):
+            target.add_turn('user', message)
+            target.add_turn('model', reply)
+        self._update(session, change)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        if self.backend is not None:
+            self.backend.delete(session_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'created': self.created,
+                'evicted': self.evicted,
+                'expired': self.expired,
+                'backend': 'sqlite' if self.backend is not None else 'memory'
+            }
+
+    def _is_expired(self, session, now):
+        return bool(self.ttl_seconds) and now - session.updated_at > self.ttl_seconds
+
+    def _update(self, session, change):
+        """Apply `change`, trim and save; on a version conflict reload and reapply"""
+        change(session)
+        session.trim(self.token_budget, self.max_session_bytes)
+        if self.backend is not None:
+            for attempt in range(self.SAVE_ATTEMPTS):
+                if self.backend.save(session):
+                    break
+                if attempt == self.SAVE_ATTEMPTS - 1:
+                    print(f"Chat session {session.id} not saved: concurrent updates kept conflicting")
+                    break
+                stored = self.backend.load(session.id)
+                if stored is None:
+                    # Deleted or expired elsewhere: store this copy again as new
+                    session.version = 0
+                else:
+                    session.replace_state(stored)
+                    change(session)
+                    session.trim(self.token_budget, self.max_session_bytes)
+            self._expire_backend()
+        self._put(session)
+
+    def _persist(self, session):
+        if self.backend is not None:
+            self.backend.save(session)
+            self._expire_backend()
+
+    def _expire_backend(self):
+        if self.ttl_seconds:
+            self.backend.expire(time.time() - self.ttl_seconds)
+
+    def _put(self, session):
+        now = time.time()
+        with self._lock:
+            self._sessions[session.id] = session
+            self._sessions.move_to_end(session.id)
+
+            # Drop idle sessions from the cold end, then enforce the LRU bound
+            while self._sessions:
+                oldest_id, oldest = next(iter(self._sessions.items()))
+                if oldest_id == session.id or not self._is_expired(oldest, now):
+                    break
+                del self._sessions[oldest_id]
+                self.expired += 1
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evicted += 1
+
+_SESSION_STORE = None
+_SESSION_STORE_LOCK = threading.Lock()
+
+def get_session_store():
+    """Get the shared chat session store"""
+    global _SESSION_STORE
+
+    if _SESSION_STORE is None:
+        with _SESSION_STORE_LOCK:
+            if _SESSION_STORE is None:
+                backend = None
+                if Config.CHAT_SESSION_BACKEND == 'sqlite':
+                    backend = SQLiteSessionBackend(Config.CHAT_SESSION_DB_PATH)
+                _SESSION_STORE = SessionStore(
+                    max_sessions=Config.CHAT_SESSION_MAX_SESSIONS,
+                    ttl_seconds=Config.CHAT_SESSION_TTL_SECONDS,
+                    token_budget=Config.CHAT_SESSION_TOKEN_BUDGET,
+                    max_session_bytes=Config.CHAT_SESSION_MAX_BYTES,
+                    backend=backend
+                )
+    return _SESSION_STORE
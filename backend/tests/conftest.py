@@ -0,0 +1,67 @@
+"""
+Shared test setup: run from the backend directory with `python -m pytest tests`
+"""
+import os
+import sys
+import time
+import types
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+
+JWT_SECRET = 'test-jwt-secret-with-enough-length-for-hs256'
+
+@pytest.fixture
+def make_client(monkeypatch):
+    """Flask test client factory: make_client(*blueprints, config={...}, reset=[(module, name)])
+
+    `config` values are patched onto Config and each (module, name) store
+    singleton is reset to None, so every test gets fresh stores.
+    """
+    flask = pytest.importorskip('flask')
+
+    def make(*blueprints, config=None, reset=()):
+        for key, value in (config or {}).items():
+            monkeypatch.setattr(Config, key, value)
+        for module, name in reset:
+            monkeypatch.setattr(module, name, None)
+        app = flask.Flask(__name__)
+        for blueprint in blueprints:
+            app.register_blueprint(blueprint)
+        return app.test_client()
+    return make
+
+@pytest.fixture
+def auth_headers(monkeypatch):
+    """Configure HS256 Supabase tokens; returns auth_headers(user_id) -> Authorization header"""
+    jwt = pytest.importorskip('jwt')
+    monkeypatch.setattr(Config, 'SUPABASE_JWT_SECRET', JWT_SECRET)
+    monkeypatch.setattr(Config, 'SUPABASE_JWT_AUDIENCE', 'authenticated')
+
+    def headers(user_id, secret=JWT_SECRET):
+        claims = {'sub': user_id, 'aud': 'authenticated', 'exp': int(time.time()) + 60}
+        return {'Authorization': f"Bearer {jwt.encode(claims, secret, algorithm='HS256')}"}
+    return headers
+
+@pytest.fixture
+def fake_genai(monkeypatch):
+    """Let services that import google.generativeai load when the SDK is not installed
+
+    Tests using this never call Gemini; the real SDK is used when present.
+    """
+    try:
+        import google.generativeai  # noqa: F401
+        return
+    except ImportError:
+        pass
+    try:
+        import google
+    except ImportError:
+        google = types.ModuleType('google')
+        google.__path__ = []
+        monkeypatch.setitem(sys.modules, 'google', google)
+    genai = types.ModuleType('google.generativeai')
+    monkeypatch.setitem(sys.modules, 'google.generativeai', genai)
+    monkeypatch.setattr(google, 'generativeai', genai, raising=False)
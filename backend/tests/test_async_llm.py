@@ -0,0 +1,46 @@
+"""
+Async (Quart) recommendations route
+"""
+import asyncio
+import pytest
+
+quart = pytest.importorskip('quart')
+
+@pytest.fixture
+def post(monkeypatch, fake_genai):
+    """post(headers) -> (status, body, headers, recorded history owners)"""
+    from routes import async_llm
+
+    async def fake_recommendations(**kwargs):
+        return {'recommendations': 'rest', 'lung_cancer_label': kwargs['lung_cancer_label']}
+
+    owners = []
+    def fake_record(endpoint, model, result, inputs=None, content_hash=None, user_id=None):
+        owners.append(user_id)
+        return 'history-1'
+
+    monkeypatch.setattr(async_llm, 'get_fallback_recommendations_async', fake_recommendations)
+    monkeypatch.setattr(async_llm, 'record_prediction', fake_record)
+    app = quart.Quart(__name__)
+    app.register_blueprint(async_llm.async_llm_bp)
+
+    def send(headers=None):
+        async def request():
+            response = await app.test_client().post(
+                '/api/recommendations', json={'lung_cancer_label': 'High'}, headers=headers or {}
+            )
+            return response.status_code, await response.get_json(), response.headers
+        return (*asyncio.run(request()), owners)
+    return send
+
+def test_recommendations_record_the_token_user(post, auth_headers):
+    status, body, headers, owners = post(auth_headers('alice'))
+    assert status == 200
+    assert body['lung_cancer_label'] == 'High'
+    assert headers['X-History-Id'] == 'history-1'
+    assert owners == ['alice']
+
+def test_recommendations_without_a_token_are_anonymous(post, auth_headers):
+    status, _, _, owners = post()
+    assert status == 200
+    assert owners == [None]
@@ -0,0 +1,33 @@
+"""
+CT analysis timeouts
+"""
+from concurrent.futures import Future
+import pytest
+
+PIL = pytest.importorskip('PIL')
+
+from PIL import Image
+from config import Config
+from models import ct_analysis
+from models.inference_executor import InferenceTimeoutError
+
+class _StuckExecutor:
+    """Accepts jobs that never finish"""
+
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        self.futures.append(future)
+        return future
+
+def test_timeout_cancels_both_jobs(monkeypatch):
+    executor = _StuckExecutor()
+    monkeypatch.setattr(ct_analysis, 'get_executor', lambda name: executor)
+    monkeypatch.setattr(Config, 'INFERENCE_TIMEOUT', 0.05)
+
+    with pytest.raises(InferenceTimeoutError):
+        ct_analysis.analyze_ct_image(Image.new('RGB', (64, 64)))
+    assert len(executor.futures) == 2
+    assert all(future.cancelled() for future in executor.futures)
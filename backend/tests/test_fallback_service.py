@@ -0,0 +1,19 @@
+"""
+Recommendation prompt content
+"""
+import base64
+import pytest
+
+@pytest.mark.parametrize('overlay,mime_type', [
+    ('data:image/webp;base64,', 'image/webp'),
+    ('data:image/png;base64,', 'image/png'),
+    ('', 'image/png')
+])
+def test_overlay_mime_type_follows_the_data_url(fake_genai, overlay, mime_type):
+    from services.fallback_service import build_recommendation_content
+
+    overlay += base64.b64encode(b'image-bytes').decode()
+    parts = build_recommendation_content(60, 'Nam', [], 'High', True, 'T2', overlay_image=overlay)
+
+    image = next(part for part in parts if isinstance(part, dict))
+    assert image == {'mime_type': mime_type, 'data': b'image-bytes'}
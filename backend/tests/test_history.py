@@ -0,0 +1,47 @@
+"""
+Prediction history access control
+"""
+import time
+import pytest
+
+from services import history_store
+
+def _entry(entry_id, user_id):
+    return {
+        'id': entry_id, 'created_at': time.time(), 'endpoint': 'tumor', 'model': 'unet',
+        'model_version': None, 'user_id': user_id, 'content_hash': None, 'inputs': None,
+        'result': {'has_tumor': False}
+    }
+
+@pytest.fixture
+def client(tmp_path, make_client, auth_headers):
+    from routes.history import history_bp
+
+    client = make_client(
+        history_bp,
+        config={'HISTORY_DB_PATH': str(tmp_path / 'history.db')},
+        reset=[(history_store, '_HISTORY_STORE')]
+    )
+    history_store.get_history_store().append_many([
+        _entry('alice-1', 'alice'), _entry('bob-1', 'bob'), _entry('anonymous-1', None)
+    ])
+    return client
+
+def test_history_requires_a_token(client):
+    assert client.get('/api/history').status_code == 401
+    assert client.get('/api/history?user_id=bob').status_code == 401
+    assert client.get('/api/history/bob-1').status_code == 401
+
+def test_history_rejects_a_forged_token(client, auth_headers):
+    headers = auth_headers('bob', secret='not-the-server-secret-but-long-enough')
+    assert client.get('/api/history', headers=headers).status_code == 401
+
+def test_history_is_scoped_to_the_token_user(client, auth_headers):
+    headers = auth_headers('alice')
+    response = client.get('/api/history?user_id=bob', headers=headers)
+    assert response.status_code == 200
+    assert [entry['id'] for entry in response.get_json()['items']] == ['alice-1']
+
+    assert client.get('/api/history/alice-1', headers=headers).status_code == 200
+    assert client.get('/api/history/bob-1', headers=headers).status_code == 404
+    assert client.get('/api/history/anonymous-1', headers=headers).status_code == 404
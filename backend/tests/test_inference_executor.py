@@ -0,0 +1,23 @@
+"""
+Inference pool sizing against the micro-batch sizes
+"""
+from config import Config
+from models.inference_executor import batching_enabled, pool_size
+
+def test_thread_pools_can_fill_a_batch(monkeypatch):
+    monkeypatch.setattr(Config, 'INFERENCE_EXECUTOR_KIND', 'thread')
+    monkeypatch.setattr(Config, 'INFERENCE_WORKERS', {'unet': 4, 'yolo': 4, 'xgboost': 2})
+    monkeypatch.setattr(Config, 'UNET_BATCH_MAX_SIZE', 8)
+    monkeypatch.setattr(Config, 'YOLO_BATCH_MAX_SIZE', 2)
+
+    assert pool_size('unet') == 8
+    assert pool_size('yolo') == 4
+    assert pool_size('xgboost') == 2
+    assert batching_enabled(8)
+
+def test_process_pools_do_not_batch(monkeypatch):
+    monkeypatch.setattr(Config, 'INFERENCE_EXECUTOR_KIND', 'process')
+    monkeypatch.setattr(Config, 'INFERENCE_WORKERS', {'unet': 4, 'yolo': 4, 'xgboost': 2})
+
+    assert pool_size('unet') == 4
+    assert not batching_enabled(8)
@@ -0,0 +1,101 @@
+"""
+Job API input validation and ownership
+"""
+import threading
+import time
+import pytest
+
+from config import Config
+from services import job_queue
+from services.job_queue import spooled_input_path
+
+@pytest.fixture
+def client(tmp_path, make_client, auth_headers):
+    from routes.jobs import jobs_bp
+
+    return make_client(
+        jobs_bp,
+        config={'JOB_DB_PATH': str(tmp_path / 'jobs.db'), 'JOB_SPOOL_DIR': str(tmp_path / 'spool')},
+        reset=[(job_queue, '_JOB_STORE')]
+    )
+
+@pytest.fixture
+def alice(auth_headers):
+    return auth_headers('alice')
+
+def test_json_job_cannot_name_a_server_file(client, alice):
+    response = client.post('/api/jobs', json={'kind': 'tumor_volume', 'payload': {'path': '/etc/passwd'}},
+                           headers=alice)
+    assert response.status_code == 400
+
+def test_json_cohort_job_cannot_name_a_server_file(client, alice):
+    response = client.post('/api/jobs', json={
+        'kind': 'lung_cancer_batch', 'payload': {'path': '/etc/passwd', 'format': 'csv'}
+    }, headers=alice)
+    assert response.status_code == 400
+
+def test_inline_cohort_job_is_queued(client, alice):
+    response = client.post('/api/jobs', json={'kind': 'lung_cancer_batch', 'payload': {'records': []}},
+                           headers=alice)
+    assert response.status_code == 202
+    job = job_queue.get_job_store().get(response.get_json()['job_id'])
+    assert job['input_path'] is None
+    assert job['user_id'] == 'alice'
+
+def test_jobs_require_a_token(client):
+    assert client.post('/api/jobs', json={'kind': 'lung_cancer_batch', 'payload': {}}).status_code == 401
+    assert client.get('/api/jobs').status_code == 401
+    assert client.get('/api/jobs/some-job').status_code == 401
+    assert client.delete('/api/jobs/some-job').status_code == 401
+    assert client.get('/api/jobs/some-job/events').status_code == 401
+
+def test_jobs_are_scoped_to_the_submitting_user(client, auth_headers, alice):
+    job_id = job_queue.get_job_store().create('lung_cancer_batch', {}, user_id='alice')
+    bob = auth_headers('bob')
+
+    assert client.get(f'/api/jobs/{job_id}', headers=bob).status_code == 404
+    assert client.get(f'/api/jobs/{job_id}/events', headers=bob).status_code == 404
+    assert client.delete(f'/api/jobs/{job_id}', headers=bob).status_code == 404
+    assert client.get('/api/jobs', headers=bob).get_json()['jobs'] == []
+
+    assert client.get(f'/api/jobs/{job_id}', headers=alice).get_json()['status'] == 'queued'
+    assert [job['job_id'] for job in client.get('/api/jobs', headers=alice).get_json()['jobs']] == [job_id]
+    assert client.delete(f'/api/jobs/{job_id}', headers=alice).get_json()['status'] == 'cancelled'
+
+def test_spooled_input_path_stays_in_spool_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'JOB_SPOOL_DIR', str(tmp_path / 'spool'))
+    (tmp_path / 'spool').mkdir()
+
+    inside = tmp_path / 'spool' / 'input.csv'
+    assert spooled_input_path(str(inside)) == str(inside.resolve())
+    for path in ('/etc/passwd', str(tmp_path / 'spool' / '..' / 'jobs.db'), str(tmp_path / 'spool')):
+        with pytest.raises(ValueError):
+            spooled_input_path(path)
+
+def _expire_lease(store, job_id):
+    store._conn.execute('UPDATE jobs SET lease_expires = ? WHERE id = ?', (time.time() - 1, job_id))
+
+def test_expired_lease_fails_the_job_after_its_last_attempt(tmp_path):
+    store = job_queue.JobStore(str(tmp_path / 'jobs.db'))
+    job_id = store.create('lung_cancer_batch', {}, max_attempts=2, user_id='alice')
+
+    assert store.claim(60)['id'] == job_id
+    _expire_lease(store, job_id)
+    # Worker died on attempt 1 of 2: requeued and claimed again
+    assert store.claim(60)['attempts'] == 2
+    _expire_lease(store, job_id)
+
+    assert store.claim(60, ttl_seconds=60) is None
+    job = store.get(job_id)
+    assert job['status'] == 'failed'
+    assert job['expires_at'] is not None
+
+def test_counts_do_not_wait_for_the_writer_lock(tmp_path):
+    store = job_queue.JobStore(str(tmp_path / 'jobs.db'))
+    store.create('lung_cancer_batch', {})
+    counts = []
+    with store._lock:
+        reader = threading.Thread(target=lambda: counts.append(store.counts()))
+        reader.start()
+        reader.join(5)
+    assert counts and counts[0]['queued'] == 1
@@ -0,0 +1,44 @@
+"""
+Single-flight collapsing of concurrent recommendation calls
+"""
+import asyncio
+import pytest
+
+from services.recommendation_cache import SingleFlight
+
+def test_cancelled_leader_does_not_cancel_followers():
+    flight = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 'result'
+
+    async def scenario():
+        leader = asyncio.ensure_future(flight.do_async('key', compute))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do_async('key', compute))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == ('result', True)
+    assert calls == [1]
+
+def test_errors_reach_every_caller():
+    flight = SingleFlight()
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        raise ValueError('upstream failed')
+
+    async def scenario():
+        return await asyncio.gather(
+            flight.do_async('key', compute), flight.do_async('key', compute), return_exceptions=True
+        )
+
+    assert [type(result) for result in asyncio.run(scenario())] == [ValueError, ValueError]
+    assert flight._async_calls == {}
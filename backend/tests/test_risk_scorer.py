@@ -0,0 +1,60 @@
+"""
+FastRiskScorer label parity with the reference DataFrame + scaler path
+"""
+import numpy as np
+import pytest
+
+pytest.importorskip('xgboost')
+pytest.importorskip('sklearn')
+pytest.importorskip('pandas')
+
+from models import xgboost_model
+from models.risk_scorer import FEATURE_ORDER, FastRiskScorer
+
+def _fit(objective, n_classes, seed=0):
+    import pandas as pd
+    from sklearn.preprocessing import StandardScaler
+    from xgboost import XGBClassifier
+
+    rng = np.random.default_rng(seed)
+    features = rng.integers(1, 9, size=(400, len(FEATURE_ORDER))).astype(np.float64)
+    # Labels that depend on the features, so the trees actually split
+    labels = np.digitize(features[:, :6].sum(axis=1), np.quantile(features[:, :6].sum(axis=1), [1 / 3, 2 / 3]))
+    labels = np.minimum(labels, n_classes - 1)
+
+    # Fitted on named columns, like the production scaler the DataFrame path feeds
+    scaler = StandardScaler().fit(pd.DataFrame(features, columns=FEATURE_ORDER))
+    model = XGBClassifier(n_estimators=30, max_depth=4, objective=objective)
+    model.fit(scaler.transform(features), labels)
+    return model, scaler
+
+def _patients(count, seed=1):
+    """Random grid rows, including out-of-range values, missing and null features"""
+    rng = np.random.default_rng(seed)
+    patients = []
+    for _ in range(count):
+        values = rng.integers(0, 10, size=len(FEATURE_ORDER))
+        patient = {feature: int(value) for feature, value in zip(FEATURE_ORDER, values)}
+        patient['age'] = int(rng.integers(14, 90))
+        for feature in rng.choice(FEATURE_ORDER, size=int(rng.integers(0, 3)), replace=False):
+            del patient[feature]
+        for feature in rng.choice(FEATURE_ORDER, size=int(rng.integers(0, 2)), replace=False):
+            patient[feature] = None
+        patients.append(patient)
+    return patients
+
+@pytest.mark.parametrize('objective,n_classes', [('multi:softprob', 3), ('binary:logistic', 2)])
+def test_fast_scorer_matches_dataframe_path(monkeypatch, objective, n_classes):
+    model, scaler = _fit(objective, n_classes)
+    monkeypatch.setattr(xgboost_model, 'get_xgboost_model', lambda: model)
+    monkeypatch.setattr(xgboost_model, 'get_scaler', lambda: scaler)
+    scorer = FastRiskScorer(model, scaler)
+
+    patients = _patients(500)
+    expected = [xgboost_model.predict_lung_cancer_risk_dataframe(patient)['prediction'] for patient in patients]
+
+    assert [scorer.predict_label(patient) for patient in patients] == expected
+    matrix = [[patient.get(feature, 0) for feature in FEATURE_ORDER] for patient in patients]
+    assert scorer.predict_labels(matrix) == expected
+    # The grid must exercise more than one class for the check to mean anything
+    assert len(set(expected)) > 1
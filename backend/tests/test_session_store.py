@@ -0,0 +1,63 @@
+"""
+Chat sessions shared between workers through the SQLite backend
+"""
+from services.session_store import SessionStore, SQLiteSessionBackend
+
+PREFIX = [{'role': 'user', 'parts': [{'text': 'system'}]}]
+
+def _texts(session):
+    return [turn['parts'][0]['text'] for turn in session.turns]
+
+def _workers(tmp_path):
+    path = str(tmp_path / 'sessions.db')
+    return SessionStore(backend=SQLiteSessionBackend(path)), SessionStore(backend=SQLiteSessionBackend(path))
+
+def test_get_reloads_turns_written_by_another_worker(tmp_path):
+    first, second = _workers(tmp_path)
+    session = first.create(PREFIX)
+    assert second.get(session.id) is not None
+
+    first.append_exchange(session, 'q1', 'a1')
+    assert _texts(second.get(session.id)) == ['q1', 'a1']
+
+def test_concurrent_turns_are_merged_not_overwritten(tmp_path):
+    first, second = _workers(tmp_path)
+    session = first.create(PREFIX)
+    stale = second.get(session.id)
+
+    first.append_exchange(session, 'q1', 'a1')
+    # Saved against an outdated version: reloaded and reapplied on top
+    second.append_exchange(stale, 'q2', 'a2')
+
+    assert _texts(stale) == ['q1', 'a1', 'q2', 'a2']
+    assert _texts(first.get(session.id)) == ['q1', 'a1', 'q2', 'a2']
+
+def test_session_deleted_by_another_worker_is_gone(tmp_path):
+    first, second = _workers(tmp_path)
+    session = first.create(PREFIX)
+    assert second.get(session.id) is not None
+
+    first.delete(session.id)
+    assert second.get(session.id) is None
+
+def test_absent_context_keys_keep_the_session_context(monkeypatch, fake_genai):
+    from services import ai_service
+
+    store = SessionStore()
+    monkeypatch.setattr(ai_service, 'get_session_store', lambda: store)
+    patient = {'age': 60, 'gender': 1, 'health_factors': {}}
+    diagnosis = {'clinical_assessment': 'x', 'full_response': '', 'recommendations': '', 'important_notes': ''}
+
+    session = ai_service.resolve_chat_session(None, [], {'patient_info': patient, 'diagnosis_result': diagnosis})
+    prefix = session.prefix
+    # Later turns without context keys reuse the prefix as is
+    assert ai_service.resolve_chat_session(session.id, [], {}).prefix is prefix
+
+    # Only the diagnosis changed: patient info is kept
+    ai_service.resolve_chat_session(session.id, [], {'diagnosis_result': None})
+    assert session.context == {'patient_info': patient, 'diagnosis_result': None}
+    assert session.prefix == ai_service.build_chat_prefix(patient, None)
+
+    # Explicit nulls clear the context
+    ai_service.resolve_chat_session(session.id, [], {'patient_info': None})
+    assert session.prefix == ai_service.build_chat_prefix()
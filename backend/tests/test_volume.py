@@ -0,0 +1,55 @@
+"""
+CT volume upload limits
+"""
+import io
+import numpy as np
+import pytest
+
+from config import Config
+
+@pytest.fixture
+def client(make_client):
+    from routes.prediction import prediction_bp
+
+    return make_client(prediction_bp, config={'HISTORY_ENABLED': False})
+
+def _npy(shape):
+    """A .npy file whose header declares `shape` (data is not needed to reject it)"""
+    buffer = io.BytesIO()
+    np.lib.format.write_array_header_1_0(buffer, {'descr': '<f4', 'fortran_order': False, 'shape': shape})
+    buffer.write(b'\0' * 64)
+    buffer.seek(0)
+    return buffer
+
+def _post(client, volume):
+    return client.post('/api/predict/tumor/volume', data={'volume': (volume, 'volume.npy')},
+                       content_type='multipart/form-data')
+
+def test_too_many_voxels_is_413(client, monkeypatch):
+    monkeypatch.setattr(Config, 'VOLUME_MAX_VOXELS', 1000)
+    assert _post(client, _npy((20, 10, 10))).status_code == 413
+
+def test_too_many_slices_is_413(client, monkeypatch):
+    monkeypatch.setattr(Config, 'VOLUME_MAX_SLICES', 4)
+    assert _post(client, _npy((5, 8, 8))).status_code == 413
+
+def test_request_over_volume_byte_limit_is_413(client, monkeypatch):
+    monkeypatch.setattr(Config, 'MAX_VOLUME_BYTES', 0)
+    volume = io.BytesIO(b'\0' * (128 * 1024))
+    assert _post(client, volume).status_code == 413
+
+def test_resize_batch_matches_the_2d_upload_path():
+    from PIL import Image
+    from utils.volume_utils import resize_batch
+
+    rng = np.random.default_rng(0)
+    # Smooth structure plus noise, downscaled as an upload would be
+    base = np.kron(rng.integers(0, 256, size=(16, 16)), np.ones((32, 32)))
+    slice_ = np.clip(base + rng.normal(0, 20, size=base.shape), 0, 255).astype(np.uint8)
+
+    expected = np.asarray(Image.fromarray(slice_).resize((256, 256)), dtype=np.float32) / 255.0
+    resized = resize_batch(slice_[None].astype(np.float32) / 255.0, (256, 256))[0]
+    # Only the 8-bit fixed-point arithmetic of the 'L' resize differs (a couple of levels at most)
+    difference = np.abs(resized - expected) * 255.0
+    assert difference.max() <= 2.5
+    assert difference.mean() <= 0.5
@@ -0,0 +1,75 @@
+"""
+Supabase access token verification
+
+The frontend sends the signed-in user's Supabase access token as
+`Authorization: Bearer <token>`. Tokens are verified locally: with
+SUPABASE_JWT_SECRET (HS256, legacy projects) or against the project's JWKS
+at SUPABASE_URL (asymmetric signing keys). The user id is the `sub` claim.
+"""
+import threading
+from config import Config
+
+class AuthError(Exception):
+    """Raised when a request's access token is missing or invalid"""
+
+class AuthNotConfiguredError(AuthError):
+    """Raised when neither SUPABASE_JWT_SECRET nor SUPABASE_URL is set"""
+
+_JWKS_CLIENT = None
+_JWKS_LOCK = threading.Lock()
+
+def _jwks_client():
+    global _JWKS_CLIENT
+
+    if _JWKS_CLIENT is None:
+        with _JWKS_LOCK:
+            if _JWKS_CLIENT is None:
+                import jwt
+                url = f"{Config.SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json"
+                # Signing keys are cached, so only a key rotation costs a round trip
+                _JWKS_CLIENT = jwt.PyJWKClient(url, cache_keys=True, lifespan=3600)
+    return _JWKS_CLIENT
+
+def is_auth_configured():
+    return bool(Config.SUPABASE_JWT_SECRET or Config.SUPABASE_URL)
+
+def bearer_token(headers):
+    """Token from an `Authorization: Bearer ...` header, or None"""
+    scheme, _, token = (headers.get('Authorization') or '').partition(' ')
+    token = token.strip()
+    return token if scheme.lower() == 'bearer' and token else None
+
+def verify_access_token(token):
+    """Verify a Supabase access token and return its user id"""
+    import jwt
+
+    if not is_auth_configured():
+        raise AuthNotConfiguredError("Authentication is not configured on this server")
+
+    try:
+        if Config.SUPABASE_JWT_SECRET:
+            key, algorithms = Config.SUPABASE_JWT_SECRET, ['HS256']
+        else:
+            key, algorithms = _jwks_client().get_signing_key_from_jwt(token).key, ['RS256', 'ES256']
+        claims = jwt.decode(
+            token, key,
+            algorithms=algorithms,
+            audience=Config.SUPABASE_JWT_AUDIENCE,
+            options={'require': ['exp', 'sub']}
+        )
+    except jwt.PyJWTError as e:
+        raise AuthError(f"Invalid access token: {str(e)}")
+    return claims['sub']
+
+def request_user_id(headers, required=True):
+    """User id of the request's access token
+
+    Raises AuthError when the token is missing (if `required`) or invalid;
+    returns None for anonymous requests otherwise.
+    """
+    token = bearer_token(headers)
+    if token is None:
+        if required:
+            raise AuthError("Sign in required: send the Supabase access token as a Bearer token")
+        return None
+    return verify_access_token(token)
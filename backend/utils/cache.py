@@ -0,0 +1,271 @@
+"""
+Content-addressed inference result cache
+"""
+import functools
+import hashlib
+import os
+import pickle
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+import numpy as np
+from utils.metrics import REGISTRY
+from config import Config
+
+_CACHES = weakref.WeakSet()
+
+def estimate_size(value):
+    """Estimate the memory footprint of a cached value in bytes"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by item count and total bytes
+
+    When `spill_dir` is set, entries evicted from memory are pickled to disk
+    (bounded by `max_disk_bytes`) and promoted back into memory on a hit.
+    With `ttl_seconds`, entries older than the TTL are treated as misses.
+    """
+
+    def __init__(self, max_items=256, max_bytes=256 * 1024 * 1024,
+                 spill_dir=None, max_disk_bytes=1024 * 1024 * 1024, name='cache',
+                 ttl_seconds=None):
+        self.max_items = max(1, int(max_items))
+        self.max_bytes = max(1, int(max_bytes))
+        self.spill_dir = spill_dir
+        self.max_disk_bytes = int(max_disk_bytes)
+        self.name = name
+        self.ttl_seconds = ttl_seconds or None
+
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._disk_entries = OrderedDict()  # key -> size on disk
+        self._bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+
+        # Counters for monitoring
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        _CACHES.add(self)
+
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[2] is not None and entry[2] <= now:
+                    del self._entries[key]
+                    self._bytes -= entry[1]
+                    self.expirations += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+
+        spilled = self._load_spilled(key)
+        if spilled is not None:
+            value, expires_at = spilled
+            if expires_at is None or expires_at > now:
+                with self._lock:
+                    self.disk_hits += 1
+                self.set(key, value, expires_at=expires_at)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def set(self, key, value, size=None, expires_at=None):
+        """Store a value, evicting least recently used entries past the bounds"""
+        size = estimate_size(value) if size is None else size
+        if size > self.max_bytes:
+            return
+        if expires_at is None and self.ttl_seconds:
+            expires_at = time.time() + self.ttl_seconds
+
+        evicted = []
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+
+            while len(self._entries) > self.max_items or self._bytes > self.max_bytes:
+                old_key, (old_value, old_size, old_expires_at) = self._entries.popitem(last=False)
+                self._bytes -= old_size
+                self.evictions += 1
+                evicted.append((old_key, old_value, old_expires_at))
+
+        for old_key, old_value, old_expires_at in evicted:
+            self._spill(old_key, old_value, old_expires_at)
+
+    def clear(self):
+        """Drop all in-memory and spilled entries"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            disk_keys = list(self._disk_entries)
+            self._disk_entries.clear()
+            self._disk_bytes = 0
+
+        for key in disk_keys:
+            self._remove_spilled(key)
+
+    def stats(self):
+        """Return cache counters"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'name': self.name,
+                'items': len(self._entries),
+                'bytes': self._bytes,
+                'max_items': self.max_items,
+                'max_bytes': self.max_bytes,
+                'disk_items': len(self._disk_entries),
+                'disk_bytes': self._disk_bytes,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0
+            }
+
+    def _spill_path(self, key):
+        return os.path.join(self.spill_dir, f"{key}.pkl")
+
+    def _spill(self, key, value, expires_at=None):
+        if not self.spill_dir:
+            return
+        try:
+            data = pickle.dumps((value, expires_at), protocol=pickle.HIGHEST_PROTOCOL)
+            if len(data) > self.max_disk_bytes:
+                return
+            with open(self._spill_path(key), 'wb') as f:
+                f.write(data)
+        except Exception as e:
+            print(f"Error spilling cache entry to disk: {str(e)}")
+            return
+
+        stale = []
+        with self._lock:
+            previous = self._disk_entries.pop(key, None)
+            if previous is not None:
+                self._disk_bytes -= previous
+            self._disk_entries[key] = len(data)
+            self._disk_bytes += len(data)
+            while self._disk_bytes > self.max_disk_bytes and self._disk_entries:
+                old_key, old_size = self._disk_entries.popitem(last=False)
+                self._disk_bytes -= old_size
+                stale.append(old_key)
+
+        for old_key in stale:
+            self._remove_spilled(old_key)
+
+    def _load_spilled(self, key):
+        if not self.spill_dir:
+            return None
+        with self._lock:
+            if key not in self._disk_entries:
+                return None
+        try:
+            with open(self._spill_path(key), 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            return None
+
+    def _remove_spilled(self, key):
+        try:
+            os.remove(self._spill_path(key))
+        except OSError:
+            pass
+
+def hash_bytes(*parts):
+    """Content hash of byte-like parts"""
+    digest = hashlib.blake2b(digest_size=20)
+    for part in parts:
+        digest.update(part)
+    return digest.hexdigest()
+
+@functools.lru_cache(maxsize=None)
+def model_identity(name, path):
+    """Identify a model artifact by name, path and modification time"""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = 0
+    return f"{name}:{path}:{mtime:.0f}"
+
+def image_content_hash(image):
+    """Content hash of decoded image pixels"""
+    header = f"{image.mode}|{image.size}".encode('utf-8')
+    return hash_bytes(header, image.tobytes())
+
+def result_cache_key(content_hash, model_id, **params):
+    """Cache key from an image content hash, the model identity and parameters"""
+    return hash_bytes(f"{model_id}|{sorted(params.items())}|{content_hash}".encode('utf-8'))
+
+_RESULT_CACHE = None
+_RESULT_CACHE_LOCK = threading.Lock()
+
+def get_result_cache():
+    """Get the shared inference result cache (None when caching is disabled)"""
+    global _RESULT_CACHE
+
+    if not Config.RESULT_CACHE_ENABLED:
+        return None
+
+    if _RESULT_CACHE is None:
+        with _RESULT_CACHE_LOCK:
+            if _RESULT_CACHE is None:
+                _RESULT_CACHE = LRUCache(
+                    max_items=Config.RESULT_CACHE_MAX_ITEMS,
+                    max_bytes=Config.RESULT_CACHE_MAX_BYTES,
+                    spill_dir=Config.RESULT_CACHE_DIR,
+                    max_disk_bytes=Config.RESULT_CACHE_DISK_MAX_BYTES,
+                    name='inference-results'
+                )
+    return _RESULT_CACHE
+
+def _cache_stats():
+    return [cache.stats() for cache in list(_CACHES)]
+
+def _collect_cache_lookups():
+    return [
+        ((stats['name'], result), stats[field])
+        for stats in _cache_stats()
+        for result, field in (('hit', 'hits'), ('disk_hit', 'disk_hits'), ('miss', 'misses'))
+    ]
+
+def _collect_cache_field(field):
+    return lambda: [((stats['name'],), stats[field]) for stats in _cache_stats()]
+
+REGISTRY.callback('cache_lookups_total', 'Cache lookups by result', _collect_cache_lookups,
+                  labelnames=('cache', 'result'), kind='counter')
+REGISTRY.callback('cache_hit_ratio', 'Fraction of lookups served from memory or disk',
+                  _collect_cache_field('hit_rate'), labelnames=('cache',))
+REGISTRY.callback('cache_evictions_total', 'Entries evicted from memory',
+                  _collect_cache_field('evictions'), labelnames=('cache',), kind='counter')
+REGISTRY.callback('cache_items', 'Entries held in memory', _collect_cache_field('items'), labelnames=('cache',))
+REGISTRY.callback('cache_bytes', 'Estimated bytes held in memory', _collect_cache_field('bytes'), labelnames=('cache',))
@@ -6,16 +6,6 @@ from PIL import Image
 import base64
 import io
 
-def validate_image(image_file):
-    """Validate uploaded image file"""
-    try:
-        img = Image.open(image_file.stream)
-        # Reset stream position
-        image_file.stream.seek(0)
-        return True, img
-    except Exception as e:
-        return False, str(e)
-
 def resize_image(image, size=(256, 256)):
     """Resize image to specified size"""
     return image.resize(size)
@@ -36,6 +26,20 @@ def normalize_image_array(img_array):
     """Normalize image array to 0-1 range"""
     return img_array.astype(np.float32) / 255.0
 
+def compose_overlay(image, binary_mask, color=(255, 0, 17), alpha=0.4):
+    """Blend a binary mask over the original image (same look as the dashboard overlay)"""
+    base = convert_to_rgb(image)
+    
+    # Scale mask to match original image size
+    mask = Image.fromarray((binary_mask > 0).astype(np.uint8) * 255, mode='L')
+    if mask.size != base.size:
+        mask = mask.resize(base.size, Image.NEAREST)
+    
+    # Blend only where the mask is set
+    tint = Image.new('RGB', base.size, color)
+    blended = Image.blend(base, tint, alpha)
+    return Image.composite(blended, base, mask)
+
 def image_to_base64(image, format='PNG'):
     """Convert PIL Image to base64 string"""
     try:
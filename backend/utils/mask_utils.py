@@ -0,0 +1,133 @@
+"""
+Segmentation mask post-processing and encoding
+"""
+import base64
+import io
+import numpy as np
+from PIL import Image
+from scipy import ndimage
+
+MASK_ENCODINGS = ('png', 'webp', 'rle', 'polygon', 'bitmap')
+
+def analyze_mask(probability_map, threshold=0.5, max_components=32):
+    """Threshold a probability map once and collect the mask statistics
+
+    Returns the boolean mask plus area, max probability, connected component
+    count and per-component bounding boxes (largest first, mask coordinates).
+    """
+    binary_mask = probability_map > threshold
+    tumor_pixels = int(np.count_nonzero(binary_mask))
+    max_probability = float(probability_map.max())
+
+    bounding_boxes = []
+    component_count = 0
+    if tumor_pixels:
+        labels, component_count = ndimage.label(binary_mask)
+        areas = np.bincount(labels.ravel(), minlength=component_count + 1)[1:]
+        for index, slices in enumerate(ndimage.find_objects(labels)):
+            rows, cols = slices
+            bounding_boxes.append({
+                'x': int(cols.start),
+                'y': int(rows.start),
+                'width': int(cols.stop - cols.start),
+                'height': int(rows.stop - rows.start),
+                'area': int(areas[index])
+            })
+        bounding_boxes.sort(key=lambda box: box['area'], reverse=True)
+        bounding_boxes = bounding_boxes[:max_components]
+
+    return {
+        'binary_mask': binary_mask,
+        'tumor_pixels': tumor_pixels,
+        'max_probability': max_probability,
+        'components': int(component_count),
+        'bounding_boxes': bounding_boxes
+    }
+
+def mask_agreement(mask_a, mask_b):
+    """Dice and IoU between two binary masks (1.0 when both are empty)"""
+    mask_a = np.asarray(mask_a, dtype=bool)
+    mask_b = np.asarray(mask_b, dtype=bool)
+    intersection = int(np.count_nonzero(mask_a & mask_b))
+    total = int(np.count_nonzero(mask_a)) + int(np.count_nonzero(mask_b))
+    if total == 0:
+        return {'dice': 1.0, 'iou': 1.0}
+    return {
+        'dice': 2.0 * intersection / total,
+        'iou': intersection / (total - intersection)
+    }
+
+def encode_image_bytes(image, format='PNG', **save_kwargs):
+    """Encode a PIL image to raw file bytes"""
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, **save_kwargs)
+    return buffer.getvalue()
+
+def encode_image_data_url(image, format='PNG', **save_kwargs):
+    """Encode a PIL image as a base64 data URL"""
+    encoded = base64.b64encode(encode_image_bytes(image, format, **save_kwargs)).decode('utf-8')
+    return f"data:image/{format.lower()};base64,{encoded}"
+
+def encode_image(image, format='PNG', raw=False, **save_kwargs):
+    """Encode a PIL image as raw bytes (binary responses) or a data URL (JSON)"""
+    if raw:
+        return encode_image_bytes(image, format, **save_kwargs)
+    return encode_image_data_url(image, format, **save_kwargs)
+
+def mask_to_bitmap(binary_mask, raw=False):
+    """Pack a mask into a row-major 1-bit bitmap (MSB first, rows padded to whole bytes)"""
+    packed = np.packbits(np.asarray(binary_mask, dtype=bool), axis=1).tobytes()
+    return {
+        'encoding': 'bitmap',
+        'size': [int(binary_mask.shape[0]), int(binary_mask.shape[1])],
+        'data': packed if raw else base64.b64encode(packed).decode('utf-8')
+    }
+
+def mask_to_rle(binary_mask):
+    """Run-length encode a mask in row-major order, starting with a run of zeros"""
+    flat = np.ascontiguousarray(binary_mask, dtype=bool).ravel()
+    boundaries = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    counts = np.diff(np.concatenate(([0], boundaries, [flat.size])))
+    if flat.size and flat[0]:
+        counts = np.concatenate(([0], counts))
+    return {
+        'encoding': 'rle',
+        'size': [int(binary_mask.shape[0]), int(binary_mask.shape[1])],
+        'counts': counts.tolist()
+    }
+
+def mask_to_polygons(binary_mask, epsilon=1.0):
+    """Outer contours of the mask as simplified [[x, y], ...] polygons"""
+    import cv2
+
+    contours, _ = cv2.findContours(binary_mask.astype(np.uint8), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    polygons = []
+    for contour in contours:
+        if epsilon:
+            contour = cv2.approxPolyDP(contour, epsilon, True)
+        polygons.append(contour.reshape(-1, 2).tolist())
+    return {
+        'encoding': 'polygon',
+        'size': [int(binary_mask.shape[0]), int(binary_mask.shape[1])],
+        'polygons': polygons
+    }
+
+def encode_mask(binary_mask, encoding='png', png_compress_level=1, raw=False):
+    """Encode a boolean mask
+
+    Image encodings return a data URL (raw file bytes when `raw`); 'rle',
+    'polygon' and 'bitmap' return a dict.
+    """
+    if encoding == 'png':
+        # 1-bit PNG at a fast zlib level
+        return encode_image(Image.fromarray(binary_mask), 'PNG', raw, compress_level=png_compress_level)
+    if encoding == 'webp':
+        mask_img = Image.fromarray(binary_mask.astype(np.uint8) * 255, mode='L')
+        return encode_image(mask_img, 'WEBP', raw, lossless=True, method=0)
+    if encoding == 'bitmap':
+        return mask_to_bitmap(binary_mask, raw)
+    if encoding == 'rle':
+        return mask_to_rle(binary_mask)
+    if encoding == 'polygon':
+        return mask_to_polygons(binary_mask)
+    raise ValueError(f"Unsupported mask encoding: {encoding}")
@@ -0,0 +1,59 @@
+"""
+Patient record parsing utilities for bulk endpoints
+"""
+import codecs
+import csv
+import json
+
+JSON_TYPES = ('application/json',)
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+CSV_TYPES = ('text/csv', 'application/csv')
+
+def detect_record_format(mimetype, filename=None):
+    """Detect record format ('json', 'ndjson' or 'csv') from a mimetype or filename"""
+    mimetype = (mimetype or '').lower()
+    filename = (filename or '').lower()
+
+    if mimetype in NDJSON_TYPES or filename.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if mimetype in CSV_TYPES or filename.endswith('.csv'):
+        return 'csv'
+    if mimetype in JSON_TYPES or filename.endswith('.json'):
+        return 'json'
+    return None
+
+def iter_json_array(stream):
+    """Parse a JSON array of records"""
+    data = json.load(codecs.getreader('utf-8')(stream))
+    if isinstance(data, dict) and 'records' in data:
+        data = data['records']
+    if not isinstance(data, list):
+        raise ValueError("Expected a JSON array of patient records")
+    return iter(data)
+
+def iter_ndjson(stream):
+    """Lazily parse newline-delimited JSON records"""
+    for line_number, line in enumerate(codecs.getreader('utf-8')(stream), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON on line {line_number}: {str(e)}")
+
+def iter_csv(stream):
+    """Lazily parse CSV records with a header row of feature names"""
+    reader = csv.DictReader(codecs.getreader('utf-8-sig')(stream))
+    for row in reader:
+        yield {key.strip().lower().replace(' ', '_'): value for key, value in row.items() if key}
+
+def iter_records(stream, record_format):
+    """Iterate patient records from a binary stream in the given format"""
+    if record_format == 'ndjson':
+        return iter_ndjson(stream)
+    if record_format == 'csv':
+        return iter_csv(stream)
+    if record_format == 'json':
+        return iter_json_array(stream)
+    raise ValueError(f"Unsupported record format: {record_format}")
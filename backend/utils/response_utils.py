@@ -1,7 +1,18 @@
 """
 Response utilities for API endpoints
 """
-from flask import jsonify
+import json
+import uuid
+from flask import jsonify, request, Response
+from utils.metrics import time_stage
+
+# Accept types for image prediction results; JSON stays the default for */*
+RESULT_MIMETYPES = {
+    'application/json': 'json',
+    'application/msgpack': 'msgpack',
+    'application/x-msgpack': 'msgpack',
+    'multipart/mixed': 'multipart'
+}
 
 def error_response(message, status_code=500):
     """Create standardized error response"""
@@ -10,6 +21,15 @@ def error_response(message, status_code=500):
         'status_code': status_code
     }), status_code
 
+def busy_response(message, retry_after=1):
+    """Create 503 response asking the client to retry later"""
+    response = jsonify({
+        'error': message,
+        'status_code': 503
+    })
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 503
+
 def success_response(data, message="Success"):
     """Create standardized success response"""
     return jsonify({
@@ -25,3 +45,68 @@ def validation_error(errors):
         'errors': errors,
         'status_code': 400
     }), 400
+
+def negotiate_result_format():
+    """Pick 'json', 'msgpack' or 'multipart' from the request's Accept header"""
+    best = request.accept_mimetypes.best_match(list(RESULT_MIMETYPES), default='application/json')
+    return RESULT_MIMETYPES[best]
+
+def _sniff_mimetype(data):
+    if data.startswith(b'\x89PNG'):
+        return 'image/png'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'application/octet-stream'
+
+def _extract_binary(value, path, parts):
+    """Replace bytes values with cid: references, collecting them as parts"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        parts.append((path, bytes(value)))
+        return f"cid:{path}"
+    if isinstance(value, dict):
+        return {k: _extract_binary(v, f"{path}.{k}" if path else k, parts) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_extract_binary(v, f"{path}.{i}", parts) for i, v in enumerate(value)]
+    return value
+
+def multipart_response(result):
+    """multipart/mixed response: a JSON part followed by one raw part per binary field
+
+    Binary fields in the JSON part are replaced by "cid:<field path>", matching
+    the Content-ID of the part that carries the bytes.
+    """
+    parts = []
+    document = _extract_binary(result, '', parts)
+    boundary = uuid.uuid4().hex
+
+    chunks = [
+        f"--{boundary}\r\nContent-Type: application/json\r\n\r\n".encode('utf-8'),
+        json.dumps(document).encode('utf-8'),
+        b"\r\n"
+    ]
+    for name, data in parts:
+        chunks.append((
+            f"--{boundary}\r\n"
+            f"Content-Type: {_sniff_mimetype(data)}\r\n"
+            f"Content-ID: <{name}>\r\n"
+            f"Content-Length: {len(data)}\r\n\r\n"
+        ).encode('utf-8'))
+        chunks.append(data)
+        chunks.append(b"\r\n")
+    chunks.append(f"--{boundary}--\r\n".encode('utf-8'))
+
+    return Response(b''.join(chunks), mimetype=f'multipart/mixed; boundary={boundary}')
+
+def msgpack_response(result):
+    """MessagePack response; bytes fields are sent as raw bin values"""
+    import msgpack
+    return Response(msgpack.packb(result, use_bin_type=True), mimetype='application/msgpack')
+
+def result_response(result, result_format='json'):
+    """Serialize a prediction result in the negotiated format"""
+    with time_stage('response', result_format):
+        if result_format == 'msgpack':
+            return msgpack_response(result)
+        if result_format == 'multipart':
+            return multipart_response(result)
+        return jsonify(result)
@@ -0,0 +1,75 @@
+"""
+Overlapping tile extraction and blended stitching for sliding-window inference
+
+Tiles are read through a strided `sliding_window_view`, and stitching adds
+the weighted tiles back through the same kind of view. Tiles whose grid
+positions are `ceil(tile / stride)` apart never overlap, so the whole
+stitch is a handful of vectorized in-place adds instead of a loop over tiles.
+"""
+import math
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+def tile_grid(length, tile, stride):
+    """Number of tiles along one axis and the padded length they cover"""
+    if length <= tile:
+        return 1, tile
+    count = math.ceil((length - tile) / stride) + 1
+    return count, (count - 1) * stride + tile
+
+def tile_count(shape, tile, overlap):
+    """Tiles needed for an (height, width) image"""
+    stride = tile - overlap
+    return tile_grid(shape[0], tile, stride)[0] * tile_grid(shape[1], tile, stride)[0]
+
+def extract_tiles(array, tile, overlap):
+    """Cut a 2-D array into overlapping (tile, tile) tiles
+
+    The array is reflect-padded on the bottom/right so the grid covers it.
+    Returns (tiles of shape (N, tile, tile), grid (rows, cols), padded shape).
+    """
+    stride = tile - overlap
+    if stride <= 0:
+        raise ValueError("Tile overlap must be smaller than the tile size")
+
+    rows, padded_height = tile_grid(array.shape[0], tile, stride)
+    cols, padded_width = tile_grid(array.shape[1], tile, stride)
+    pad = ((0, padded_height - array.shape[0]), (0, padded_width - array.shape[1]))
+    # Reflect needs the pad to be smaller than the axis; tiny images fall back to edge padding
+    mode = 'reflect' if all(after < size for (_, after), size in zip(pad, array.shape)) else 'edge'
+    padded = np.pad(array, pad, mode=mode)
+
+    windows = sliding_window_view(padded, (tile, tile))[::stride, ::stride]
+    return windows.reshape(rows * cols, tile, tile), (rows, cols), padded.shape
+
+def blend_window(tile, overlap):
+    """2-D weights that ramp down linearly across the overlap at each edge"""
+    ramp = np.ones(tile, dtype=np.float32)
+    if overlap:
+        edge = (np.arange(overlap, dtype=np.float32) + 1.0) / (overlap + 1.0)
+        ramp[:overlap] = edge
+        ramp[-overlap:] = edge[::-1]
+    return np.outer(ramp, ramp)
+
+def stitch_tiles(tiles, grid, padded_shape, output_shape, overlap):
+    """Blend (N, tile, tile) predictions back into an `output_shape` map"""
+    rows, cols = grid
+    tile = tiles.shape[-1]
+    stride = tile - overlap
+    weights = blend_window(tile, overlap)
+
+    accumulator = np.zeros(padded_shape, dtype=np.float32)
+    weight_sum = np.zeros(padded_shape, dtype=np.float32)
+    acc_windows = sliding_window_view(accumulator, (tile, tile), writeable=True)[::stride, ::stride]
+    weight_windows = sliding_window_view(weight_sum, (tile, tile), writeable=True)[::stride, ::stride]
+    weighted = (tiles.reshape(rows, cols, tile, tile) * weights).astype(np.float32, copy=False)
+
+    # Within one phase group the tiles are disjoint, so each add touches every pixel once
+    step = math.ceil(tile / stride)
+    for row_phase in range(min(step, rows)):
+        for col_phase in range(min(step, cols)):
+            acc_windows[row_phase::step, col_phase::step] += weighted[row_phase::step, col_phase::step]
+            weight_windows[row_phase::step, col_phase::step] += weights
+
+    height, width = output_shape
+    return accumulator[:height, :width] / weight_sum[:height, :width]
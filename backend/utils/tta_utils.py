@@ -0,0 +1,72 @@
+"""
+Test-time augmentation: flipped/rotated copies in one batch, merged back
+
+Augmented copies are stacked along the batch axis so the model runs once
+for all of them. Segmentation outputs are mapped back to the original
+orientation with the inverse transform (a view over the whole batch per
+transform), then averaged; the per-pixel variance across copies is the
+uncertainty. Classification outputs need no inverse.
+"""
+import numpy as np
+from PIL import Image
+
+TTA_TRANSFORMS = ('hflip', 'vflip', 'rot90', 'rot180', 'rot270')
+ROTATIONS = ('rot90', 'rot270')
+
+# Transforms on (N, H, W, ...) arrays; rotations are counter-clockwise like PIL's
+_ARRAY_TRANSFORMS = {
+    'identity': lambda batch: batch,
+    'hflip': lambda batch: batch[:, :, ::-1],
+    'vflip': lambda batch: batch[:, ::-1],
+    'rot90': lambda batch: np.rot90(batch, 1, axes=(1, 2)),
+    'rot180': lambda batch: batch[:, ::-1, ::-1],
+    'rot270': lambda batch: np.rot90(batch, 3, axes=(1, 2))
+}
+_INVERSE = {
+    'identity': 'identity',
+    'hflip': 'hflip',
+    'vflip': 'vflip',
+    'rot90': 'rot270',
+    'rot180': 'rot180',
+    'rot270': 'rot90'
+}
+_IMAGE_TRANSFORMS = {
+    'hflip': Image.FLIP_LEFT_RIGHT,
+    'vflip': Image.FLIP_TOP_BOTTOM,
+    'rot90': Image.ROTATE_90,
+    'rot180': Image.ROTATE_180,
+    'rot270': Image.ROTATE_270
+}
+
+def tta_plan(transforms):
+    """Validated transform names with the original ('identity') first"""
+    unknown = [name for name in transforms if name not in TTA_TRANSFORMS]
+    if unknown:
+        raise ValueError(f"Unknown TTA transforms {', '.join(unknown)}, use: {', '.join(TTA_TRANSFORMS)}")
+    return ('identity',) + tuple(name for name in dict.fromkeys(transforms))
+
+def augment_batch(batch, plan):
+    """(N, H, W, ...) -> (len(plan) * N, H, W, ...), grouped by transform"""
+    return np.concatenate([_ARRAY_TRANSFORMS[name](batch) for name in plan], axis=0)
+
+def merge_augmented(outputs, plan):
+    """Undo each transform on (len(plan) * N, H, W) outputs
+
+    Returns the (N, H, W) mean and variance over the augmented copies.
+    """
+    groups = outputs.reshape((len(plan), -1) + outputs.shape[1:])
+    restored = np.stack([_ARRAY_TRANSFORMS[_INVERSE[name]](group) for name, group in zip(plan, groups)])
+    return restored.mean(axis=0), restored.var(axis=0)
+
+def augment_images(images, plan):
+    """PIL images -> len(plan) * N images, grouped by transform"""
+    return [
+        image if name == 'identity' else image.transpose(_IMAGE_TRANSFORMS[name])
+        for name in plan
+        for image in images
+    ]
+
+def merge_probabilities(probabilities, plan):
+    """(len(plan) * N, classes) -> (N, classes) mean and variance"""
+    groups = np.asarray(probabilities).reshape((len(plan), -1) + np.shape(probabilities)[1:])
+    return groups.mean(axis=0), groups.var(axis=0)
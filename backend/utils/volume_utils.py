@@ -0,0 +1,218 @@
+"""
+Multi-slice CT volume readers (DICOM series zip, .npy, .npz)
+
+Readers expose the slice count, in-plane shape and voxel spacing up front and
+then yield fixed-size batches of raw slices, so only one batch of pixels is
+held in memory at a time regardless of study size.
+"""
+import zipfile
+import numpy as np
+from PIL import Image
+from config import Config
+
+VOLUME_FORMATS = ('dicom', 'npy', 'npz')
+INTENSITY_MODES = ('hu', 'uint8', 'unit')
+
+class VolumeTooLargeError(ValueError):
+    """Raised when a volume exceeds the slice, slice size or voxel limits"""
+
+def check_volume_size(volume):
+    """Reject a volume from its header, before any pixel data is read"""
+    height, width = volume.shape
+    if volume.num_slices > Config.VOLUME_MAX_SLICES:
+        raise VolumeTooLargeError(f"Volume has {volume.num_slices} slices, limit is {Config.VOLUME_MAX_SLICES}")
+    if height * width > Config.MAX_IMAGE_PIXELS:
+        raise VolumeTooLargeError(f"Slices have {height * width} pixels, limit is {Config.MAX_IMAGE_PIXELS}")
+    voxels = volume.num_slices * height * width
+    if voxels > Config.VOLUME_MAX_VOXELS:
+        raise VolumeTooLargeError(f"Volume has {voxels} voxels, limit is {Config.VOLUME_MAX_VOXELS}")
+
+def detect_volume_format(filename):
+    """Detect the volume format from the uploaded filename"""
+    filename = (filename or '').lower()
+    if filename.endswith('.npy'):
+        return 'npy'
+    if filename.endswith('.npz'):
+        return 'npz'
+    if filename.endswith('.zip'):
+        return 'dicom'
+    return None
+
+def _read_npy_header(stream):
+    """Read a .npy header, leaving the stream at the start of the array data"""
+    version = np.lib.format.read_magic(stream)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(stream)
+    elif version == (2, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(stream)
+    else:
+        raise ValueError(f"Unsupported .npy format version: {version}")
+
+    if dtype.hasobject:
+        raise ValueError("Object arrays are not supported")
+    if fortran_order:
+        raise ValueError("Fortran-ordered arrays are not supported, save the volume in C order")
+    if len(shape) == 4 and shape[-1] == 1:
+        shape = shape[:3]
+    if len(shape) != 3:
+        raise ValueError(f"Expected a (slices, height, width) volume, got shape {shape}")
+    return shape, dtype
+
+class NumpyVolume:
+    """C-ordered (slices, height, width) array read slice-batch by slice-batch"""
+
+    def __init__(self, stream, spacing=(1.0, 1.0, 1.0), intensity='hu'):
+        self._stream = stream
+        shape, self.dtype = _read_npy_header(stream)
+        self.num_slices = int(shape[0])
+        self.shape = (int(shape[1]), int(shape[2]))
+        self.spacing = tuple(float(value) for value in spacing)
+        self.intensity = intensity
+
+    def iter_batches(self, batch_size):
+        """Yield (first slice index, float32 array of shape (n, H, W))"""
+        slice_bytes = self.shape[0] * self.shape[1] * self.dtype.itemsize
+        for start in range(0, self.num_slices, batch_size):
+            count = min(batch_size, self.num_slices - start)
+            data = self._stream.read(slice_bytes * count)
+            if len(data) != slice_bytes * count:
+                raise ValueError("Volume data is truncated")
+            batch = np.frombuffer(data, dtype=self.dtype).reshape(count, *self.shape)
+            yield start, batch.astype(np.float32)
+
+def open_npz_volume(stream, spacing=(1.0, 1.0, 1.0), intensity='hu'):
+    """Open the 'volume' array (or the first array) of an .npz archive"""
+    archive = zipfile.ZipFile(stream)
+    names = [name for name in archive.namelist() if name.endswith('.npy')]
+    if not names:
+        raise ValueError("The .npz archive contains no arrays")
+    name = 'volume.npy' if 'volume.npy' in names else names[0]
+    return NumpyVolume(archive.open(name), spacing, intensity)
+
+class DicomSeries:
+    """DICOM series from a zip, sorted along the patient axis
+
+    Headers are read up front (without pixel data) to order the slices and
+    derive the spacing; pixel data is decoded batch by batch and rescaled
+    to Hounsfield units.
+    """
+
+    intensity = 'hu'
+
+    def __init__(self, stream):
+        import pydicom
+
+        self._pydicom = pydicom
+        self._archive = zipfile.ZipFile(stream)
+
+        headers = []
+        for info in self._archive.infolist():
+            if info.is_dir():
+                continue
+            with self._archive.open(info) as member:
+                try:
+                    dataset = pydicom.dcmread(member, stop_before_pixels=True)
+                except Exception:
+                    # Not a DICOM file (e.g. DICOMDIR index, readme)
+                    continue
+            if 'Rows' not in dataset or 'Columns' not in dataset:
+                continue
+            headers.append((self._sort_key(dataset, info.filename), info, dataset))
+
+        if not headers:
+            raise ValueError("No DICOM images found in the archive")
+
+        headers.sort(key=lambda header: header[0])
+        self._members = [info for _, info, _ in headers]
+        datasets = [dataset for _, _, dataset in headers]
+
+        shapes = {(int(ds.Rows), int(ds.Columns)) for ds in datasets}
+        if len(shapes) != 1:
+            raise ValueError("All slices in the series must have the same dimensions")
+        self.shape = shapes.pop()
+        self.num_slices = len(datasets)
+        self.spacing = self._spacing(datasets)
+
+    @staticmethod
+    def _sort_key(dataset, filename):
+        position = dataset.get('ImagePositionPatient')
+        if position is not None and len(position) == 3:
+            return (0, float(position[2]), filename)
+        instance = dataset.get('InstanceNumber')
+        if instance is not None:
+            return (1, float(instance), filename)
+        return (2, 0.0, filename)
+
+    @staticmethod
+    def _spacing(datasets):
+        pixel_spacing = datasets[0].get('PixelSpacing') or (1.0, 1.0)
+        row_spacing, column_spacing = float(pixel_spacing[0]), float(pixel_spacing[1])
+
+        positions = [ds.get('ImagePositionPatient') for ds in datasets]
+        if len(datasets) > 1 and all(p is not None and len(p) == 3 for p in positions):
+            z = np.array([float(p[2]) for p in positions])
+            slice_spacing = float(np.median(np.abs(np.diff(z))))
+        else:
+            slice_spacing = 0.0
+        if not slice_spacing:
+            slice_spacing = float(datasets[0].get('SliceThickness') or 1.0)
+
+        return (slice_spacing, row_spacing, column_spacing)
+
+    def iter_batches(self, batch_size):
+        """Yield (first slice index, float32 HU array of shape (n, H, W))"""
+        for start in range(0, self.num_slices, batch_size):
+            members = self._members[start:start + batch_size]
+            batch = np.empty((len(members), *self.shape), dtype=np.float32)
+            for offset, info in enumerate(members):
+                with self._archive.open(info) as member:
+                    dataset = self._pydicom.dcmread(member)
+                slope = float(dataset.get('RescaleSlope', 1.0))
+                intercept = float(dataset.get('RescaleIntercept', 0.0))
+                np.multiply(dataset.pixel_array, slope, out=batch[offset], casting='unsafe')
+                batch[offset] += intercept
+            yield start, batch
+
+def open_volume(stream, volume_format, spacing=(1.0, 1.0, 1.0), intensity='hu'):
+    """Open a volume reader for an uploaded stream"""
+    try:
+        if volume_format == 'dicom':
+            return DicomSeries(stream)
+        if volume_format == 'npy':
+            return NumpyVolume(stream, spacing, intensity)
+        if volume_format == 'npz':
+            return open_npz_volume(stream, spacing, intensity)
+    except zipfile.BadZipFile:
+        raise ValueError("Upload is not a valid zip archive")
+    raise ValueError(f"Unsupported volume format: {volume_format}")
+
+def normalize_slices(batch, intensity='hu', window_center=-600.0, window_width=1500.0):
+    """Map a batch of raw slices to [0, 1] in place (HU windowing or fixed scaling)"""
+    if intensity == 'hu':
+        low = window_center - window_width / 2.0
+        batch -= low
+        batch *= 1.0 / window_width
+    elif intensity == 'uint8':
+        batch *= 1.0 / 255.0
+    elif intensity != 'unit':
+        raise ValueError(f"Unsupported intensity mode: {intensity}")
+    np.clip(batch, 0.0, 1.0, out=batch)
+    return batch
+
+def resize_batch(batch, size):
+    """Resize a (n, H, W) batch of [0, 1] slices to (n, height, width) slice by slice
+
+    Uses PIL's bicubic resize, as the 2D upload path does, so downscaled
+    slices are antialiased the same way; 'F' mode keeps the float values
+    instead of quantizing them to 8 bits.
+    """
+    width, height = size
+    if batch.shape[1:] == (height, width):
+        return batch
+
+    resized = np.empty((batch.shape[0], height, width), dtype=np.float32)
+    for index, slice_ in enumerate(batch):
+        image = Image.fromarray(np.ascontiguousarray(slice_, dtype=np.float32))
+        resized[index] = np.asarray(image.resize((width, height), Image.BICUBIC))
+    # Bicubic overshoots at edges; 'L' images in the 2D path are clamped the same way
+    return np.clip(resized, 0.0, 1.0, out=resized)
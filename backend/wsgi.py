@@ -0,0 +1,8 @@
+"""
+WSGI entry point for gunicorn (pre-fork model sharing)
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+from app import create_app
+
+app = create_app(prefork=True)
@@ -56,6 +56,11 @@ interface ChatProps {
   }
 }
 
+type ContextKey = "patient_info" | "diagnosis_result"
+
+// What a new server session starts with
+const NO_CONTEXT: Record<ContextKey, string> = { patient_info: "null", diagnosis_result: "null" }
+
 // Simple markdown formatter
 const formatMarkdown = (text: string): string => {
   let html = text
@@ -89,6 +94,10 @@ export default function Chat({ messages, setMessages, isLoading, setIsLoading, h
   const [input, setInput] = useState("")
   const [healthMode, setHealthMode] = useState(false)
   const messagesEndRef = useRef<HTMLDivElement>(null)
+  // Server-side chat session; the backend keeps the conversation history
+  const sessionIdRef = useRef<string | null>(null)
+  // Context the session already has (serialized per key); only changes are re-sent
+  const sentContextRef = useRef<Record<ContextKey, string>>(NO_CONTEXT)
 
   // Auto-scroll to bottom when messages change
   useEffect(() => {
@@ -116,11 +125,24 @@ export default function Chat({ messages, setMessages, isLoading, setIsLoading, h
         message: currentInput
       }
 
-      // Add patient info and diagnosis if Health Mode is enabled
-      if (healthMode && patientInfo) {
-        payload.patient_info = patientInfo
-        if (diagnosisResult) {
-          payload.diagnosis_result = diagnosisResult
+      const sentSessionId = sessionIdRef.current
+      if (sentSessionId) {
+        payload.session_id = sentSessionId
+      }
+
+      // Patient info and diagnosis in Health Mode, otherwise none. The server keeps
+      // the session's context, so only keys that changed since the last send go out
+      // (null clears one).
+      const context: Record<ContextKey, unknown> = healthMode && patientInfo
+        ? { patient_info: patientInfo, diagnosis_result: diagnosisResult || null }
+        : { patient_info: null, diagnosis_result: null }
+      const known = sentSessionId ? sentContextRef.current : NO_CONTEXT
+      const sentContext: Partial<Record<ContextKey, string>> = {}
+      for (const key of Object.keys(context) as ContextKey[]) {
+        const serialized = JSON.stringify(context[key])
+        if (serialized !== known[key]) {
+          payload[key] = context[key]
+          sentContext[key] = serialized
         }
       }
 
@@ -137,6 +159,15 @@ export default function Chat({ messages, setMessages, isLoading, setIsLoading, h
         throw new Error('Chat API request failed')
       }
 
+      const sessionId = response.headers.get('X-Session-Id')
+      if (sessionId) {
+        // A different id means the old session expired and the server started over
+        // from what this request carried
+        const base = sessionId === sentSessionId ? known : NO_CONTEXT
+        sentContextRef.current = { ...base, ...sentContext }
+        sessionIdRef.current = sessionId
+      }
+
       // Create assistant message with empty content initially
       const assistantMessageId = (Date.now() + 1).toString()
       const assistantMessage: Message = {
@@ -154,6 +185,8 @@ export default function Chat({ messages, setMessages, isLoading, setIsLoading, h
       if (reader) {
         let accumulatedContent = ""
         let streamCompleted = false
+        // SSE events can be split across reads; keep the unfinished line for the next read
+        let buffer = ""
 
         while (true) {
           const { done, value } = await reader.read()
@@ -163,8 +196,9 @@ export default function Chat({ messages, setMessages, isLoading, setIsLoading, h
             break
           }
 
-          const chunk = decoder.decode(value)
-          const lines = chunk.split('\n')
+          buffer += decoder.decode(value, { stream: true })
+          const lines = buffer.split('\n')
+          buffer = lines.pop() ?? ""
 
           for (const line of lines) {
             if (line.startsWith('data: ')) {
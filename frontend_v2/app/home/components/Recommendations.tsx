@@ -2,6 +2,7 @@
 
 import { Button } from "@/components/ui/button"
 import { useState, useEffect } from "react"
+import { authHeaders } from "@/lib/api"
 
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:5001"
 
@@ -154,6 +155,7 @@ export function Recommendations({ risk, label, tumorDetected = false, cancerStag
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          ...(await authHeaders()),
         },
         body: JSON.stringify({
           lung_cancer_risk: risk,
@@ -12,6 +12,7 @@ import Chat, { type Message } from "./components/Chat"
 import { Eye } from "lucide-react"
 import ImageModal from "@/components/ImageModal"
 import { createClient } from "@/lib/supabase/client"
+import { authHeaders } from "@/lib/api"
 import type { User } from "@supabase/supabase-js"
 
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:5001"
@@ -77,6 +78,7 @@ export default function HomePage() {
       tumor_area: number;
       confidence: number;
       mask_image: string;
+      overlay_image?: string | null;
     };
     cancerStageResult?: {
       predicted_class: string;
@@ -200,11 +202,14 @@ export default function HomePage() {
         ...scores
       }
 
+      const auth = await authHeaders()
+
       // Call lung cancer prediction API
       const lungCancerResponse = await fetch(`${API_BASE_URL}/api/predict/lung-cancer`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          ...auth,
         },
         body: JSON.stringify(patientData)
       })
@@ -225,18 +230,22 @@ export default function HomePage() {
         const formData = new FormData()
         formData.append('image', selectedFile)
         formData.append('threshold', '0.5')
+        formData.append('include_overlay', 'true')
 
         // Call tumor segmentation API
         const tumorResponse = await fetch(`${API_BASE_URL}/api/predict/tumor`, {
           method: 'POST',
+          headers: auth,
           body: formData
         })
 
         if (tumorResponse.ok) {
           tumorResult = await tumorResponse.json()
 
-          // Create overlay image if tumor is detected
-          if (tumorResult.has_tumor && tumorResult.mask_image && imageUrl) {
+          // Use the server-side overlay; compose it locally only as a fallback
+          if (tumorResult.has_tumor && tumorResult.overlay_image) {
+            overlayImageUrl = tumorResult.overlay_image
+          } else if (tumorResult.has_tumor && tumorResult.mask_image && imageUrl) {
             overlayImageUrl = await createOverlayImage(imageUrl, tumorResult.mask_image)
           }
         }
@@ -247,6 +256,7 @@ export default function HomePage() {
 
         const stageResponse = await fetch(`${API_BASE_URL}/api/predict/cancer-stage`, {
           method: 'POST',
+          headers: auth,
           body: stageFormData
         })
 
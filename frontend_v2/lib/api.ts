@@ -0,0 +1,8 @@
+import { createClient } from "@/lib/supabase/client"
+
+// Bearer token of the signed-in Supabase user; the backend records and scopes
+// prediction history by it. Empty when there is no session.
+export async function authHeaders(): Promise<Record<string, string>> {
+  const { data: { session } } = await createClient().auth.getSession()
+  return session ? { Authorization: `Bearer ${session.access_token}` } : {}
+}
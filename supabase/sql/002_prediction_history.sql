@@ -0,0 +1,65 @@
+-- Prediction history for Serna Health AI
+-- Append-only audit log of /api/predict/* and /api/recommendations results.
+-- Mirrors the backend's local SQLite store (backend/services/history_store.py).
+-- Idempotent; run after 001_auth_baseline.sql
+
+create table if not exists public.prediction_history (
+  seq bigint generated always as identity primary key,
+  id text not null unique,
+  created_at timestamptz not null default now(),
+  endpoint text not null,
+  model text not null,
+  model_version text,
+  -- No foreign key: an FK action on auth.users would update rows and trip the
+  -- append-only trigger, blocking user deletion. Entries of deleted users stay
+  -- in the audit log and are unreadable through RLS.
+  user_id uuid,
+  content_hash text,
+  inputs jsonb,
+  result jsonb not null
+);
+
+-- Tables created by an earlier version of this script had the FK
+alter table public.prediction_history drop constraint if exists prediction_history_user_id_fkey;
+
+-- Listings are newest first, so every index ends with the keyset columns (created_at, seq).
+-- Reads are scoped to one user; the time and model indexes serve audits.
+create index if not exists idx_prediction_history_user
+  on public.prediction_history (user_id, created_at desc, seq desc);
+create index if not exists idx_prediction_history_user_content
+  on public.prediction_history (user_id, content_hash, created_at desc, seq desc);
+create index if not exists idx_prediction_history_created
+  on public.prediction_history (created_at desc, seq desc);
+create index if not exists idx_prediction_history_model
+  on public.prediction_history (model, model_version, created_at desc, seq desc);
+
+alter table public.prediction_history enable row level security;
+
+drop policy if exists "prediction_history_select_own" on public.prediction_history;
+create policy "prediction_history_select_own"
+on public.prediction_history
+for select
+to authenticated
+using (auth.uid() = user_id);
+
+drop policy if exists "prediction_history_insert_own" on public.prediction_history;
+create policy "prediction_history_insert_own"
+on public.prediction_history
+for insert
+to authenticated
+with check (auth.uid() = user_id);
+
+-- Append-only: no update or delete policies, and a trigger for roles that bypass RLS
+create or replace function public.prediction_history_append_only()
+returns trigger
+language plpgsql
+as $$
+begin
+  raise exception 'prediction_history is append-only';
+end;
+$$;
+
+drop trigger if exists prediction_history_no_modify on public.prediction_history;
+create trigger prediction_history_no_modify
+before update or delete on public.prediction_history
+for each row execute function public.prediction_history_append_only();